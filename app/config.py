@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict, ValidationError
@@ -7,27 +8,106 @@ load_dotenv("app/.env")
 
 class Settings(BaseSettings):
     """Settings for the application."""
-    GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
+    GEMINI_API_KEY: Optional[str] = os.getenv("GEMINI_API_KEY")  # Only required when a Gemini provider is selected
+    EMBEDDING_PROVIDER: str = os.getenv("EMBEDDING_PROVIDER", "gemini")  # gemini, local (static model on disk) or hashing (model-free)
+    EMBEDDING_LOCAL_MODEL_PATH: str = os.getenv("EMBEDDING_LOCAL_MODEL_PATH", "models/static")  # Directory with vocab.txt and embeddings.npy
+    EMBEDDING_LOCAL_BATCH_SIZE: int = int(os.getenv("EMBEDDING_LOCAL_BATCH_SIZE", "256"))  # Texts per NumPy pass of the local model
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-005")
     EMBEDDING_SIZE: int = os.getenv("EMBEDDING_SIZE", "768")   # Assuming the embedding size is 3, adjust as necessary
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))  # Vectors kept in the in-memory cache tier
+    EMBEDDING_CACHE_PERSIST: bool = os.getenv("EMBEDDING_CACHE_PERSIST", "true").lower() == "true"  # Share cached vectors through Postgres
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"  # Reuse answers to near-identical questions
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))  # Minimum cosine similarity for a hit
+    SEMANTIC_CACHE_SIZE: int = int(os.getenv("SEMANTIC_CACHE_SIZE", "1000"))
+    SEMANTIC_CACHE_TTL: float = float(os.getenv("SEMANTIC_CACHE_TTL", "600"))
+    SEMANTIC_CACHE_VERSION_INTERVAL: float = float(os.getenv("SEMANTIC_CACHE_VERSION_INTERVAL", "1"))  # Seconds between checks for documents changed by other workers
     LLM_MODEL: str = os.getenv("LLM_MODEL", "gemini-2.0-flash")
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "gemini")  # gemini or stub (deterministic extractive answers, offline)
+    LLM_STUB_MAX_WORDS: int = int(os.getenv("LLM_STUB_MAX_WORDS", "60"))
+    PROVIDER_LLM_RATE: float = float(os.getenv("PROVIDER_LLM_RATE", "0"))  # LLM requests per second (0 disables rate limiting)
+    PROVIDER_LLM_BURST: float = float(os.getenv("PROVIDER_LLM_BURST", "10"))  # LLM requests sent at once after an idle period
+    PROVIDER_LLM_CONCURRENCY: int = int(os.getenv("PROVIDER_LLM_CONCURRENCY", "16"))  # LLM streams open at once
+    PROVIDER_EMBEDDING_RATE: float = float(os.getenv("PROVIDER_EMBEDDING_RATE", "0"))  # Embedding requests per second (0 disables rate limiting)
+    PROVIDER_EMBEDDING_BURST: float = float(os.getenv("PROVIDER_EMBEDDING_BURST", "10"))
+    PROVIDER_EMBEDDING_CONCURRENCY: int = int(os.getenv("PROVIDER_EMBEDDING_CONCURRENCY", "8"))  # Embedding requests in flight at once
+    PROVIDER_QUEUE_TIMEOUT: float = float(os.getenv("PROVIDER_QUEUE_TIMEOUT", "30"))  # Seconds to wait for a provider slot before failing
+    PROVIDER_MAX_RETRIES: int = int(os.getenv("PROVIDER_MAX_RETRIES", "4"))  # Retries on 429, timeouts and 5xx
+    PROVIDER_RETRY_BASE_DELAY: float = float(os.getenv("PROVIDER_RETRY_BASE_DELAY", "0.5"))  # First backoff delay, doubled per retry (with jitter)
+    PROVIDER_RETRY_MAX_DELAY: float = float(os.getenv("PROVIDER_RETRY_MAX_DELAY", "20"))
+    EMBEDDING_BATCH_MAX_SIZE: int = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "100"))  # Texts per embedding request after micro-batching
+    EMBEDDING_BATCH_WINDOW_MS: float = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))  # Milliseconds concurrent embedding calls wait to share a request
     PG_VECTOR_DB_NAME: str = os.getenv("PG_VECTOR_DB_NAME", "vector_db")
     PG_VECTOR_DB_USERNAME: str = os.getenv("PG_VECTOR_DB_USERNAME", "postgres")
     PG_VECTOR_DB_PASSWORD: str = os.getenv("PG_VECTOR_DB_PASSWORD", "12345")
     PG_VECTOR_DB_HOST: str = os.getenv("PG_VECTOR_DB_HOST", "localhost")
     PG_VECTOR_DB_PORT: int = int(os.getenv("PG_VECTOR_DB_PORT", "5432"))
     PG_VECTOR_DB_VECTOR_SIZE: int = int(os.getenv("PG_VECTOR_DB_VECTOR_SIZE", "768"))  # Adjust as necessary
+    INGEST_UPLOAD_CHUNK_BYTES: int = int(os.getenv("INGEST_UPLOAD_CHUNK_BYTES", "1048576"))  # Bytes read per upload chunk
+    INGEST_PARSE_WORKERS: int = int(os.getenv("INGEST_PARSE_WORKERS", "2"))  # Processes used to parse and split files
+    INGEST_CHUNK_SIZE: int = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))  # Maximum characters per indexed chunk
+    INGEST_CHUNK_OVERLAP: int = int(os.getenv("INGEST_CHUNK_OVERLAP", "150"))
+    INGEST_BATCH_SIZE: int = int(os.getenv("INGEST_BATCH_SIZE", "64"))  # Chunks embedded and inserted per batch
+    INGEST_MAX_CONCURRENCY: int = int(os.getenv("INGEST_MAX_CONCURRENCY", "4"))  # Batches in flight per document
+    INGEST_SPOOL_DIR: str = os.getenv("INGEST_SPOOL_DIR", "uploads")  # Uploads wait here until their job completes
+    INGEST_JOB_WORKERS: int = int(os.getenv("INGEST_JOB_WORKERS", "2"))  # Ingestion jobs processed concurrently
+    INGEST_JOB_QUEUE_SIZE: int = int(os.getenv("INGEST_JOB_QUEUE_SIZE", "100"))  # Queued jobs before /knowledge/add returns 429
+    INGEST_JOB_STALE_SECONDS: float = float(os.getenv("INGEST_JOB_STALE_SECONDS", "120"))  # Wait or silence after which a queued or running job is taken over
+    KNOWLEDGE_BULK_MAX_ITEMS: int = int(os.getenv("KNOWLEDGE_BULK_MAX_ITEMS", "10000"))  # Documents per bulk update/delete request
+    COLLECTION_CACHE_SIZE: int = int(os.getenv("COLLECTION_CACHE_SIZE", "100"))  # Collections kept open besides the default one (LRU)
+    PG_VECTOR_DB_POOL_SIZE: int = int(os.getenv("PG_VECTOR_DB_POOL_SIZE", "5"))
+    PG_VECTOR_DB_POOL_MAX_OVERFLOW: int = int(os.getenv("PG_VECTOR_DB_POOL_MAX_OVERFLOW", "10"))
+    VECTOR_INDEX_TYPE: str = os.getenv("VECTOR_INDEX_TYPE", "hnsw")  # hnsw, ivfflat or none
+    VECTOR_INDEX_SCOPE: str = os.getenv("VECTOR_INDEX_SCOPE", "collection")  # collection (a partial index per collection) or global
+    VECTOR_INDEX_HNSW_M: int = int(os.getenv("VECTOR_INDEX_HNSW_M", "16"))
+    VECTOR_INDEX_HNSW_EF_CONSTRUCTION: int = int(os.getenv("VECTOR_INDEX_HNSW_EF_CONSTRUCTION", "64"))
+    VECTOR_INDEX_IVFFLAT_LISTS: int = int(os.getenv("VECTOR_INDEX_IVFFLAT_LISTS", "100"))  # Roughly rows / 1000
+    VECTOR_SEARCH_K: int = int(os.getenv("VECTOR_SEARCH_K", "4"))  # Chunks retrieved per query
+    VECTOR_SEARCH_HNSW_EF_SEARCH: int = int(os.getenv("VECTOR_SEARCH_HNSW_EF_SEARCH", "40"))
+    VECTOR_SEARCH_IVFFLAT_PROBES: int = int(os.getenv("VECTOR_SEARCH_IVFFLAT_PROBES", "10"))
+    RETRIEVAL_MODE: str = os.getenv("RETRIEVAL_MODE", "hybrid")  # hybrid (keyword + vector) or vector
+    TEXT_SEARCH_CONFIG: str = os.getenv("TEXT_SEARCH_CONFIG", "english")  # Postgres text search configuration
+    HYBRID_K_VECTOR: int = int(os.getenv("HYBRID_K_VECTOR", "20"))  # Candidates from the vector leg
+    HYBRID_K_KEYWORD: int = int(os.getenv("HYBRID_K_KEYWORD", "20"))  # Candidates from the keyword leg
+    HYBRID_RRF_K: int = int(os.getenv("HYBRID_RRF_K", "60"))  # Reciprocal-rank fusion constant
+    CONTEXT_CANDIDATES: int = int(os.getenv("CONTEXT_CANDIDATES", "20"))  # Chunks over-fetched per answer before packing
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))  # Estimated tokens of packed context per prompt
+    CONTEXT_MAX_CHUNKS: int = int(os.getenv("CONTEXT_MAX_CHUNKS", "6"))  # Chunks packed per prompt at most
+    CONTEXT_MMR_LAMBDA: float = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))  # 1.0 ranks by relevance only, lower values favour diversity
+    CONTEXT_DUPLICATE_THRESHOLD: float = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.95"))  # Cosine similarity treated as a near-duplicate
+    CONTEXT_RERANKER: str = os.getenv("CONTEXT_RERANKER", "none")  # none, lexical or cross-encoder (needs sentence-transformers)
+    CONTEXT_RERANKER_MODEL: str = os.getenv("CONTEXT_RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
     CHAT_DB_NAME: str = os.getenv("CHAT_DB_NAME", "chat_db")
     CHAT_DB_USERNAME: str = os.getenv("CHAT_DB_USERNAME", "postgres")
     CHAT_DB_PASSWORD: str = os.getenv("CHAT_DB_PASSWORD", "12345")
     CHAT_DB_HOST: str = os.getenv("CHAT_DB_HOST", "localhost")
     CHAT_DB_PORT: int = int(os.getenv("CHAT_DB_PORT", "5432"))
+    CHAT_DB_POOL_MIN_SIZE: int = int(os.getenv("CHAT_DB_POOL_MIN_SIZE", "1"))
+    CHAT_DB_POOL_MAX_SIZE: int = int(os.getenv("CHAT_DB_POOL_MAX_SIZE", "10"))
+    CHAT_DB_POOL_TIMEOUT: float = float(os.getenv("CHAT_DB_POOL_TIMEOUT", "30"))  # Seconds to wait for a free connection
+    CHAT_DB_POOL_MAX_IDLE: float = float(os.getenv("CHAT_DB_POOL_MAX_IDLE", "600"))  # Seconds before idle connections are closed
+    CHAT_SESSION_CACHE_SIZE: int = int(os.getenv("CHAT_SESSION_CACHE_SIZE", "10000"))
+    CHAT_SESSION_CACHE_TTL: float = float(os.getenv("CHAT_SESSION_CACHE_TTL", "60"))  # Seconds a cached active session is trusted
+    WRITE_BEHIND_BATCH_SIZE: int = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))  # Buffered chat records that trigger a flush
+    WRITE_BEHIND_FLUSH_INTERVAL: float = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.5"))  # Max seconds before buffered records are written
+    WRITE_BEHIND_MAX_PENDING: int = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))  # Records held in memory before spilling to disk
+    WRITE_BEHIND_SPILL_DIR: str = os.getenv("WRITE_BEHIND_SPILL_DIR", "spill")
+    CHAT_PARTITION_PREMAKE_MONTHS: int = int(os.getenv("CHAT_PARTITION_PREMAKE_MONTHS", "3"))  # Monthly message/audit partitions created ahead of time
+    RETENTION_INTERVAL: float = float(os.getenv("RETENTION_INTERVAL", "3600"))  # Seconds between retention runs (0 disables them)
+    RETENTION_DELETED_SESSION_DAYS: float = float(os.getenv("RETENTION_DELETED_SESSION_DAYS", "30"))  # Days before soft-deleted sessions are purged
+    RETENTION_AUDIT_DAYS: float = float(os.getenv("RETENTION_AUDIT_DAYS", "90"))  # Days before audit partitions are archived and dropped
+    RETENTION_ARCHIVE_DIR: str = os.getenv("RETENTION_ARCHIVE_DIR", "archive")  # Compressed audit archives are written here
+    RETENTION_BATCH_SIZE: int = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))  # Sessions purged per transaction
+    CHAT_HISTORY_MAX_MESSAGES: int = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "20"))  # Most recent messages replayed into the prompt
+    CHAT_HISTORY_TOKEN_BUDGET: int = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000"))  # Approximate token cap for the replayed window
+    CHAT_SUMMARY_MIN_MESSAGES: int = int(os.getenv("CHAT_SUMMARY_MIN_MESSAGES", "6"))  # Messages outside the window before the summary is updated
+    CHAT_SUMMARY_MAX_MESSAGES: int = int(os.getenv("CHAT_SUMMARY_MAX_MESSAGES", "50"))  # Messages folded into the summary per update
+    SSE_HEARTBEAT_INTERVAL: float = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))  # Seconds of silence before a keep-alive comment is streamed
 
     model_config = ConfigDict(env_file=".env", env_file_encoding="utf-8")
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        if not self.GEMINI_API_KEY:
+        if "gemini" in (self.EMBEDDING_PROVIDER, self.LLM_PROVIDER) and not self.GEMINI_API_KEY:
             raise ValidationError("GEMINI_API_KEY is missing. Please set it in the environment variables.")
 
 try:
@@ -1,3 +1,4 @@
+import math
 from typing import Any, Optional, Dict
 
 from fastapi import status
@@ -5,10 +6,22 @@ from fastapi import HTTPException
 from starlette.responses import JSONResponse
 
 from app.models.ModelResponse import ErrorData, ResponseError
+from app.modules.provider_gateway import ProviderUnavailableError, unavailable_cause
 
 async def http_exception_handler(request, exc):
+    # Routes turn unexpected failures into 500s; an overloaded provider is reported as such instead.
+    cause = unavailable_cause(exc) if exc.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR else None
+    if cause is not None:
+        return await provider_unavailable_handler(request, cause)
     content = ResponseError(error=ErrorData(code=exc.status_code, message=exc.detail)).model_dump(mode='json')
-    return JSONResponse(content, status_code=exc.status_code)
+    return JSONResponse(content, status_code=exc.status_code, headers=getattr(exc, "headers", None))
+
+async def provider_unavailable_handler(request, exc: ProviderUnavailableError):
+    """503 with Retry-After, so clients back off instead of retrying an overloaded provider at once."""
+    code = status.HTTP_503_SERVICE_UNAVAILABLE
+    content = ResponseError(error=ErrorData(code=code, message=str(exc))).model_dump(mode='json')
+    headers = {"Retry-After": str(math.ceil(exc.retry_after))} if exc.retry_after is not None else None
+    return JSONResponse(content, status_code=code, headers=headers)
 
 class AuthError(HTTPException):
     def __init__(
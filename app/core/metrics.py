@@ -0,0 +1,96 @@
+import os
+import time
+import functools
+from contextlib import contextmanager
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_LATENCY = Histogram(
+    "rag_stage_latency_seconds",
+    "Latency of individual request stages (session validation, retrieval, time to first token, ...).",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_LATENCY = Histogram(
+    "rag_db_operation_latency_seconds",
+    "Latency of chat database operations.",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "rag_llm_tokens_total",
+    "Tokens sent to and received from the LLM.",
+    ["direction"],
+)
+PROVIDER_REQUESTS = Counter(
+    "rag_provider_requests_total",
+    "Model provider requests by outcome (success, retry, error, rejected).",
+    ["provider", "outcome"],
+)
+PROVIDER_WAIT = Histogram(
+    "rag_provider_wait_seconds",
+    "Time spent waiting for a provider concurrency slot or rate-limit token.",
+    ["provider", "limiter"],
+    buckets=LATENCY_BUCKETS,
+)
+PROVIDER_IN_FLIGHT = Gauge(
+    "rag_provider_in_flight",
+    "Model provider requests currently holding a concurrency slot.",
+    ["provider"],
+    multiprocess_mode="livesum",
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "rag_embedding_batch_size",
+    "Texts sent per embedding request after micro-batching.",
+    ["provider"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 100, 250),
+)
+EMBEDDING_COALESCED = Counter(
+    "rag_embedding_coalesced_total",
+    "Texts served by an identical embedding request already queued or in flight.",
+    ["provider"],
+)
+
+def observe_db(operation: str):
+    """Decorator recording the duration of an async database method in DB_LATENCY."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                DB_LATENCY.labels(operation).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+class StageTimer:
+    def __init__(self):
+        """Collect per-stage durations of one request and record them into STAGE_LATENCY."""
+        self.started = time.perf_counter()
+        self.breakdown = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        STAGE_LATENCY.labels(name).observe(seconds)
+        self.breakdown[f"{name}_ms"] = round(seconds * 1000, 2)
+
+    def elapsed_ms(self) -> int:
+        return int((time.perf_counter() - self.started) * 1000)
+
+def render_metrics() -> bytes:
+    """Serialize all metrics; aggregates across worker processes when PROMETHEUS_MULTIPROC_DIR is set."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -0,0 +1,129 @@
+from typing import Optional
+from fastapi import HTTPException, Request
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from app.config import config_settings
+from app.modules.collection_registry import CollectionRegistry
+from app.modules.ingestion import shutdown_parse_pool
+from app.modules.ingestion_jobs import IngestionJobQueue
+from app.modules.langchain_crud import LangchainDocManager
+from app.modules.postgresdb_base import PostgresDB
+from app.modules.retention import RetentionJob
+from app.modules.semantic_cache import SemanticCache
+from app.modules.write_behind import WriteBehindBuffer
+
+def _response_cache() -> Optional[SemanticCache]:
+    if not config_settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    return SemanticCache(
+        threshold=config_settings.SEMANTIC_CACHE_THRESHOLD,
+        max_entries=config_settings.SEMANTIC_CACHE_SIZE,
+        ttl_seconds=config_settings.SEMANTIC_CACHE_TTL
+    )
+
+class Resources:
+    def __init__(self, chat_db: Optional[PostgresDB] = None, manager: Optional[LangchainDocManager] = None,
+                 embeddings: Optional[Embeddings] = None, llm: Optional[BaseChatModel] = None):
+        """
+        Process-wide registry of shared resources, created once per app and exposed to routes through dependencies.
+        Pass chat_db or manager to substitute your own implementations (e.g. fakes in tests or benchmarks),
+        or embeddings/llm to keep the real databases but swap the model providers of the default manager.
+        """
+        self.chat_db = chat_db or PostgresDB(
+            dbname=config_settings.CHAT_DB_NAME,
+            user=config_settings.CHAT_DB_USERNAME,
+            password=config_settings.CHAT_DB_PASSWORD,
+            host=config_settings.CHAT_DB_HOST,
+            port=config_settings.CHAT_DB_PORT,
+            min_size=config_settings.CHAT_DB_POOL_MIN_SIZE,
+            max_size=config_settings.CHAT_DB_POOL_MAX_SIZE,
+            timeout=config_settings.CHAT_DB_POOL_TIMEOUT,
+            max_idle=config_settings.CHAT_DB_POOL_MAX_IDLE,
+            session_cache_size=config_settings.CHAT_SESSION_CACHE_SIZE,
+            session_cache_ttl=config_settings.CHAT_SESSION_CACHE_TTL
+        )
+        self.manager = manager or LangchainDocManager(
+            pg_connection_str=(
+                f"postgresql+psycopg://{config_settings.PG_VECTOR_DB_USERNAME}:{config_settings.PG_VECTOR_DB_PASSWORD}"
+                f"@{config_settings.PG_VECTOR_DB_HOST}:{config_settings.PG_VECTOR_DB_PORT}/{config_settings.PG_VECTOR_DB_NAME}"
+            ),
+            collection_name=config_settings.PG_VECTOR_DB_NAME,
+            embedding_store=self.chat_db,
+            response_cache=_response_cache(),
+            embeddings=embeddings,
+            llm=llm
+        )
+        self.collections = CollectionRegistry(
+            self.manager,
+            max_open=config_settings.COLLECTION_CACHE_SIZE,
+            response_cache_factory=_response_cache
+        )
+        self.write_buffer = WriteBehindBuffer(
+            self.chat_db,
+            batch_size=config_settings.WRITE_BEHIND_BATCH_SIZE,
+            flush_interval=config_settings.WRITE_BEHIND_FLUSH_INTERVAL,
+            max_pending=config_settings.WRITE_BEHIND_MAX_PENDING,
+            spill_dir=config_settings.WRITE_BEHIND_SPILL_DIR
+        )
+        self.retention = RetentionJob(
+            self.chat_db,
+            interval=config_settings.RETENTION_INTERVAL,
+            premake_months=config_settings.CHAT_PARTITION_PREMAKE_MONTHS,
+            deleted_session_days=config_settings.RETENTION_DELETED_SESSION_DAYS,
+            audit_days=config_settings.RETENTION_AUDIT_DAYS,
+            archive_dir=config_settings.RETENTION_ARCHIVE_DIR,
+            batch_size=config_settings.RETENTION_BATCH_SIZE
+        )
+        self.ingestion_jobs = IngestionJobQueue(
+            self.collections,
+            self.chat_db,
+            workers=config_settings.INGEST_JOB_WORKERS,
+            max_queued=config_settings.INGEST_JOB_QUEUE_SIZE,
+            stale_after=config_settings.INGEST_JOB_STALE_SECONDS
+        )
+
+    async def startup(self):
+        """Open the database pool, prepare the vector store and start background workers."""
+        await self.chat_db.open()
+        await self.retention.start()
+        await self.write_buffer.start()
+        await self.manager.startup()
+        await self.ingestion_jobs.start()
+
+    async def shutdown(self):
+        """Stop background work first, then release connections."""
+        await self.ingestion_jobs.stop()
+        await self.retention.stop()
+        shutdown_parse_pool()
+        await self.collections.close()
+        await self.manager.close()
+        await self.write_buffer.stop()
+        await self.chat_db.close()
+
+def get_resources(request: Request) -> Resources:
+    return request.app.state.resources
+
+def get_chat_db(request: Request) -> PostgresDB:
+    return request.app.state.resources.chat_db
+
+async def _collection_manager(request: Request, collection: Optional[str], create: bool) -> LangchainDocManager:
+    try:
+        return await request.app.state.resources.collections.get(collection, create=create)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+async def get_manager(request: Request, collection: Optional[str] = None) -> LangchainDocManager:
+    """Manager of the collection named in the path or query (the default collection when none is given)."""
+    return await _collection_manager(request, collection, create=False)
+
+async def get_or_create_manager(request: Request, collection: Optional[str] = None) -> LangchainDocManager:
+    """Like get_manager, but creates the collection if it does not exist yet."""
+    return await _collection_manager(request, collection, create=True)
+
+def get_write_buffer(request: Request) -> WriteBehindBuffer:
+    return request.app.state.resources.write_buffer
+
+def get_ingestion_jobs(request: Request) -> IngestionJobQueue:
+    return request.app.state.resources.ingestion_jobs
@@ -0,0 +1,52 @@
+import json
+import asyncio
+from typing import AsyncIterator, Optional
+from fastapi import Request
+from app.modules.provider_gateway import unavailable_cause
+
+def format_event(event: str, data) -> str:
+    """Serialize one Server-Sent Event; data is JSON-encoded so multi-line text stays in a single data field."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def event_stream(events: AsyncIterator[dict], request: Request, heartbeat_interval: float) -> AsyncIterator[str]:
+    """
+    Relay events ({"type": ..., **data}) from a producer as Server-Sent Events.
+    A comment line is sent whenever the producer is silent for heartbeat_interval seconds, so proxies keep the
+    connection open. Errors raised by the producer end the stream with an "error" event (with code
+    "provider_unavailable" and retry_after when a model provider is overloaded). When the client
+    disconnects the producer is cancelled and closed, which stops the upstream LLM call instead of letting
+    it run to completion for nobody.
+    """
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(events.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=heartbeat_interval)
+            if await request.is_disconnected():
+                break
+            if not done:
+                yield ": heartbeat\n\n"
+                continue
+            try:
+                event = pending.result()
+            except StopAsyncIteration:
+                pending = None
+                break
+            except Exception as e:
+                # The response has already started, so failures are reported in-band.
+                pending = None
+                cause = unavailable_cause(e)
+                if cause is not None:
+                    yield format_event("error", {"detail": str(cause), "code": "provider_unavailable",
+                                                 "retry_after": cause.retry_after})
+                else:
+                    yield format_event("error", {"detail": str(e)})
+                break
+            pending = None
+            yield format_event(event["type"], {k: v for k, v in event.items() if k != "type"})
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        await events.aclose()
@@ -1,8 +1,12 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List
 
 class Document(BaseModel):
-    id: int = None
+    id: str
     page_content: str
     size: int = None
-    created_at: datetime = None
\ No newline at end of file
+    created_at: datetime = None
+
+class DocumentIds(BaseModel):
+    ids: List[str]
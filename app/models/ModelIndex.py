@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import Literal
+
+class IndexConfig(BaseModel):
+    type: Literal["hnsw", "ivfflat"] = "hnsw"
+    m: int = None
+    ef_construction: int = None
+    lists: int = None
@@ -0,0 +1,126 @@
+import asyncio
+from typing import List, Optional, Tuple
+from app.modules.postgresdb_base import PostgresDB
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for history budgeting."""
+    return len(text) // 4 + 1
+
+async def get_history_window(
+    chat_db: PostgresDB,
+    session_id: int,
+    max_messages: int,
+    token_budget: int,
+    page_size: int = 20,
+) -> List[dict]:
+    """
+    Load the most recent messages of a session, newest first, page by page,
+    stopping as soon as either the message limit or the token budget is reached.
+    Returns the window in chronological order.
+    """
+    window, used_tokens, before_id = [], 0, None
+    while len(window) < max_messages:
+        page = await chat_db.get_recent_messages(
+            session_id, min(page_size, max_messages - len(window)), before_id=before_id
+        )
+        for message in page:
+            used_tokens += estimate_tokens(message["message"])
+            if window and used_tokens > token_budget:
+                return window[::-1]
+            window.append(message)
+        if len(page) < page_size:
+            break
+        before_id = page[-1]["id"]
+    return window[::-1]
+
+async def load_history(
+    chat_db: PostgresDB,
+    session_id: int,
+    max_messages: int,
+    token_budget: int,
+    max_unsummarized: int = 50,
+    llm=None,
+    summary_batch: int = 50,
+) -> Tuple[Optional[str], List[dict]]:
+    """
+    Fetch the rolling summary and the recent message window of a session concurrently.
+    Messages that have left the window but are not summarized yet (the summary is only refreshed once
+    enough of them pile up) are prepended to the window, newest first, as far as the token budget left
+    by the window allows, so recent turns are not missing from the prompt. When more than
+    max_unsummarized of them have piled up (e.g. an old session without summary), they are first folded
+    into the summary with llm instead of being replayed.
+    :max_unsummarized: Upper bound on the messages prepended this way
+    :llm: Chat model used to fold an oversized backlog into the summary (None skips folding)
+    :summary_batch: Messages folded into the summary per LLM call
+    """
+    summary, window = await asyncio.gather(
+        chat_db.get_summary(session_id),
+        get_history_window(chat_db, session_id, max_messages, token_budget),
+    )
+    if not window:
+        return (summary["summary"] if summary else None), window
+
+    # One extra row tells whether the backlog exceeds the cap.
+    backlog = await chat_db.get_messages_range(
+        session_id, summary["last_message_id"] if summary else 0, window[0]["id"], max_unsummarized + 1,
+        newest_first=True
+    )
+    if len(backlog) > max_unsummarized and llm is not None:
+        while await refresh_summary(chat_db, llm, session_id, max_messages, token_budget,
+                                    min_batch=1, max_batch=summary_batch):
+            pass
+        summary = await chat_db.get_summary(session_id)
+        backlog = await chat_db.get_messages_range(
+            session_id, summary["last_message_id"] if summary else 0, window[0]["id"], max_unsummarized,
+            newest_first=True
+        )
+
+    remaining = token_budget - sum(estimate_tokens(m["message"]) for m in window)
+    unsummarized = []
+    for message in backlog[:max_unsummarized]:
+        remaining -= estimate_tokens(message["message"])
+        if remaining < 0:
+            break
+        unsummarized.append(message)
+    return (summary["summary"] if summary else None), unsummarized[::-1] + window
+
+async def refresh_summary(
+    chat_db: PostgresDB,
+    llm,
+    session_id: int,
+    max_messages: int,
+    token_budget: int,
+    min_batch: int = 6,
+    max_batch: int = 50,
+):
+    """
+    Fold messages that have dropped out of the history window into the session's rolling summary.
+    Only the messages between the last summarized ID and the start of the current window are sent
+    to the LLM together with the previous summary, so the cost per update stays bounded.
+    Returns True if the summary advanced.
+    """
+    window = await get_history_window(chat_db, session_id, max_messages, token_budget)
+    if not window:
+        return False
+    previous = await chat_db.get_summary(session_id)
+    last_summarized_id = previous["last_message_id"] if previous else 0
+    pending = await chat_db.get_messages_range(
+        session_id, last_summarized_id, window[0]["id"], max_batch
+    )
+    if not pending or len(pending) < min_batch:
+        return False
+
+    transcript = "\n".join(f"{m['sender']}: {m['message']}" for m in pending)
+    messages = [
+        ("system", "You maintain a concise running summary of a conversation. "
+                   "Merge the new messages into the existing summary, keeping facts, decisions "
+                   "and open questions the assistant will need later. Reply with the summary only."),
+        ("user", f"Existing summary:\n{previous['summary'] if previous else '(none)'}\n\n"
+                 f"New messages:\n{transcript}"),
+    ]
+    result = await llm.ainvoke(messages)
+    summary = result.content if hasattr(result, "content") else str(result)
+    if not summary.strip():
+        return False
+    await chat_db.upsert_summary(session_id, summary.strip(), pending[-1]["id"])
+    return True
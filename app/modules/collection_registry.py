@@ -0,0 +1,91 @@
+import re
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set
+from app.modules.langchain_crud import LangchainDocManager
+from app.modules.semantic_cache import SemanticCache
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,62}$")
+# First path segments of the /knowledge routes; a collection with one of these names could not be routed to.
+RESERVED_NAMES = {"add", "jobs", "embedding_cache", "index", "update", "delete", "get_knowledge", "wipe"}
+
+def validate_collection_name(name: str):
+    if not COLLECTION_NAME.match(name) or name in RESERVED_NAMES:
+        raise ValueError(
+            f"Invalid collection name: {name}. Use 1-63 letters, digits, '-' or '_' (not one of "
+            f"{', '.join(sorted(RESERVED_NAMES))})."
+        )
+
+class CollectionRegistry:
+    def __init__(self, default: LangchainDocManager, max_open: int = 100,
+                 response_cache_factory: Optional[Callable[[], Optional[SemanticCache]]] = None):
+        """
+        Bounded LRU of per-collection document managers. Every manager shares the default manager's engine
+        and provider clients, so opening a collection costs a lookup, not a connection pool.
+        :default: Manager of the default collection, used when no collection is given; it is never evicted
+        :max_open: Collections kept open besides the default one; the least recently used is dropped beyond that
+        :response_cache_factory: Builds each collection's own answer cache (None disables answer caching)
+        """
+        self.default = default
+        self.max_open = max_open
+        self.response_cache_factory = response_cache_factory
+        self._open: "OrderedDict[str, LangchainDocManager]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def get(self, name: Optional[str] = None, create: bool = False) -> LangchainDocManager:
+        """
+        Manager of the named collection (the default collection for None).
+        Raises ValueError for an invalid name and LookupError if the collection does not exist and create is not set.
+        """
+        if name is None or name == self.default.collection_name:
+            return self.default
+        manager = self._open.get(name)
+        if manager is not None:
+            self._open.move_to_end(name)
+            return manager
+        validate_collection_name(name)
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        try:
+            async with lock:
+                manager = self._open.get(name)
+                if manager is None:
+                    manager = await self._open_manager(name, create)
+        finally:
+            self._locks.pop(name, None)
+        return manager
+
+    async def _open_manager(self, name: str, create: bool) -> LangchainDocManager:
+        manager = self.default.for_collection(
+            name, response_cache=self.response_cache_factory() if self.response_cache_factory else None
+        )
+        await manager.open_collection(create=create)
+        self._open[name] = manager
+        while len(self._open) > self.max_open:
+            # Requests still holding an evicted manager keep working; only the handle is dropped.
+            self._open.popitem(last=False)
+        self._spawn(self._ensure_indexes(manager))
+        return manager
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _ensure_indexes(manager: LangchainDocManager):
+        # Built in the background: CREATE INDEX CONCURRENTLY waits for running transactions to finish.
+        try:
+            await manager.ensure_indexes()
+        except Exception:
+            logger.exception("Could not create the indexes of collection %s", manager.collection_name)
+
+    async def close(self):
+        """Cancel index builds still running; the shared engine is released by the default manager."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._open.clear()
@@ -0,0 +1,143 @@
+import re
+import math
+from collections import Counter
+from typing import List, Optional
+import numpy as np
+from langchain_core.documents import Document
+from app.modules.chat_history import estimate_tokens
+from app.modules.embedding_cache import content_hash
+
+_TOKEN = re.compile(r"\w+")
+
+class LexicalReranker:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """BM25 over the candidate set itself; cheap and dependency-free."""
+        self.k1 = k1
+        self.b = b
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        docs = [Counter(_TOKEN.findall(t.lower())) for t in texts]
+        terms = set(_TOKEN.findall(query.lower()))
+        if not docs or not terms:
+            return [0.0] * len(texts)
+        average_length = sum(sum(d.values()) for d in docs) / len(docs) or 1.0
+        idf = {t: math.log(1 + (len(docs) - n + 0.5) / (n + 0.5))
+               for t in terms for n in [sum(1 for d in docs if t in d)]}
+        scores = []
+        for d in docs:
+            length = sum(d.values())
+            scores.append(sum(
+                idf[t] * d[t] * (self.k1 + 1) / (d[t] + self.k1 * (1 - self.b + self.b * length / average_length))
+                for t in terms if t in d
+            ))
+        return scores
+
+class CrossEncoderReranker:
+    def __init__(self, model_name: str):
+        """Local cross-encoder from sentence-transformers (optional dependency), loaded on first use."""
+        self.model_name = model_name
+        self._model = None
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        if self._model is None:
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError:
+                raise RuntimeError("CONTEXT_RERANKER=cross-encoder requires the sentence-transformers package")
+            self._model = CrossEncoder(self.model_name)
+        return [float(s) for s in self._model.predict([(query, t) for t in texts])]
+
+def get_reranker(kind: str, model_name: str = None):
+    """
+    Build the reranker selected by CONTEXT_RERANKER (none, lexical or cross-encoder).
+    Any object with score(query, texts) -> List[float] (higher is more relevant) can be used as a reranker.
+    """
+    if kind == "none":
+        return None
+    if kind == "lexical":
+        return LexicalReranker()
+    if kind == "cross-encoder":
+        return CrossEncoderReranker(model_name)
+    raise ValueError(f"Unsupported reranker: {kind}")
+
+class ContextPacker:
+    def __init__(self, token_budget: int = 3000, max_chunks: int = 6, mmr_lambda: float = 0.7,
+                 duplicate_threshold: float = 0.95, reranker=None):
+        """
+        Turn over-fetched retrieval candidates into a compact, cited prompt context.
+        :token_budget: Maximum estimated tokens of packed context
+        :max_chunks: Maximum number of chunks packed, however much budget is left
+        :mmr_lambda: Trade-off between relevance (1.0) and diversity (0.0) in maximal marginal relevance
+        :duplicate_threshold: Cosine similarity to an already packed chunk above which a candidate is dropped
+        :reranker: Optional scorer replacing the retrieval order as the relevance signal
+        """
+        self.token_budget = token_budget
+        self.max_chunks = max_chunks
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.reranker = reranker
+
+    def _relevance(self, query: str, docs: List[Document]) -> np.ndarray:
+        if self.reranker is not None:
+            scores = np.asarray(self.reranker.score(query, [d.page_content for d in docs]), dtype=np.float32)
+            spread = scores.max() - scores.min()
+            return (scores - scores.min()) / spread if spread else np.ones(len(docs), dtype=np.float32)
+        # Without a reranker, trust the retrieval order (which may already fuse vector and keyword ranks).
+        return 1.0 - np.arange(len(docs), dtype=np.float32) / len(docs)
+
+    def pack(self, query: str, docs: List[Document], vectors: Optional[np.ndarray] = None) -> dict:
+        """
+        Drop exact and near duplicates, pick chunks by maximal marginal relevance and pack them
+        into the token budget, numbered for citation. Returns the context text, its sources
+        (with their [ref] numbers), its estimated tokens and the number of distinct candidates.
+        :docs: Candidates in retrieval order
+        :vectors: Normalized embeddings of docs, one row each; without them only exact duplicates are removed
+        """
+        seen, unique = set(), []
+        for i, doc in enumerate(docs):
+            digest = content_hash(doc.page_content)
+            if digest not in seen:
+                seen.add(digest)
+                unique.append(i)
+        docs = [docs[i] for i in unique]
+        vectors = vectors[unique] if vectors is not None and len(unique) else None
+        if not docs:
+            return {"text": "No relevant documents found.", "sources": [], "tokens": 0, "candidates": 0}
+
+        relevance = self._relevance(query, docs)
+        remaining = list(range(len(docs)))
+        max_similarity = np.zeros(len(docs), dtype=np.float32)
+        selected, used = [], 0
+        while remaining and len(selected) < self.max_chunks:
+            if vectors is not None and selected:
+                scores = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * max_similarity[remaining]
+            else:
+                scores = relevance[remaining]
+            best = remaining.pop(int(np.argmax(scores)))
+            if vectors is not None and selected and max_similarity[best] >= self.duplicate_threshold:
+                continue
+            cost = estimate_tokens(docs[best].page_content)
+            if used + cost > self.token_budget:
+                # Keep looking for smaller chunks that still fit.
+                continue
+            selected.append(best)
+            used += cost
+            if vectors is not None:
+                max_similarity = np.maximum(max_similarity, vectors @ vectors[best])
+        if not selected:
+            # Even the best chunk is over budget on its own: include a truncated prefix rather than nothing.
+            best = int(np.argmax(relevance))
+            docs[best] = Document(id=docs[best].id, metadata=docs[best].metadata,
+                                  page_content=docs[best].page_content[:self.token_budget * 4])
+            selected, used = [best], estimate_tokens(docs[best].page_content)
+
+        blocks, sources = [], []
+        for ref, i in enumerate(selected, start=1):
+            doc = docs[i]
+            label = doc.metadata.get("source") or "unknown"
+            if doc.metadata.get("chunk") is not None:
+                label += f", chunk {doc.metadata['chunk']}"
+            blocks.append(f"[{ref}] ({label})\n{doc.page_content}")
+            sources.append({"ref": ref, "id": doc.id, "document_id": doc.metadata.get("document_id"),
+                            "source": doc.metadata.get("source"), "chunk": doc.metadata.get("chunk")})
+        return {"text": "\n\n".join(blocks), "sources": sources, "tokens": used, "candidates": len(unique)}
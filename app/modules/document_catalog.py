@@ -0,0 +1,337 @@
+import json
+import uuid
+import base64
+import hashlib
+import binascii
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.modules.vector_index import EMBEDDING_TABLE, vector_literal
+
+CATALOG_TABLE = "document_catalog"
+VERSION_TABLE = "knowledge_version"
+
+def document_id_for(collection_id, source: str) -> str:
+    """Stable document ID of a source within a collection, so re-uploads of the same source update one document."""
+    namespace = uuid.UUID(str(collection_id)) if collection_id else uuid.NAMESPACE_URL
+    return str(uuid.uuid5(namespace, source))
+
+def chunk_hash(text: str) -> str:
+    """SHA-256 of a chunk's exact text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def encode_cursor(created_at: datetime, document_id: str) -> str:
+    """Opaque keyset cursor pointing just past the given catalog row."""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{document_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        created_at, document_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), document_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+class DocumentCatalog:
+    def __init__(self, engine: AsyncEngine):
+        """
+        Per-document catalog of the chunks stored in PGVector (source, chunk count, size, content hash),
+        kept in sync by every write going through this class. Chunks reference their document through
+        cmetadata->>'document_id'.
+        :engine: Async engine connected to the vector database
+        """
+        self.engine = engine
+
+    async def ensure(self):
+        """Create the catalog and knowledge version tables and the index that finds a document's chunks."""
+        async with self.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} (
+                    id UUID PRIMARY KEY,
+                    collection_id UUID NOT NULL REFERENCES langchain_pg_collection (uuid) ON DELETE CASCADE,
+                    source TEXT,
+                    chunk_count INT NOT NULL,
+                    size_bytes BIGINT NOT NULL,
+                    content_hash CHAR(64) NOT NULL,
+                    created_at TIMESTAMP NOT NULL,
+                    updated_at TIMESTAMP NOT NULL
+                )
+            """))
+            await conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{CATALOG_TABLE}_created "
+                f"ON {CATALOG_TABLE} (collection_id, created_at DESC, id DESC)"
+            ))
+            await conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{CATALOG_TABLE}_source ON {CATALOG_TABLE} (collection_id, source)"
+            ))
+            await conn.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+                    collection_id UUID PRIMARY KEY REFERENCES langchain_pg_collection (uuid) ON DELETE CASCADE,
+                    version BIGINT NOT NULL
+                )
+            """))
+            await conn.execute(text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{EMBEDDING_TABLE}_document_id "
+                f"ON {EMBEDDING_TABLE} ((cmetadata->>'document_id'))"
+            ))
+
+    async def version(self, collection_id) -> int:
+        """Version of the collection's knowledge base, shared by every process; 0 until it first changes."""
+        async with self.engine.connect() as conn:
+            version = (await conn.execute(text(
+                f"SELECT version FROM {VERSION_TABLE} WHERE collection_id = :collection_id"
+            ), {"collection_id": collection_id})).scalar()
+        return version or 0
+
+    async def bump_version(self, collection_id) -> int:
+        """Record that the collection's documents changed and return its new version."""
+        async with self.engine.begin() as conn:
+            return (await conn.execute(text(f"""
+                INSERT INTO {VERSION_TABLE} (collection_id, version) VALUES (:collection_id, 1)
+                ON CONFLICT (collection_id) DO UPDATE SET version = {VERSION_TABLE}.version + 1
+                RETURNING version
+            """), {"collection_id": collection_id})).scalar()
+
+    async def adopt_legacy_chunks(self):
+        """
+        Assign chunks stored before the catalog existed to a document per source and catalog them, in every
+        collection. Only touches chunks without a document_id (found through the document_id index), so it is
+        cheap once everything is catalogued; run it once at startup rather than per collection.
+        """
+        async with self.engine.begin() as conn:
+            adopted = (await conn.execute(text(f"""
+                UPDATE {EMBEDDING_TABLE}
+                SET cmetadata = COALESCE(cmetadata, '{{}}'::jsonb) || jsonb_build_object(
+                    'document_id', CAST(md5(CAST(collection_id AS TEXT) || COALESCE(cmetadata->>'source', id)) AS UUID)
+                )
+                WHERE cmetadata->>'document_id' IS NULL
+                RETURNING CAST(collection_id AS TEXT), cmetadata->>'document_id'
+            """))).all()
+            by_collection: Dict[str, set] = {}
+            for collection_id, document_id in adopted:
+                by_collection.setdefault(collection_id, set()).add(document_id)
+            for collection_id, document_ids in by_collection.items():
+                await self.refresh(collection_id, list(document_ids), conn=conn)
+
+    async def refresh(self, collection_id: str, document_ids: List[str], conn=None):
+        """
+        Recompute the catalog rows of the given documents from their chunks in one statement;
+        documents left without chunks are removed from the catalog.
+        :conn: Run inside this transaction instead of a new one
+        """
+        if not document_ids:
+            return
+        if conn is None:
+            async with self.engine.begin() as conn:
+                return await self.refresh(collection_id, document_ids, conn=conn)
+        await conn.execute(text(f"""
+            WITH stats AS (
+                SELECT cmetadata->>'document_id' AS document_id,
+                       MIN(cmetadata->>'source') AS source,
+                       COUNT(*) AS chunk_count,
+                       SUM(octet_length(document)) AS size_bytes,
+                       encode(sha256(convert_to(
+                           string_agg(document, '' ORDER BY (cmetadata->>'chunk')::INT, id), 'UTF8'
+                       )), 'hex') AS content_hash
+                FROM {EMBEDDING_TABLE}
+                WHERE collection_id = :collection_id AND cmetadata->>'document_id' = ANY(:document_ids)
+                GROUP BY 1
+            ),
+            upserted AS (
+                INSERT INTO {CATALOG_TABLE} (id, collection_id, source, chunk_count, size_bytes, content_hash, created_at, updated_at)
+                SELECT CAST(document_id AS UUID), :collection_id, source, chunk_count, size_bytes, content_hash, :now, :now
+                FROM stats
+                ON CONFLICT (id) DO UPDATE
+                SET source = EXCLUDED.source,
+                    chunk_count = EXCLUDED.chunk_count,
+                    size_bytes = EXCLUDED.size_bytes,
+                    content_hash = EXCLUDED.content_hash,
+                    updated_at = EXCLUDED.updated_at
+            )
+            DELETE FROM {CATALOG_TABLE}
+            WHERE collection_id = :collection_id
+              AND CAST(id AS TEXT) = ANY(:document_ids)
+              AND CAST(id AS TEXT) NOT IN (SELECT document_id FROM stats)
+        """), {"collection_id": collection_id, "document_ids": document_ids, "now": datetime.utcnow()})
+
+    async def source_chunks(self, collection_id: str, source: str) -> Dict[str, Optional[str]]:
+        """Return {chunk_id: chunk_hash} for every chunk currently stored for the source."""
+        async with self.engine.connect() as conn:
+            rows = (await conn.execute(text(f"""
+                SELECT id, cmetadata->>'chunk_hash'
+                FROM {EMBEDDING_TABLE}
+                WHERE collection_id = :collection_id AND cmetadata->>'document_id' IN (
+                    SELECT CAST(id AS TEXT) FROM {CATALOG_TABLE} WHERE collection_id = :collection_id AND source = :source
+                )
+            """), {"collection_id": collection_id, "source": source})).all()
+        return {r[0]: r[1] for r in rows}
+
+    async def sync_source(self, collection_id: str, source: str, document_id: str, chunks: List[dict],
+                          embed: Callable[[List[str]], Awaitable[List[List[float]]]]) -> dict:
+        """
+        Make the stored chunks of a source exactly `chunks` in one transaction: insert the ones carrying a
+        new embedding, rewrite the metadata of unchanged ones that moved, and delete the ones that vanished.
+        Re-uploads are serialized per source with an advisory lock.
+        :document_id: Document the chunks belong to (older documents of the same source are merged into it)
+        :chunks: Dicts with id, text, metadata and vector (None for chunks expected to be stored already)
+        :embed: Called for chunks without a vector that turn out not to be stored, e.g. after a concurrent re-upload
+        """
+        params = {"collection_id": collection_id, "source": source}
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text("SELECT pg_advisory_xact_lock(hashtext(CAST(:collection_id AS TEXT) || :source))"), params
+            )
+            rows = (await conn.execute(text(f"""
+                SELECT id, cmetadata->>'document_id'
+                FROM {EMBEDDING_TABLE}
+                WHERE collection_id = :collection_id AND cmetadata->>'document_id' IN (
+                    SELECT CAST(id AS TEXT) FROM {CATALOG_TABLE} WHERE collection_id = :collection_id AND source = :source
+                    UNION ALL SELECT :document_id
+                )
+            """), {**params, "document_id": document_id})).all()
+            stored = {r[0] for r in rows}
+            documents = {r[1] for r in rows} | {document_id}
+
+            missing = [c for c in chunks if c["vector"] is None and c["id"] not in stored]
+            if missing:
+                for chunk, vector in zip(missing, await embed([c["text"] for c in missing])):
+                    chunk["vector"] = vector
+            wanted = {c["id"] for c in chunks}
+            vanished = list(stored - wanted)
+            if vanished:
+                await conn.execute(
+                    text(f"DELETE FROM {EMBEDDING_TABLE} WHERE collection_id = :collection_id AND id = ANY(:ids)"),
+                    {"collection_id": collection_id, "ids": vanished}
+                )
+            added = [c for c in chunks if c["vector"] is not None]
+            if added:
+                await conn.execute(text(f"""
+                    INSERT INTO {EMBEDDING_TABLE} (id, collection_id, embedding, document, cmetadata)
+                    VALUES (:id, :collection_id, CAST(:embedding AS vector), :document, CAST(:cmetadata AS JSONB))
+                    ON CONFLICT (id) DO UPDATE
+                    SET embedding = EXCLUDED.embedding, document = EXCLUDED.document, cmetadata = EXCLUDED.cmetadata
+                """), [{
+                    "id": c["id"], "collection_id": collection_id, "embedding": vector_literal(c["vector"]),
+                    "document": c["text"], "cmetadata": json.dumps(c["metadata"])
+                } for c in added])
+            kept = [c for c in chunks if c["vector"] is None]
+            if kept:
+                # Only rows whose position or document changed are actually rewritten.
+                await conn.execute(text(f"""
+                    UPDATE {EMBEDDING_TABLE} e
+                    SET cmetadata = v.cmetadata
+                    FROM (
+                        SELECT unnest(CAST(:ids AS TEXT[])) AS id, CAST(unnest(CAST(:metadatas AS TEXT[])) AS JSONB) AS cmetadata
+                    ) v
+                    WHERE e.collection_id = :collection_id AND e.id = v.id AND e.cmetadata IS DISTINCT FROM v.cmetadata
+                """), {
+                    "collection_id": collection_id,
+                    "ids": [c["id"] for c in kept],
+                    "metadatas": [json.dumps(c["metadata"]) for c in kept]
+                })
+            await self.refresh(collection_id, list(documents), conn=conn)
+        return {"added": len(added), "unchanged": len(kept), "deleted": len(vanished)}
+
+    async def list_documents(self, collection_id: str, limit: int = 50, cursor: Optional[str] = None,
+                             source: Optional[str] = None, created_after: Optional[datetime] = None,
+                             created_before: Optional[datetime] = None) -> dict:
+        """
+        Page through the catalog, newest first, using keyset pagination.
+        :limit: Maximum number of documents per page
+        :cursor: next_cursor of the previous page (None for the first page)
+        :source: Only documents with this source
+        :created_after: Only documents created at or after this time
+        :created_before: Only documents created before this time
+        """
+        params = {"collection_id": collection_id, "limit": limit + 1}
+        conditions = ["collection_id = :collection_id"]
+        if cursor:
+            params["cursor_created_at"], params["cursor_id"] = decode_cursor(cursor)
+            conditions.append("(created_at, id) < (:cursor_created_at, CAST(:cursor_id AS UUID))")
+        if source is not None:
+            params["source"] = source
+            conditions.append("source = :source")
+        if created_after is not None:
+            params["created_after"] = created_after
+            conditions.append("created_at >= :created_after")
+        if created_before is not None:
+            params["created_before"] = created_before
+            conditions.append("created_at < :created_before")
+        async with self.engine.connect() as conn:
+            rows = (await conn.execute(text(f"""
+                SELECT id, source, chunk_count, size_bytes, content_hash, created_at, updated_at
+                FROM {CATALOG_TABLE}
+                WHERE {" AND ".join(conditions)}
+                ORDER BY created_at DESC, id DESC
+                LIMIT :limit
+            """), params)).all()
+        documents = [{
+            "id": str(r[0]), "source": r[1], "chunk_count": r[2], "size_bytes": r[3],
+            "content_hash": r[4], "created_at": r[5], "updated_at": r[6]
+        } for r in rows[:limit]]
+        next_cursor = encode_cursor(rows[limit - 1][5], str(rows[limit - 1][0])) if len(rows) > limit else None
+        return {"documents": documents, "next_cursor": next_cursor}
+
+    async def update_chunks(self, collection_id: str, chunks: List[Tuple[str, str, List[float]]]) -> List[str]:
+        """
+        Replace the text and embedding of many chunks with one UPDATE and refresh their documents,
+        all in one transaction. Returns the IDs of the chunks that existed and were updated.
+        :chunks: (chunk_id, content, vector) tuples
+        """
+        if not chunks:
+            return []
+        async with self.engine.begin() as conn:
+            rows = (await conn.execute(text(f"""
+                UPDATE {EMBEDDING_TABLE} e
+                SET document = v.document,
+                    embedding = CAST(v.embedding AS vector),
+                    cmetadata = COALESCE(e.cmetadata, '{{}}'::jsonb) || jsonb_build_object('chunk_hash', v.chunk_hash)
+                FROM (
+                    SELECT unnest(CAST(:ids AS TEXT[])) AS id,
+                           unnest(CAST(:documents AS TEXT[])) AS document,
+                           unnest(CAST(:embeddings AS TEXT[])) AS embedding,
+                           unnest(CAST(:hashes AS TEXT[])) AS chunk_hash
+                ) v
+                WHERE e.collection_id = :collection_id AND e.id = v.id
+                RETURNING e.id, e.cmetadata->>'document_id'
+            """), {
+                "collection_id": collection_id,
+                "ids": [c[0] for c in chunks],
+                "documents": [c[1] for c in chunks],
+                "embeddings": [vector_literal(c[2]) for c in chunks],
+                "hashes": [chunk_hash(c[1]) for c in chunks]
+            })).all()
+            await self.refresh(collection_id, list({r[1] for r in rows if r[1]}), conn=conn)
+        return [r[0] for r in rows]
+
+    async def delete(self, collection_id: str, ids: List[str]) -> List[Tuple[str, Optional[str]]]:
+        """
+        Delete chunks by chunk ID or, for document IDs from the catalog, all chunks of the document,
+        with a single DELETE, and refresh the affected catalog rows in the same transaction.
+        Returns (chunk_id, document_id) of every deleted chunk.
+        """
+        if not ids:
+            return []
+        async with self.engine.begin() as conn:
+            rows = (await conn.execute(text(f"""
+                DELETE FROM {EMBEDDING_TABLE}
+                WHERE collection_id = :collection_id
+                  AND (id = ANY(:ids) OR cmetadata->>'document_id' = ANY(:ids))
+                RETURNING id, cmetadata->>'document_id'
+            """), {"collection_id": collection_id, "ids": ids})).all()
+            await self.refresh(collection_id, list({r[1] for r in rows if r[1]}), conn=conn)
+        return [(r[0], r[1]) for r in rows]
+
+    async def wipe(self, collection_id: str) -> int:
+        """Delete every chunk and catalog row of the collection in one transaction; returns the number of chunks deleted."""
+        async with self.engine.begin() as conn:
+            deleted = (await conn.execute(
+                text(f"DELETE FROM {EMBEDDING_TABLE} WHERE collection_id = :collection_id"),
+                {"collection_id": collection_id}
+            )).rowcount
+            await conn.execute(
+                text(f"DELETE FROM {CATALOG_TABLE} WHERE collection_id = :collection_id"),
+                {"collection_id": collection_id}
+            )
+        return deleted
@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import logging
+import unicodedata
+from array import array
+from typing import Dict, List, Optional, Set
+from langchain_core.embeddings import Embeddings
+from app.modules.postgresdb_base import PostgresDB
+from app.modules.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+def content_hash(text: str) -> str:
+    """SHA-256 of the text after Unicode and whitespace normalization."""
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, model_name: str, store: Optional[PostgresDB] = None, max_entries: int = 10000):
+        """
+        Wrap an embeddings client with a content-addressed cache: an in-memory LRU tier
+        in front of an optional Postgres tier shared by every worker.
+        :embeddings: Underlying embeddings client
+        :model_name: Embedding model name, part of every cache key
+        :store: Database holding the persistent embedding_cache table (None keeps the cache in memory only)
+        :max_entries: Maximum number of vectors kept in memory
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.store = store
+        self.memory = TTLCache(max_size=max_entries, ttl_seconds=None)
+        self.counters = {"memory_hits": 0, "store_hits": 0, "misses": 0}
+        self._writes: Set[asyncio.Task] = set()
+
+    def _model_key(self, kind: str) -> str:
+        # Providers may embed queries and documents differently, so they are cached separately.
+        return f"{self.model_name}:{kind}"
+
+    def _from_memory(self, model_key: str, hashes: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        for h in hashes:
+            vector = self.memory.get((model_key, h))
+            if vector is not None:
+                found[h] = vector.tolist()
+        self.counters["memory_hits"] += len(found)
+        return found
+
+    def _to_memory(self, model_key: str, vectors: Dict[str, List[float]]):
+        for h, vector in vectors.items():
+            self.memory.set((model_key, h), array("f", vector))
+
+    async def _aembed(self, texts: List[str], kind: str) -> List[List[float]]:
+        model_key = self._model_key(kind)
+        hashes = [content_hash(t) for t in texts]
+        found = self._from_memory(model_key, list(dict.fromkeys(hashes)))
+
+        missing = [h for h in dict.fromkeys(hashes) if h not in found]
+        if missing and self.store is not None:
+            try:
+                stored = await self.store.get_cached_embeddings(model_key, missing)
+            except Exception:
+                logger.exception("Embedding cache lookup failed")
+                stored = {}
+            self.counters["store_hits"] += len(stored)
+            self._to_memory(model_key, stored)
+            found.update(stored)
+            missing = [h for h in missing if h not in stored]
+
+        if missing:
+            self.counters["misses"] += len(missing)
+            first_text = {h: t for h, t in zip(reversed(hashes), reversed(texts))}
+            new_texts = [first_text[h] for h in missing]
+            if kind == "query":
+                new_vectors = [await self.embeddings.aembed_query(new_texts[0])]
+            else:
+                new_vectors = await self.embeddings.aembed_documents(new_texts)
+            computed = dict(zip(missing, new_vectors))
+            self._to_memory(model_key, computed)
+            found.update(computed)
+            if self.store is not None:
+                if kind == "query":
+                    # A query is waiting for its answer: the shared tier is filled in the background.
+                    task = asyncio.create_task(self._store(model_key, computed))
+                    self._writes.add(task)
+                    task.add_done_callback(self._writes.discard)
+                else:
+                    await self._store(model_key, computed)
+
+        return [found[h] for h in hashes]
+
+    async def _store(self, model_key: str, vectors: Dict[str, List[float]]):
+        try:
+            await self.store.put_cached_embeddings(model_key, vectors)
+        except Exception:
+            logger.exception("Embedding cache write failed")
+
+    async def aclose(self):
+        """Wait for background writes to the Postgres tier; call before closing the store."""
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        # The synchronous path only uses the memory tier; the Postgres tier is reached through the async pool.
+        model_key = self._model_key(kind)
+        hashes = [content_hash(t) for t in texts]
+        found = self._from_memory(model_key, list(dict.fromkeys(hashes)))
+        missing = [h for h in dict.fromkeys(hashes) if h not in found]
+        if missing:
+            self.counters["misses"] += len(missing)
+            first_text = {h: t for h, t in zip(reversed(hashes), reversed(texts))}
+            new_texts = [first_text[h] for h in missing]
+            if kind == "query":
+                new_vectors = [self.embeddings.embed_query(new_texts[0])]
+            else:
+                new_vectors = self.embeddings.embed_documents(new_texts)
+            computed = dict(zip(missing, new_vectors))
+            self._to_memory(model_key, computed)
+            found.update(computed)
+        return [found[h] for h in hashes]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "document")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query")[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._aembed(texts, "document")
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self._aembed([text], "query"))[0]
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size of the in-memory tier."""
+        lookups = sum(self.counters.values())
+        hits = self.counters["memory_hits"] + self.counters["store_hits"]
+        return {
+            **self.counters,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+        }
@@ -0,0 +1,73 @@
+import os
+import asyncio
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+from fastapi import UploadFile
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import (
+    TextLoader,
+    CSVLoader,
+    UnstructuredMarkdownLoader,
+    UnstructuredWordDocumentLoader
+)
+
+LOADERS = {
+    ".txt": TextLoader,
+    ".csv": CSVLoader,
+    ".md": UnstructuredMarkdownLoader,
+    ".docx": UnstructuredWordDocumentLoader,
+}
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+def get_extension(filename: str) -> str:
+    """Return the lower-cased extension of a file name, raising ValueError if it is not supported."""
+    ext = os.path.splitext(filename or "")[-1].lower()
+    if ext not in LOADERS:
+        raise ValueError(f"Unsupported file format: {ext}")
+    return ext
+
+async def save_upload(upload: UploadFile, directory: str = None, chunk_bytes: int = 1024 * 1024) -> str:
+    """
+    Stream an uploaded file to a uniquely named file on disk without holding it in memory.
+    Only the extension of the client-supplied name is kept; the caller is responsible for removing the file.
+    """
+    ext = get_extension(upload.filename)
+    fd, file_path = tempfile.mkstemp(suffix=ext, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await upload.read(chunk_bytes):
+                await asyncio.to_thread(f.write, chunk)
+    except Exception:
+        os.remove(file_path)
+        raise
+    return file_path
+
+def parse_and_split(file_path: str, chunk_size: int, chunk_overlap: int) -> List[Document]:
+    """Load a file with the loader matching its extension and split it into size-bounded chunks."""
+    loader = LOADERS[get_extension(file_path)](file_path)
+    docs = loader.load()
+    if not docs:
+        raise ValueError("Document loader returned no content")
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return [chunk for chunk in splitter.split_documents(docs) if chunk.page_content.strip()]
+
+def get_parse_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Return the shared process pool used for CPU-bound parsing, creating it on first use."""
+    global _parse_pool
+    if _parse_pool is None:
+        # Spawned workers avoid forking a process that already runs an event loop and pool threads.
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _parse_pool
+
+def shutdown_parse_pool():
+    """Stop the parsing workers, if they were started."""
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=True, cancel_futures=True)
+        _parse_pool = None
@@ -0,0 +1,137 @@
+import os
+import uuid
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+from app.modules.collection_registry import CollectionRegistry
+from app.modules.postgresdb_base import PostgresDB
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue cannot accept another job."""
+
+class IngestionJobQueue:
+    def __init__(self, collections: CollectionRegistry, chat_db: PostgresDB, workers: int = 2, max_queued: int = 100,
+                 stale_after: float = 120):
+        """
+        In-process ingestion workers fed by a bounded queue, with job state persisted in Postgres.
+        Several processes may share the table: a job runs only on the worker that claimed it, and a running
+        job is taken over only once its worker has stopped sending heartbeats for stale_after seconds, and a
+        queued job only once it has waited that long. Jobs are only taken over on the host holding the upload.
+        :collections: Document managers of the collections uploads are parsed, embedded and stored into
+        :chat_db: Database holding the ingestion_jobs table
+        :workers: Number of jobs processed concurrently
+        :max_queued: Maximum number of jobs waiting for a worker before submissions are rejected
+        :stale_after: Seconds a job may wait in the queue, or run without heartbeat, before it is considered abandoned
+        """
+        self.collections = collections
+        self.chat_db = chat_db
+        self.workers = workers
+        self.stale_after = stale_after
+        # Uploads are spooled to local disk, so a job can only run on the host that accepted it.
+        self.host = socket.gethostname()
+        self.worker_id = f"{self.host}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self._queued: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    def is_full(self) -> bool:
+        return self.queue.full()
+
+    async def start(self):
+        """Start the workers and keep picking up jobs left unfinished by stopped or crashed workers."""
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._resume()))
+
+    async def stop(self):
+        """Cancel the workers; jobs in progress stay 'running' and are resumed on the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, filename: str, file_path: str, collection: Optional[str] = None) -> str:
+        """
+        Persist and enqueue a job for an upload already spooled to file_path, returning its ID.
+        :collection: Collection the document is stored into (None for the default collection)
+        """
+        if self.queue.full():
+            raise QueueFullError("Ingestion queue is full")
+        job_id = str(uuid.uuid4())
+        await self.chat_db.create_ingestion_job(job_id, filename, file_path, collection=collection, host=self.host)
+        try:
+            self.queue.put_nowait((job_id, filename, file_path, collection))
+            self._queued.add(job_id)
+        except asyncio.QueueFull:
+            await self.chat_db.update_ingestion_job(job_id, status="failed", error="Ingestion queue is full")
+            raise QueueFullError("Ingestion queue is full")
+        return job_id
+
+    def _stale_before(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.stale_after)
+
+    async def _resume(self):
+        # Periodic, since a job interrupted just before a restart only becomes stale a while later.
+        while True:
+            try:
+                for job in await self.chat_db.get_unfinished_ingestion_jobs(self._stale_before(), host=self.host):
+                    if job["id"] not in self._queued:
+                        self._queued.add(job["id"])
+                        await self.queue.put((job["id"], job["filename"], job["file_path"], job["collection"]))
+            except Exception:
+                logger.exception("Looking up unfinished ingestion jobs failed")
+            await asyncio.sleep(self.stale_after)
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.stale_after / 3)
+            try:
+                await self.chat_db.heartbeat_ingestion_job(job_id, self.worker_id)
+            except Exception:
+                logger.exception("Heartbeat of ingestion job %s failed", job_id)
+
+    async def _worker(self):
+        while True:
+            job_id, filename, file_path, collection = await self.queue.get()
+            self._queued.discard(job_id)
+            try:
+                # Whoever claims the job runs it; every other worker that queued it skips it.
+                if not await self.chat_db.claim_ingestion_job(job_id, self.worker_id, self._stale_before()):
+                    continue
+                heartbeat = asyncio.create_task(self._heartbeat(job_id))
+                try:
+                    await self._run(job_id, filename, file_path, collection)
+                finally:
+                    heartbeat.cancel()
+                    await asyncio.gather(heartbeat, return_exceptions=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ingestion job %s crashed", job_id)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job_id: str, filename: str, file_path: str, collection: Optional[str]):
+        if not os.path.exists(file_path):
+            await self.chat_db.update_ingestion_job(job_id, status="failed", error="Uploaded file is no longer available")
+            return
+
+        async def report(parsed: int, embedded: int, stored: int):
+            await self.chat_db.update_ingestion_job(job_id, parsed=parsed, embedded=embedded, stored=stored)
+
+        error: Optional[str] = None
+        try:
+            manager = await self.collections.get(collection, create=True)
+            await manager.load_and_add_doc(file_path, source=filename, on_progress=report)
+        except Exception as e:
+            error = str(e)
+        await self.chat_db.update_ingestion_job(
+            job_id, status="failed" if error else "completed", error=error
+        )
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
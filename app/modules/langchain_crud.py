@@ -1,124 +1,590 @@
 import os
+import time
 import uuid
-from typing import List
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+import asyncio
+from collections import Counter
+from contextlib import aclosing
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+import numpy as np
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
 from langchain_postgres import PGVector
-from langchain_community.document_loaders import (
-    TextLoader,
-    CSVLoader,
-    UnstructuredMarkdownLoader,
-    UnstructuredWordDocumentLoader
-)
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from app.config import config_settings
+from app.core.metrics import LLM_TOKENS, StageTimer
+from app.modules.chat_history import estimate_tokens
+from app.modules.context_packing import ContextPacker, get_reranker
+from app.modules.document_catalog import DocumentCatalog, chunk_hash, document_id_for
+from app.modules.ingestion import get_parse_pool, parse_and_split
+from app.modules.embedding_cache import CachedEmbeddings
+from app.modules.postgresdb_base import PostgresDB
+from app.modules.provider_gateway import GatewayChatModel, GatewayEmbeddings, ProviderGateway
+from app.modules.providers import build_embeddings, build_llm, embedding_model_name, is_local
+from app.modules.semantic_cache import SemanticCache
+from app.modules.vector_index import EMBEDDING_TABLE, VectorIndexManager, collection_predicate, vector_literal
 
 class LangchainDocManager:
-    def __init__(self, pg_connection_str: str, collection_name: str):
+    def __init__(self, pg_connection_str: str, collection_name: str,
+                 embedding_store: Optional[PostgresDB] = None, response_cache: Optional[SemanticCache] = None,
+                 embeddings: Optional[Embeddings] = None, llm: Optional[BaseChatModel] = None,
+                 context_packer: Optional[ContextPacker] = None, engine: Optional[AsyncEngine] = None):
+        """
+        Manage documents, retrieval and answers for one PGVector collection.
+        The engine connects on first use and the embedding/LLM clients are only built when first accessed.
+        :pg_connection_str: SQLAlchemy URL of the vector database
+        :collection_name: PGVector collection holding the documents
+        :embedding_store: Database backing the persistent embedding cache tier
+        :response_cache: Semantic cache of answers, invalidated whenever documents change
+        :embeddings: Embeddings client to use instead of the one selected by EMBEDDING_PROVIDER
+        :llm: Chat model to use instead of the one selected by LLM_PROVIDER
+        :context_packer: Context assembly to use instead of the one configured by the CONTEXT_* settings
+        :engine: Engine (and connection pool) shared with other managers; one is created from pg_connection_str otherwise
+        """
+        self.pg_connection_str = pg_connection_str
+        self.response_cache = response_cache
+        self.collection_name = collection_name
+        self.collection_id = None
+        self._embedding_store = embedding_store
+        self._embeddings = embeddings
+        self._llm = llm
+        self._vectorstore = None
+        self._cache_version_checked = float("-inf")
+        self.context_packer = context_packer or ContextPacker(
+            token_budget=config_settings.CONTEXT_TOKEN_BUDGET,
+            max_chunks=config_settings.CONTEXT_MAX_CHUNKS,
+            mmr_lambda=config_settings.CONTEXT_MMR_LAMBDA,
+            duplicate_threshold=config_settings.CONTEXT_DUPLICATE_THRESHOLD,
+            reranker=get_reranker(config_settings.CONTEXT_RERANKER, config_settings.CONTEXT_RERANKER_MODEL)
+        )
+        self._owns_engine = engine is None
         try:
-            self.embeddings = GoogleGenerativeAIEmbeddings(
-                model=config_settings.EMBEDDING_MODEL,
-                google_api_key=config_settings.GEMINI_API_KEY
+            self.engine = engine or create_async_engine(
+                pg_connection_str,
+                pool_size=config_settings.PG_VECTOR_DB_POOL_SIZE,
+                max_overflow=config_settings.PG_VECTOR_DB_POOL_MAX_OVERFLOW,
+                pool_pre_ping=True
             )
-            self.vectorstore = PGVector(
+            self.index = VectorIndexManager(
+                self.engine,
+                dimensions=config_settings.PG_VECTOR_DB_VECTOR_SIZE,
+                m=config_settings.VECTOR_INDEX_HNSW_M,
+                ef_construction=config_settings.VECTOR_INDEX_HNSW_EF_CONSTRUCTION,
+                lists=config_settings.VECTOR_INDEX_IVFFLAT_LISTS,
+                ef_search=config_settings.VECTOR_SEARCH_HNSW_EF_SEARCH,
+                probes=config_settings.VECTOR_SEARCH_IVFFLAT_PROBES,
+                text_search_config=config_settings.TEXT_SEARCH_CONFIG
+            )
+            self.catalog = DocumentCatalog(self.engine)
+        except Exception as e:
+            raise RuntimeError(f"Failed to initialize LangchainDocManager: {e}")
+
+    @property
+    def embeddings(self) -> CachedEmbeddings:
+        """Cached embeddings client, behind the embedding provider gateway unless the model runs in-process, built on first use."""
+        if not isinstance(self._embeddings, CachedEmbeddings):
+            embed_queries = None
+            injected = self._embeddings is not None
+            try:
+                client = self._embeddings
+                if not injected:
+                    client, embed_queries = build_embeddings()
+            except Exception as e:
+                raise RuntimeError(f"Failed to initialize embeddings client: {e}")
+            local = not injected and is_local(client)
+            # An injected client (a test double, another model) must never share cache keys with the configured one.
+            model_name = f"injected:{type(client).__qualname__}" if injected else embedding_model_name()
+            if not local:
+                gateway = ProviderGateway(
+                    "embeddings",
+                    rate=config_settings.PROVIDER_EMBEDDING_RATE,
+                    burst=config_settings.PROVIDER_EMBEDDING_BURST,
+                    concurrency=config_settings.PROVIDER_EMBEDDING_CONCURRENCY,
+                    queue_timeout=config_settings.PROVIDER_QUEUE_TIMEOUT,
+                    max_retries=config_settings.PROVIDER_MAX_RETRIES,
+                    base_delay=config_settings.PROVIDER_RETRY_BASE_DELAY,
+                    max_delay=config_settings.PROVIDER_RETRY_MAX_DELAY
+                )
+                client = GatewayEmbeddings(
+                    client,
+                    gateway,
+                    max_batch_size=config_settings.EMBEDDING_BATCH_MAX_SIZE,
+                    batch_window=config_settings.EMBEDDING_BATCH_WINDOW_MS / 1000,
+                    embed_queries=embed_queries
+                )
+            self._embeddings = CachedEmbeddings(
+                client,
+                model_name=model_name,
+                # Recomputing an in-process vector is cheaper than a round-trip to the shared tier.
+                store=self._embedding_store if config_settings.EMBEDDING_CACHE_PERSIST and not local else None,
+                max_entries=config_settings.EMBEDDING_CACHE_SIZE
+            )
+        return self._embeddings
+
+    @property
+    def llm(self) -> GatewayChatModel:
+        """Chat model behind the LLM provider gateway, built on first use."""
+        if not isinstance(self._llm, GatewayChatModel):
+            try:
+                client = self._llm or build_llm()
+            except Exception as e:
+                raise RuntimeError(f"Failed to initialize LLM client: {e}")
+            self._llm = GatewayChatModel(client, ProviderGateway(
+                "llm",
+                rate=config_settings.PROVIDER_LLM_RATE,
+                burst=config_settings.PROVIDER_LLM_BURST,
+                concurrency=config_settings.PROVIDER_LLM_CONCURRENCY,
+                queue_timeout=config_settings.PROVIDER_QUEUE_TIMEOUT,
+                max_retries=config_settings.PROVIDER_MAX_RETRIES,
+                base_delay=config_settings.PROVIDER_RETRY_BASE_DELAY,
+                max_delay=config_settings.PROVIDER_RETRY_MAX_DELAY
+            ))
+        return self._llm
+
+    @property
+    def vectorstore(self) -> PGVector:
+        """PGVector store sharing the manager's engine, built on first use."""
+        if self._vectorstore is None:
+            self._vectorstore = PGVector(
                 embeddings=self.embeddings,
-                connection=pg_connection_str,
-                collection_name=collection_name,
+                connection=self.engine,
+                collection_name=self.collection_name,
+                embedding_length=config_settings.PG_VECTOR_DB_VECTOR_SIZE,
                 # pre_delete_collection=True # Uncomment to wipe collection on init
             )
-            self.llm = ChatGoogleGenerativeAI(
-                model=config_settings.LLM_MODEL,
-                api_key=config_settings.GEMINI_API_KEY
-            )
+        return self._vectorstore
+
+    def for_collection(self, collection_name: str, response_cache: Optional[SemanticCache] = None) -> "LangchainDocManager":
+        """
+        Manager for another collection sharing this one's engine, provider clients (and so their rate limits
+        and embedding cache) and context packer. Call open_collection() before using it.
+        :response_cache: The new collection's own answer cache; answers must never be shared across collections
+        """
+        return LangchainDocManager(
+            self.pg_connection_str,
+            collection_name,
+            embedding_store=self._embedding_store,
+            response_cache=response_cache,
+            embeddings=self.embeddings,
+            llm=self.llm,
+            context_packer=self.context_packer,
+            engine=self.engine
+        )
+
+    async def startup(self):
+        """
+        Create the vector tables, collection and document catalog, catalog the chunks of every collection stored
+        before the catalog existed, then make sure the configured indexes exist.
+        """
+        try:
+            await self.open_collection(create=True)
+            await self.catalog.ensure()
+            await self.catalog.adopt_legacy_chunks()
+            await self.ensure_indexes()
         except Exception as e:
-            raise RuntimeError(f"Failed to initialize LangchainDocManager: {e}")
+            raise RuntimeError(f"Failed to initialize vector store: {e}")
+
+    async def open_collection(self, create: bool = False):
+        """
+        Look up the collection's ID, creating the collection first if create is set.
+        Raises LookupError if the collection does not exist and create is not set.
+        """
+        if create:
+            await self.vectorstore.acreate_collection()
+        async with self.engine.connect() as conn:
+            self.collection_id = (await conn.execute(
+                text("SELECT uuid FROM langchain_pg_collection WHERE name = :name"),
+                {"name": self.collection_name}
+            )).scalar_one_or_none()
+        if self.collection_id is None:
+            raise LookupError(f"Collection {self.collection_name} not found.")
+        if config_settings.VECTOR_INDEX_SCOPE == "collection":
+            self.index.collection_id = self.collection_id
+
+    async def ensure_indexes(self):
+        """Create the configured ANN and keyword indexes (per collection with VECTOR_INDEX_SCOPE=collection)."""
+        if config_settings.VECTOR_INDEX_TYPE != "none":
+            await self.index.ensure(config_settings.VECTOR_INDEX_TYPE)
+        if config_settings.RETRIEVAL_MODE == "hybrid":
+            await self.index.ensure_text_index()
+
+    async def close(self):
+        """Release the vector database connections, unless the engine is shared with other managers."""
+        if self._owns_engine:
+            # Collection managers share these embeddings; the owner finishes their pending cache writes.
+            if isinstance(self._embeddings, CachedEmbeddings):
+                await self._embeddings.aclose()
+            await self.engine.dispose()
+
+    async def asearch(self, query_vector: List[float], k: int = None, ef_search: int = None,
+                      probes: int = None, query_text: str = None, timer: StageTimer = None) -> List[Document]:
+        """
+        Return the k most relevant chunks for a query.
+        With query_text and RETRIEVAL_MODE=hybrid, nearest neighbours by cosine distance and full-text
+        matches are retrieved in a single statement and merged with reciprocal-rank fusion;
+        otherwise only the vector leg runs.
+        :query_vector: Embedding of the query
+        :ef_search: HNSW candidate list size for this query (defaults to VECTOR_SEARCH_HNSW_EF_SEARCH)
+        :probes: IVFFlat lists scanned for this query (defaults to VECTOR_SEARCH_IVFFLAT_PROBES)
+        :query_text: Raw query used for the keyword leg
+        :timer: Request timer the retrieval duration is recorded into
+        """
+        docs, _ = await self._search(query_vector, k, ef_search, probes, query_text, timer, with_vectors=False)
+        return docs
+
+    async def asearch_candidates(self, query_vector: List[float], k: int, query_text: str = None,
+                                 timer: StageTimer = None) -> Tuple[List[Document], np.ndarray]:
+        """Like asearch, but also return the chunks' normalized embeddings (one row per chunk) for context packing."""
+        return await self._search(query_vector, k, None, None, query_text, timer, with_vectors=True)
+
+    async def _search(self, query_vector: List[float], k: Optional[int], ef_search: Optional[int],
+                      probes: Optional[int], query_text: Optional[str], timer: Optional[StageTimer],
+                      with_vectors: bool) -> Tuple[List[Document], Optional[np.ndarray]]:
+        k = k or config_settings.VECTOR_SEARCH_K
+        # Inlined rather than bound, so per-collection partial indexes can be used (see collection_predicate).
+        in_collection = collection_predicate(self.collection_id)
+        e_in_collection = collection_predicate(self.collection_id, alias="e.")
+        params = {
+            "embedding": vector_literal(query_vector),
+            "k": k
+        }
+        vector_column = ", CAST(e.embedding AS REAL[])" if with_vectors else ""
+        if query_text and query_text.strip() and config_settings.RETRIEVAL_MODE == "hybrid":
+            statement = f"""
+                WITH vector_hits AS (
+                    SELECT id, row_number() OVER (ORDER BY distance) AS rank
+                    FROM (
+                        SELECT id, embedding <=> CAST(:embedding AS vector) AS distance
+                        FROM {EMBEDDING_TABLE}
+                        WHERE {in_collection}
+                        ORDER BY distance
+                        LIMIT :k_vector
+                    ) nearest
+                ),
+                keyword_hits AS (
+                    SELECT id, row_number() OVER (ORDER BY score DESC) AS rank
+                    FROM (
+                        SELECT e.id, ts_rank_cd(e.document_tsv, q, 1) AS score
+                        FROM {EMBEDDING_TABLE} e,
+                             websearch_to_tsquery(CAST(:text_config AS regconfig), :query_text) q
+                        WHERE {e_in_collection} AND e.document_tsv @@ q
+                        ORDER BY score DESC
+                        LIMIT :k_keyword
+                    ) matches
+                ),
+                fused AS (
+                    SELECT id, SUM(1.0 / (:rrf_k + rank)) AS score
+                    FROM (SELECT * FROM vector_hits UNION ALL SELECT * FROM keyword_hits) hits
+                    GROUP BY id
+                )
+                SELECT e.id, e.document, e.cmetadata{vector_column}
+                FROM fused f
+                JOIN {EMBEDDING_TABLE} e ON e.id = f.id
+                ORDER BY f.score DESC
+                LIMIT :k
+            """
+            params.update({
+                "query_text": query_text,
+                "text_config": config_settings.TEXT_SEARCH_CONFIG,
+                "k_vector": max(k, config_settings.HYBRID_K_VECTOR),
+                "k_keyword": max(k, config_settings.HYBRID_K_KEYWORD),
+                "rrf_k": config_settings.HYBRID_RRF_K
+            })
+        else:
+            statement = f"""
+                SELECT e.id, e.document, e.cmetadata{vector_column}
+                FROM {EMBEDDING_TABLE} e
+                WHERE {e_in_collection}
+                ORDER BY e.embedding <=> CAST(:embedding AS vector)
+                LIMIT :k
+            """
+        with (timer or StageTimer()).stage("retrieval"):
+            async with self.engine.begin() as conn:
+                await self.index.apply_search_settings(conn, ef_search=ef_search, probes=probes)
+                rows = (await conn.execute(text(statement), params)).all()
+        docs = [Document(id=r[0], page_content=r[1], metadata=r[2] or {}) for r in rows]
+        if not with_vectors:
+            return docs, None
+        vectors = np.asarray([r[3] for r in rows], dtype=np.float32).reshape(len(rows), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return docs, vectors / np.where(norms == 0, 1, norms)
 
-    async def load_and_add_doc(self, file_path: str) -> List[dict]:
-        """Asynchronously load and parse document, then store in PGVector."""
+    async def load_and_add_doc(
+        self,
+        file_path: str,
+        source: str = None,
+        on_progress: Optional[Callable[..., Awaitable[None]]] = None,
+    ) -> dict:
+        """
+        Parse and chunk a document in the worker pool and make it the current version of its source.
+        Chunk IDs are derived from the source and the chunk text, so on a re-upload only new or changed
+        chunks are embedded (in batches with bounded concurrency); unchanged chunks are kept and vanished
+        ones deleted, all in a single transaction. Re-running an interrupted ingestion is therefore safe.
+        :file_path: Path of the file to ingest
+        :source: Name identifying the document (defaults to the file name)
+        :on_progress: Coroutine called with parsed/embedded/stored counts as the ingestion advances
+        """
         try:
-            ext = os.path.splitext(file_path)[-1].lower()
-            if ext == ".txt":
-                loader = TextLoader(file_path)
-            elif ext == ".csv":
-                loader = CSVLoader(file_path)
-            elif ext == ".md":
-                loader = UnstructuredMarkdownLoader(file_path)
-            elif ext == ".docx":
-                loader = UnstructuredWordDocumentLoader(file_path)
-            else:
-                raise ValueError(f"Unsupported file format: {ext}")
-
-            docs = loader.load()
-            if not docs:
-                raise ValueError("Document loader returned no content")
-
-            enriched_docs = []
-            for doc in docs:
-                doc_id = str(uuid.uuid4())
-                enriched_docs.append(Document(
-                    page_content=doc.page_content,
-                    metadata={"id": doc_id, "source": os.path.basename(file_path)},
-                    id=doc_id
-                ))
-
-            await self.vectorstore.aadd_documents(enriched_docs)
-            return [doc.metadata for doc in enriched_docs]
+            timer = StageTimer()
+            loop = asyncio.get_running_loop()
+            with timer.stage("ingest_parse"):
+                chunks = await loop.run_in_executor(
+                    get_parse_pool(config_settings.INGEST_PARSE_WORKERS),
+                    parse_and_split,
+                    file_path,
+                    config_settings.INGEST_CHUNK_SIZE,
+                    config_settings.INGEST_CHUNK_OVERLAP
+                )
+            if not chunks:
+                raise ValueError("Document contains no text to index")
+            progress = {"parsed": len(chunks), "embedded": 0, "stored": 0}
+            if on_progress:
+                await on_progress(**progress)
+
+            source = source or os.path.basename(file_path)
+            document_id = document_id_for(self.collection_id, source)
+            stored = await self.catalog.source_chunks(self.collection_id, source)
+            occurrences = Counter()
+            pending = []
+            for index, chunk in enumerate(chunks):
+                digest = chunk_hash(chunk.page_content)
+                occurrences[digest] += 1
+                # Identical chunks within a document are told apart by their occurrence.
+                doc_id = str(uuid.uuid5(uuid.UUID(document_id), f"{digest}:{occurrences[digest]}"))
+                pending.append({
+                    "id": doc_id,
+                    "text": chunk.page_content,
+                    "metadata": {"id": doc_id, "document_id": document_id, "source": source,
+                                 "chunk": index, "chunk_hash": digest},
+                    "vector": None
+                })
+            # Chunks edited in place since (see update_document) no longer match their hash and are re-embedded.
+            changed = [c for c in pending if stored.get(c["id"]) != c["metadata"]["chunk_hash"]]
+
+            async def embedded(count: int):
+                progress["embedded"] += count
+                if on_progress:
+                    await on_progress(**progress)
+
+            vectors = await self._embed_in_batches([c["text"] for c in changed], timer, on_batch=embedded)
+            for chunk, vector in zip(changed, vectors):
+                chunk["vector"] = vector
+            with timer.stage("ingest_store"):
+                result = await self.catalog.sync_source(
+                    self.collection_id, source, document_id, pending, embed=self.embeddings.aembed_documents
+                )
+            if result["added"] or result["deleted"]:
+                await self._knowledge_changed()
+            progress["stored"] = len(pending)
+            if on_progress:
+                await on_progress(**progress)
+            return {"document_id": document_id, "source": source, "chunks": len(pending), **result}
 
         except Exception as e:
             raise RuntimeError(f"Failed to load and store document: {e}")
 
-    async def list_documents(self) -> List[dict]:
-        """Asynchronously list metadata of stored documents."""
+    async def list_documents(self, limit: int = 50, cursor: Optional[str] = None, source: Optional[str] = None,
+                             created_after: Optional[datetime] = None, created_before: Optional[datetime] = None) -> dict:
+        """Page through the document catalog, newest first; see DocumentCatalog.list_documents for the filters."""
         try:
-            docs = await self.vectorstore.asimilarity_search("", k=100)
-            return [doc.metadata for doc in docs]
+            return await self.catalog.list_documents(
+                self.collection_id, limit=limit, cursor=cursor, source=source,
+                created_after=created_after, created_before=created_before
+            )
+        except ValueError:
+            raise
         except Exception as e:
             raise RuntimeError(f"Failed to list documents: {e}")
 
-    async def update_document(self, doc_id: str, new_content: str):
-        """Asynchronously update document content."""
+    async def _embed_in_batches(self, texts: List[str], timer: StageTimer,
+                                on_batch: Optional[Callable[[int], Awaitable[None]]] = None) -> List[List[float]]:
+        """Embed texts in INGEST_BATCH_SIZE batches with at most INGEST_MAX_CONCURRENCY batches in flight, keeping order."""
+        batch_size = config_settings.INGEST_BATCH_SIZE
+        semaphore = asyncio.Semaphore(config_settings.INGEST_MAX_CONCURRENCY)
+        vectors: List[List[float]] = [None] * len(texts)
+
+        async def embed_batch(start: int):
+            async with semaphore:
+                with timer.stage("ingest_embed_batch"):
+                    batch = await self.embeddings.aembed_documents(texts[start:start + batch_size])
+                vectors[start:start + len(batch)] = batch
+                if on_batch:
+                    await on_batch(len(batch))
+
+        await asyncio.gather(*(embed_batch(i) for i in range(0, len(texts), batch_size)))
+        return vectors
+
+    async def update_documents(self, updates: List[Tuple[str, str]]) -> List[dict]:
+        """
+        Replace the content of many chunks: all new contents are embedded with batched calls and
+        written with a single UPDATE in one transaction.
+        Returns one result per ID with status "updated", "not_found" or "failed" (and the error).
+        :updates: (chunk_id, new_content) pairs; for repeated IDs the last content wins
+        """
         try:
-            if not new_content.strip():
-                raise ValueError("New content is empty")
-            doc = Document(page_content=new_content, metadata={"id": doc_id})
-            await self.vectorstore.aupdate_document(doc_id, doc)
+            results, contents = {}, {}
+            for doc_id, new_content in updates:
+                if not new_content.strip():
+                    results[doc_id] = {"id": doc_id, "status": "failed", "error": "New content is empty"}
+                    contents.pop(doc_id, None)
+                else:
+                    results[doc_id] = None
+                    contents[doc_id] = new_content
+            ids = list(contents)
+            vectors = await self._embed_in_batches([contents[i] for i in ids], StageTimer())
+            updated = set(await self.catalog.update_chunks(
+                self.collection_id, [(i, contents[i], vector) for i, vector in zip(ids, vectors)]
+            ))
+            if updated:
+                await self._knowledge_changed()
+            for doc_id in ids:
+                results[doc_id] = {"id": doc_id, "status": "updated" if doc_id in updated else "not_found"}
+            return list(results.values())
         except Exception as e:
-            raise RuntimeError(f"Failed to update document {doc_id}: {e}")
+            raise RuntimeError(f"Failed to update documents: {e}")
 
-    async def delete_document(self, doc_id: str):
-        """Asynchronously delete a document by ID."""
+    async def update_document(self, doc_id: str, new_content: str):
+        """Asynchronously replace the content of a chunk and re-embed it."""
+        result = (await self.update_documents([(doc_id, new_content)]))[0]
+        if result["status"] != "updated":
+            raise RuntimeError(f"Failed to update document {doc_id}: {result.get('error', 'not found')}")
+
+    async def delete_documents(self, ids: List[str]) -> List[dict]:
+        """
+        Delete chunks, or all chunks of catalogued documents, with a single DELETE.
+        Returns one result per ID with status "deleted" (and the number of chunks removed) or "not_found".
+        """
         try:
-            await self.vectorstore.adelete([doc_id])
+            ids = list(dict.fromkeys(ids))
+            rows = await self.catalog.delete(self.collection_id, ids)
+            if rows:
+                await self._knowledge_changed()
+            counts = Counter()
+            for chunk_id, document_id in rows:
+                counts[chunk_id] += 1
+                if document_id and document_id != chunk_id:
+                    counts[document_id] += 1
+            return [
+                {"id": i, "status": "deleted", "deleted_chunks": counts[i]} if counts[i] else {"id": i, "status": "not_found"}
+                for i in ids
+            ]
         except Exception as e:
-            raise RuntimeError(f"Failed to delete document {doc_id}: {e}")
+            raise RuntimeError(f"Failed to delete documents: {e}")
 
-    async def answer_query(self, query: str) -> str:
-        """Answer query using retrieved context and Gemini."""
-        try:
-            if not query.strip():
-                raise ValueError("Query is empty")
+    async def delete_document(self, doc_id: str) -> int:
+        """Asynchronously delete a chunk, or all chunks of a catalogued document, by ID; returns the chunks deleted."""
+        return (await self.delete_documents([doc_id]))[0].get("deleted_chunks", 0)
 
-            docs = await self.vectorstore.asimilarity_search(query)
-            context = "\n\n".join([doc.page_content for doc in docs]) if docs else "No relevant documents found."
+    async def _knowledge_changed(self):
+        """Invalidate answers cached against the previous state of the knowledge base, in every process."""
+        version = await self.catalog.bump_version(self.collection_id)
+        if self.response_cache is not None:
+            self.response_cache.set_version(version)
 
-            messages = [
-                ("system", "Use the following context to answer."),
-                ("user", f"Context:\n{context}\n\nQuestion: {query}")
-            ]
+    async def _sync_cache_version(self, cache: SemanticCache):
+        # Other processes bump the shared version when they change documents; it is re-read at most once per interval.
+        now = time.monotonic()
+        if now - self._cache_version_checked >= config_settings.SEMANTIC_CACHE_VERSION_INTERVAL:
+            self._cache_version_checked = now
+            cache.set_version(await self.catalog.version(self.collection_id))
 
-            async for chunk in self.llm.astream(messages):
-                return chunk.content
+    async def stream_answer(self, query: str, history: Optional[List[Tuple[str, str]]] = None,
+                            use_cache: bool = True, timer: Optional[StageTimer] = None) -> AsyncIterator[dict]:
+        """
+        Answer a query as it is generated: yields {"type": "token", "content"} for every chunk from the LLM,
+        then one {"type": "final", "answer", "context", "sources", "usage", "cached"}.
+        The context is packed from CONTEXT_CANDIDATES over-fetched chunks; sources carry the [ref] numbers
+        the answer cites. Closing the generator early closes the upstream LLM stream as well.
+        :query: The user's question
+        :history: (role, text) messages placed between the system prompt and the question
+        :use_cache: Set to False to bypass the semantic response cache for this call (always bypassed with history)
+        :timer: Request timer the stage durations are recorded into
+        """
+        if not query.strip():
+            raise ValueError("Query is empty")
+        timer = timer or StageTimer()
+        with timer.stage("query_embedding"):
+            query_vector = await self.embeddings.aembed_query(query)
+        # The cache is keyed by the question alone, so an answer that depends on a conversation
+        # (history or its summary) is neither served from it nor stored in it.
+        cache = self.response_cache if use_cache and not history else None
+        with timer.stage("cache_lookup"):
+            if cache is not None:
+                await self._sync_cache_version(cache)
+            cached = cache.lookup(query_vector) if cache is not None else None
+        if cached:
+            yield {"type": "token", "content": cached["answer"]}
+            yield {"type": "final", "answer": cached["answer"], "context": cached["context"],
+                   "sources": cached["sources"], "usage": None, "cached": True}
+            return
+        cache_version = cache.version if cache is not None else None
 
+        # Over-fetch, then keep the most relevant distinct chunks that fit the token budget.
+        docs, vectors = await self.asearch_candidates(
+            query_vector, k=config_settings.CONTEXT_CANDIDATES, query_text=query, timer=timer
+        )
+        with timer.stage("context_packing"):
+            packed = await asyncio.to_thread(self.context_packer.pack, query, docs, vectors)
+        context, sources = packed["text"], packed["sources"]
+        messages = [("system", "Use the following context to answer the question. "
+                               "Cite the passages you rely on by their [number].")]
+        messages += history or []
+        messages.append(("user", f"Context:\n{context}\n\nQuestion: {query}"))
+
+        # Chunks are collected in a list and joined once; repeated string concatenation is quadratic.
+        parts: List[str] = []
+        tokens_in = tokens_out = 0
+        generation_start = time.perf_counter()
+        first = True
+        async with aclosing(self.llm.astream(messages)) as stream:
+            async for chunk in stream:
+                if first:
+                    # Recorded once, on the first chunk, even if it carries no content.
+                    timer.record("ttft", time.perf_counter() - generation_start)
+                    first = False
+                usage = getattr(chunk, "usage_metadata", None)
+                if usage:
+                    tokens_in += usage.get("input_tokens", 0)
+                    tokens_out += usage.get("output_tokens", 0)
+                content = chunk.content if hasattr(chunk, "content") else str(chunk)
+                if content:
+                    parts.append(content)
+                    yield {"type": "token", "content": content}
+        timer.record("generation", time.perf_counter() - generation_start)
+        answer = "".join(parts)
+
+        # Fall back to an estimate when the provider does not report usage.
+        tokens_in = tokens_in or sum(estimate_tokens(text) for _, text in messages)
+        tokens_out = tokens_out or estimate_tokens(answer)
+        LLM_TOKENS.labels("in").inc(tokens_in)
+        LLM_TOKENS.labels("out").inc(tokens_out)
+        if cache is not None:
+            cache.store(query_vector, query, answer, context, cache_version, sources=sources)
+        yield {"type": "final", "answer": answer, "context": context, "sources": sources,
+               "usage": {"input_tokens": tokens_in, "output_tokens": tokens_out}, "cached": False}
+
+    async def answer_query(self, query: str, use_cache: bool = True) -> str:
+        """Answer query using retrieved context and Gemini, returning the complete answer.
+        :query: The user's question
+        :use_cache: Set to False to bypass the semantic response cache for this call
+        """
+        try:
+            async for event in self.stream_answer(query, use_cache=use_cache):
+                if event["type"] == "final":
+                    return event["answer"]
             raise RuntimeError("No response received from Gemini")
         except Exception as e:
             raise RuntimeError(f"Failed to answer query: {e}")
 
     async def wipe_vectorstore(self):
-        """Asynchronously delete all documents."""
+        """Delete all documents of the collection with a single set-based delete."""
         try:
-            list_documents = await self.list_documents()
-            if not list_documents:
+            deleted = await self.catalog.wipe(self.collection_id)
+            await self._knowledge_changed()
+            if not deleted:
                 return {"message": "No documents to delete."}
-            await self.vectorstore.adelete([doc["id"] for doc in list_documents])
-            return {"message": "Vector store wiped successfully."}
+            return {"message": "Vector store wiped successfully.", "deleted_chunks": deleted}
         except Exception as e:
             raise RuntimeError(f"Failed to wipe vector store: {e}")
@@ -0,0 +1,260 @@
+"""
+CPU-only model backends for offline or air-gapped operation.
+
+LocalEmbeddings serves a static embedding model: a token vocabulary and one vector per token, stored as
+
+    <model dir>/vocab.txt        one token per line; line i is row i of the matrix
+    <model dir>/embeddings.npy   (vocabulary size, dimensions) float16 or float32 matrix
+
+A text is embedded as the normalized mean of its tokens' vectors, so a batch costs one gather and one
+reduceat in NumPy. The matrix is memory-mapped read-only: it is loaded once per process, and the OS page
+cache shares its pages between all workers on the host. Any word-vector table in the common text format
+(fastText .vec, GloVe, a distilled static model exported as text) can be converted with
+
+    python -m app.modules.local_models convert vectors.txt models/static
+"""
+import os
+import re
+import sys
+import asyncio
+import hashlib
+import argparse
+import functools
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_TOKEN = re.compile(r"\w+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_PASSAGE = re.compile(r"^\[(\d+)\] \(.*\)$", re.MULTILINE)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+class HashingEmbeddings(Embeddings):
+    def __init__(self, dimensions: int = 768):
+        """
+        Model-free feature-hashing embeddings: every word adds +-1 to a bucket picked by its hash, so texts
+        sharing words get similar vectors. Needs no model file; retrieval is lexical rather than semantic.
+        :dimensions: Vector size
+        """
+        self.dimensions = dimensions
+
+    @staticmethod
+    @functools.lru_cache(maxsize=100000)
+    def _feature(token: str, dimensions: int) -> tuple:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest[:4], "little") % dimensions, 1.0 if digest[4] & 1 else -1.0
+
+    def _vectors(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        rows, buckets, signs = [], [], []
+        for row, text in enumerate(texts):
+            for token in _TOKEN.findall(text.lower()):
+                bucket, sign = self._feature(token, self.dimensions)
+                rows.append(row)
+                buckets.append(bucket)
+                signs.append(sign)
+        np.add.at(vectors, (np.asarray(rows, dtype=np.intp), np.asarray(buckets, dtype=np.intp)),
+                  np.asarray(signs, dtype=np.float32))
+        return _normalize(vectors)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._vectors(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vectors([text])[0].tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # A single query takes well under a millisecond; a thread hop would cost more than it saves.
+        return self.embed_query(text)
+
+class StaticModel:
+    def __init__(self, directory: str):
+        """Vocabulary and memory-mapped embedding matrix of a static model directory (see the module docstring)."""
+        with open(os.path.join(directory, "vocab.txt"), encoding="utf-8") as f:
+            self.vocab: Dict[str, int] = {line.rstrip("\n"): i for i, line in enumerate(f)}
+        self.matrix = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+        if self.matrix.ndim != 2 or self.matrix.shape[0] != len(self.vocab):
+            raise ValueError(
+                f"{directory}: embeddings.npy has shape {self.matrix.shape}, expected ({len(self.vocab)}, dimensions)"
+            )
+        self.dimensions = int(self.matrix.shape[1])
+
+@functools.lru_cache(maxsize=4)
+def load_static_model(directory: str) -> StaticModel:
+    """Load a static model once per process; every LocalEmbeddings using the directory shares it."""
+    return StaticModel(os.path.abspath(directory))
+
+class LocalEmbeddings(Embeddings):
+    def __init__(self, model_path: str, dimensions: Optional[int] = None, batch_size: int = 256, lowercase: bool = True):
+        """
+        Embeddings from a local static model: mean of the token vectors, L2-normalized. Unknown tokens are skipped.
+        :model_path: Model directory holding vocab.txt and embeddings.npy
+        :dimensions: Expected vector size (the vector column's size); a mismatching model is rejected
+        :batch_size: Texts embedded per NumPy pass, bounding the memory of one gather
+        :lowercase: Lowercase texts before tokenizing (must match how the vocabulary was built)
+        """
+        self.model = load_static_model(model_path)
+        if dimensions is not None and self.model.dimensions != dimensions:
+            raise ValueError(
+                f"Local embedding model has {self.model.dimensions} dimensions, "
+                f"but the vector store expects {dimensions} (PG_VECTOR_DB_VECTOR_SIZE)"
+            )
+        self.batch_size = batch_size
+        self.lowercase = lowercase
+
+    def _token_ids(self, text: str) -> List[int]:
+        vocab = self.model.vocab
+        tokens = _TOKEN.findall(text.lower() if self.lowercase else text)
+        return [vocab[t] for t in tokens if t in vocab]
+
+    def _vectors(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.model.dimensions), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            ids = [self._token_ids(t) for t in texts[start:start + self.batch_size]]
+            counts = np.fromiter((len(i) for i in ids), dtype=np.intp, count=len(ids))
+            if not counts.any():
+                continue
+            # One gather for the whole batch, then per-text sums over the contiguous runs of rows.
+            rows = self.model.matrix[np.concatenate([np.asarray(i, dtype=np.intp) for i in ids])].astype(np.float32)
+            nonempty = np.flatnonzero(counts)
+            offsets = np.concatenate(([0], np.cumsum(counts[nonempty])[:-1]))
+            sums = np.add.reduceat(rows, offsets, axis=0)
+            out[start + nonempty] = sums / counts[nonempty, None]
+        return _normalize(out)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._vectors(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vectors([text])[0].tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # A single query takes well under a millisecond; a thread hop would cost more than it saves.
+        return self.embed_query(text)
+
+class StubChatModel(BaseChatModel):
+    """
+    Deterministic, extractive stand-in for an LLM. For a RAG prompt it answers with the context sentences
+    sharing the most words with the question, citing their passages; otherwise it returns the start of the
+    last message. It makes the service runnable air-gapped and its answers reproducible.
+    """
+
+    max_words: int = 60
+    """Upper bound on the words of an answer."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "local-stub"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        prompt = str(messages[-1].content) if messages else ""
+        if "Context:\n" not in prompt or "\n\nQuestion: " not in prompt:
+            return " ".join(prompt.split()[:self.max_words])
+        context, question = prompt.split("Context:\n", 1)[1].rsplit("\n\nQuestion: ", 1)
+        terms = set(_TOKEN.findall(question.lower()))
+        headers = list(_PASSAGE.finditer(context))
+        candidates = []
+        for n, header in enumerate(headers):
+            end = headers[n + 1].start() if n + 1 < len(headers) else len(context)
+            for position, sentence in enumerate(_SENTENCE.split(context[header.end():end].strip())):
+                overlap = len(terms & set(_TOKEN.findall(sentence.lower())))
+                if overlap:
+                    # Ties go to the earlier passage (ranked higher by retrieval), then the earlier sentence.
+                    candidates.append((-overlap, n, position, sentence.strip(), header.group(1)))
+        if not candidates:
+            return "The provided documents do not answer this question."
+        words, parts = 0, []
+        for _, _, _, sentence, ref in sorted(candidates):
+            sentence_words = sentence.split()
+            if parts and words + len(sentence_words) > self.max_words:
+                break
+            parts.append(f"{' '.join(sentence_words[:self.max_words])} [{ref}]")
+            words += len(sentence_words)
+        return " ".join(parts)
+
+    @staticmethod
+    def _usage(messages: List[BaseMessage], answer: str) -> dict:
+        input_tokens = sum(len(str(m.content)) // 4 + 1 for m in messages)
+        output_tokens = len(answer) // 4 + 1
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        answer = self._answer(messages)
+        message = AIMessage(content=answer, usage_metadata=self._usage(messages, answer))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        answer = self._answer(messages)
+        words = answer.split(" ")
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=word if last else f"{word} ", usage_metadata=self._usage(messages, answer) if last else None
+            ))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        for chunk in self._stream(messages, stop=stop, **kwargs):
+            yield chunk
+
+def convert_word_vectors(source: str, directory: str, max_words: Optional[int] = None, lowercase: bool = True):
+    """
+    Convert a word-vector text file ("word v1 v2 ...", optionally preceded by a "count dimensions" header line)
+    into a static model directory, storing the matrix as float16. With lowercase, only the first (usually most
+    frequent) vector of words differing in case is kept.
+    """
+    words, vectors, dimensions = [], [], None
+    seen = set()
+    with open(source, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            fields = line.rstrip().split(" ")
+            if dimensions is None and len(fields) == 2:
+                continue
+            word, values = fields[0], fields[1:]
+            dimensions = dimensions or len(values)
+            if len(values) != dimensions:
+                continue
+            word = word.lower() if lowercase else word
+            if word in seen:
+                continue
+            seen.add(word)
+            words.append(word)
+            vectors.append(np.asarray(values, dtype=np.float32))
+            if max_words and len(words) >= max_words:
+                break
+    if not words:
+        raise ValueError(f"No word vectors found in {source}")
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "embeddings.npy"), np.stack(vectors).astype(np.float16))
+    with open(os.path.join(directory, "vocab.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(words) + "\n")
+    return len(words), dimensions
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Prepare local static embedding models.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="Convert a word-vector text file into a model directory")
+    convert.add_argument("source", help="Word-vector text file (fastText .vec, GloVe, ...)")
+    convert.add_argument("directory", help="Model directory to write")
+    convert.add_argument("--max-words", type=int, help="Keep only the first N words")
+    convert.add_argument("--keep-case", action="store_true", help="Do not lowercase the vocabulary")
+    args = parser.parse_args(argv)
+    count, dimensions = convert_word_vectors(args.source, args.directory, args.max_words, not args.keep_case)
+    print(f"Wrote {count} words x {dimensions} dimensions to {args.directory}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Tuple
+from psycopg import AsyncConnection, AsyncCursor
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant shared by every worker, so only one of them applies migrations at a time.
+MIGRATION_LOCK_ID = 7_231_004_517
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+async def create_month_partitions(cur: AsyncCursor, table: str, key: str, start: datetime, months: int) -> List[str]:
+    """
+    Create the monthly partitions of a range-partitioned table covering `months` months from start.
+    Rows that already landed in the table's default partition for a new month are moved into it.
+    Returns the names of the partitions that did not exist yet.
+    """
+    created = []
+    default = f"{table}_default"
+    await cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (default,))
+    has_default = (await cur.fetchone())[0]
+    month = month_start(start)
+    for _ in range(months):
+        name = partition_name(table, month)
+        upper = add_months(month, 1)
+        await cur.execute("SELECT to_regclass(%s) IS NULL;", (name,))
+        if (await cur.fetchone())[0]:
+            moved = 0
+            if has_default:
+                # A new partition cannot be created while the default one holds rows of its range.
+                await cur.execute(f"CREATE TEMP TABLE _moved_rows (LIKE {table});")
+                await cur.execute(
+                    f'WITH moved AS (DELETE FROM {default} WHERE "{key}" >= %s AND "{key}" < %s RETURNING *) '
+                    f"INSERT INTO _moved_rows SELECT * FROM moved;",
+                    (month, upper)
+                )
+                moved = cur.rowcount
+            # DDL takes no bind parameters; the bounds are dates formatted here, never user input.
+            await cur.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}');"
+            )
+            if has_default:
+                await cur.execute(f"INSERT INTO {table} SELECT * FROM _moved_rows;")
+                await cur.execute("DROP TABLE _moved_rows;")
+            if moved:
+                logger.warning("Moved %d rows of %s from %s into the new partition %s; partitions were not "
+                               "created ahead of time", moved, table, default, name)
+            created.append(name)
+        month = upper
+    return created
+
+async def _baseline(cur: AsyncCursor):
+    """Schema as created before migrations were versioned; a no-op on databases that already have it."""
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            id SERIAL PRIMARY KEY,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            deleted_at TIMESTAMP DEFAULT NULL
+        );
+    """)
+    await cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_chat_sessions_active
+        ON chat_sessions (created_at)
+        WHERE deleted_at IS NULL;
+    """)
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id SERIAL PRIMARY KEY,
+            session_id INT REFERENCES chat_sessions(id) ON DELETE CASCADE,
+            message TEXT NOT NULL,
+            sender TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    await cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_chat_messages_session_id
+        ON chat_messages (session_id, id);
+    """)
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS chat_summaries (
+            session_id INT PRIMARY KEY REFERENCES chat_sessions(id) ON DELETE CASCADE,
+            summary TEXT NOT NULL,
+            last_message_id INT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS ingestion_jobs (
+            id UUID PRIMARY KEY,
+            filename TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            parsed INT NOT NULL DEFAULT 0,
+            embedded INT NOT NULL DEFAULT 0,
+            stored INT NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    await cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_unfinished
+        ON ingestion_jobs (created_at)
+        WHERE status IN ('queued', 'running');
+    """)
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            model TEXT NOT NULL,
+            content_hash CHAR(64) NOT NULL,
+            embedding REAL[] NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (model, content_hash)
+        );
+    """)
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS chat_audit (
+            id SERIAL PRIMARY KEY,
+            chat_id INT REFERENCES chat_sessions(id) ON DELETE SET NULL,
+            question TEXT,
+            response TEXT,
+            retrieved_docs TEXT,
+            latency_ms INT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            feedback TEXT
+        );
+    """)
+    await cur.execute("""
+        ALTER TABLE chat_audit ADD COLUMN IF NOT EXISTS latency_breakdown JSONB;
+    """)
+
+async def _convert_to_partitioned(cur: AsyncCursor, table: str, key: str, create_parent: str, indexes: List[str]):
+    """
+    Replace an unpartitioned table by a table range-partitioned by month on `key`.
+    Existing rows are not copied: the old table is attached as one partition covering everything up to
+    the month after its newest row, so the migration only builds the new indexes on it.
+    """
+    legacy = f"{table}_legacy"
+    await cur.execute(f"ALTER TABLE {table} RENAME TO {legacy};")
+    await cur.execute(f"ALTER TABLE {legacy} RENAME CONSTRAINT {table}_pkey TO {legacy}_pkey;")
+    # The sequence moves to the new parent; the legacy partition must not depend on it once detached.
+    await cur.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP DEFAULT;")
+    await cur.execute(f'UPDATE {legacy} SET "{key}" = TIMESTAMP \'1970-01-01\' WHERE "{key}" IS NULL;')
+    await cur.execute(f'ALTER TABLE {legacy} ALTER COLUMN "{key}" SET NOT NULL;')
+    await cur.execute(create_parent)
+    await cur.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id;")
+    for statement in indexes:
+        await cur.execute(statement)
+
+    await cur.execute(f'SELECT max("{key}") FROM {legacy};')
+    newest = (await cur.fetchone())[0]
+    now = month_start(datetime.utcnow())
+    if newest is None:
+        await cur.execute(f"DROP TABLE {legacy};")
+        first = now
+    else:
+        first = add_months(month_start(newest), 1)
+        await cur.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO ('{first:%Y-%m-%d}');"
+        )
+    # Up to next month; the retention job keeps creating partitions ahead of time from here on.
+    months = (now.year - first.year) * 12 + now.month - first.month + 2
+    await create_month_partitions(cur, table, key, first, max(months, 1))
+
+async def _partition_chat_tables(cur: AsyncCursor):
+    """Partition chat_messages and chat_audit by month and add the indexes used by reads and retention."""
+    await cur.execute("ALTER INDEX IF EXISTS idx_chat_messages_session_id RENAME TO idx_chat_messages_legacy_session_id;")
+    await _convert_to_partitioned(cur, "chat_messages", "created_at", """
+        CREATE TABLE chat_messages (
+            id INT NOT NULL DEFAULT nextval('chat_messages_id_seq'),
+            session_id INT REFERENCES chat_sessions(id) ON DELETE CASCADE,
+            message TEXT NOT NULL,
+            sender TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at);
+    """, [
+        "CREATE INDEX idx_chat_messages_session_id ON chat_messages (session_id, id);",
+    ])
+    await _convert_to_partitioned(cur, "chat_audit", "timestamp", """
+        CREATE TABLE chat_audit (
+            id INT NOT NULL DEFAULT nextval('chat_audit_id_seq'),
+            chat_id INT REFERENCES chat_sessions(id) ON DELETE SET NULL,
+            question TEXT,
+            response TEXT,
+            retrieved_docs TEXT,
+            latency_ms INT,
+            "timestamp" TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            feedback TEXT,
+            latency_breakdown JSONB,
+            PRIMARY KEY (id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp");
+    """, [
+        # Also serves the ON DELETE SET NULL lookups when sessions are purged.
+        'CREATE INDEX idx_chat_audit_chat_id ON chat_audit (chat_id, "timestamp");',
+    ])
+    await cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_chat_sessions_deleted
+        ON chat_sessions (deleted_at)
+        WHERE deleted_at IS NOT NULL;
+    """)
+
+async def _ingestion_job_collection(cur: AsyncCursor):
+    """Remember which collection an ingestion job stores into, so interrupted jobs resume into the right one."""
+    await cur.execute("ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS collection TEXT;")
+
+async def _default_partitions(cur: AsyncCursor):
+    """
+    Give the partitioned tables a default partition, so inserts beyond the premade months (retention
+    loop disabled or stalled) are kept instead of failing; ensure_partitions moves them out later.
+    """
+    for table in ("chat_messages", "chat_audit"):
+        await cur.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT;")
+
+async def _ingestion_job_claims(cur: AsyncCursor):
+    """Record which worker runs an ingestion job and when it last reported, so jobs are claimed once."""
+    await cur.execute("ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS worker TEXT;")
+    await cur.execute("ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP;")
+
+async def _ingestion_job_host(cur: AsyncCursor):
+    """Record the host whose spool directory holds a job's upload; only that host can run the job."""
+    await cur.execute("ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS host TEXT;")
+
+# Append only: a migration's version and behaviour must never change once released.
+MIGRATIONS: List[Tuple[int, str, Callable[[AsyncCursor], Awaitable[None]]]] = [
+    (1, "baseline schema", _baseline),
+    (2, "partition chat_messages and chat_audit by month", _partition_chat_tables),
+    (3, "ingestion job collection", _ingestion_job_collection),
+    (4, "default partitions of the chat tables", _default_partitions),
+    (5, "ingestion job claims", _ingestion_job_claims),
+    (6, "ingestion job host", _ingestion_job_host),
+]
+
+async def migrate(conninfo: str, target: Optional[int] = None) -> List[int]:
+    """
+    Apply pending migrations in order, each in its own transaction, and record them in schema_migrations.
+    Workers starting together serialize on an advisory lock, so each migration runs once.
+    :conninfo: Connection string of the chat database
+    :target: Highest version to apply (None applies all)
+    Returns the versions applied by this call.
+    """
+    applied = []
+    async with await AsyncConnection.connect(conninfo, autocommit=True) as conn:
+        await conn.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_ID,))
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            done = {r[0] for r in await (await conn.execute("SELECT version FROM schema_migrations;")).fetchall()}
+            for version, name, apply in MIGRATIONS:
+                if version in done or (target is not None and version > target):
+                    continue
+                logger.info("Applying migration %d: %s", version, name)
+                async with conn.transaction():
+                    async with conn.cursor() as cur:
+                        await apply(cur)
+                        await cur.execute(
+                            "INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s, %s, %s);",
+                            (version, name, datetime.utcnow())
+                        )
+                applied.append(version)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_ID,))
+    return applied
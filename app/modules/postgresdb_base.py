@@ -1,101 +1,232 @@
-import psycopg2
+import re
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import BinaryIO, List
+from psycopg import AsyncConnection
+from psycopg.conninfo import make_conninfo
+from psycopg.types.json import Jsonb
+from psycopg_pool import AsyncConnectionPool
+from app.modules.ttl_cache import TTLCache
+from app.core.metrics import observe_db
+from app.modules.migrations import create_month_partitions, migrate
+
+# Tables partitioned by month (see migrations), with their partition key.
+PARTITIONED_TABLES = {"chat_messages": "created_at", "chat_audit": "timestamp"}
+# Bytes of COPY output handed to the writer thread at once.
+EXPORT_CHUNK_BYTES = 1 << 20
+MAINTENANCE_LOCK_ID = 7_231_004_518
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
 
 class PostgresDB:
-    def __init__(self, dbname: str, user: str, password: str, host: str = "localhost", port: str = "5432"):
+    def __init__(
+        self,
+        dbname: str,
+        user: str,
+        password: str,
+        host: str = "localhost",
+        port: str = "5432",
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 30.0,
+        max_idle: float = 600.0,
+        session_cache_size: int = 10000,
+        session_cache_ttl: float = 60.0,
+    ):
         """
-        Initialize the connection to the PostgreSQL database and create the necessary tables.
+        Prepare an async connection pool for the PostgreSQL database.
+        The pool is not opened here; call `open()` on startup and `close()` on shutdown.
         :dbname: Name of the database
         :user: Database user
         :password: Password for the database user
         :host: Host where the database is located (default is localhost)
         :port: Port number for the database connection (default is 5432)
+        :min_size: Minimum number of connections kept open in the pool
+        :max_size: Maximum number of connections the pool may open
+        :timeout: Seconds to wait for a free connection before failing
+        :max_idle: Seconds an idle connection is kept before being closed
+        :session_cache_size: Maximum number of active session IDs cached in-process
+        :session_cache_ttl: Seconds a cached active session is trusted without re-checking the database
         """
-        self.conn = psycopg2.connect(
-            database=dbname, user=user, password=password, host=host, port=port
+        self.conninfo = make_conninfo(dbname=dbname, user=user, password=password, host=host, port=port)
+        self.pool = AsyncConnectionPool(
+            self.conninfo,
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            max_idle=max_idle,
+            # Health-check connections on checkout so broken ones are replaced transparently.
+            check=AsyncConnectionPool.check_connection,
+            open=False,
         )
-        self._init_tables()
-
-    def _init_tables(self):
-        """Initialize the tables for chat sessions and messages."""
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS chat_sessions (
-                    id SERIAL PRIMARY KEY,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    deleted_at TIMESTAMP DEFAULT NULL
-                );
-            """)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS chat_messages (
-                    id SERIAL PRIMARY KEY,
-                    session_id INT REFERENCES chat_sessions(id) ON DELETE CASCADE,
-                    message TEXT NOT NULL,
-                    sender TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS chat_audit (
-                    id SERIAL PRIMARY KEY,
-                    chat_id INT REFERENCES chat_sessions(id) ON DELETE SET NULL,
-                    question TEXT,
-                    response TEXT,
-                    retrieved_docs TEXT,
-                    latency_ms INT,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    feedback TEXT
-                );
-            """)
-
-        self.conn.commit()
-
-    def create_session(self):
+        # Only known-active sessions are cached; deletions from other workers are seen once the TTL expires.
+        self.session_cache = TTLCache(max_size=session_cache_size, ttl_seconds=session_cache_ttl)
+
+    async def open(self):
+        """Open the connection pool and bring the schema up to date."""
+        await self.pool.open(wait=True)
+        await migrate(self.conninfo)
+
+    @observe_db("create_session")
+    async def create_session(self):
         """Create a new chat session and return its ID."""
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO chat_sessions (created_at)
-                VALUES (%s)
-                RETURNING id;
-            """, (datetime.utcnow(),))
-            session_id = cur.fetchone()[0]
-        self.conn.commit()
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    INSERT INTO chat_sessions (created_at)
+                    VALUES (%s)
+                    RETURNING id;
+                """, (datetime.utcnow(),))
+                session_id = (await cur.fetchone())[0]
+        self.session_cache.set(session_id, True)
         return session_id
 
-    def get_active_sessions(self):
+    @observe_db("is_session_active")
+    async def is_session_active(self, session_id: int) -> bool:
+        """Check whether a chat session exists and is not deleted, using the in-process cache first."""
+        if session_id in self.session_cache:
+            return True
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT 1
+                    FROM chat_sessions
+                    WHERE id = %s AND deleted_at IS NULL;
+                """, (session_id,))
+                active = await cur.fetchone() is not None
+        if active:
+            self.session_cache.set(session_id, True)
+        return active
+
+    @observe_db("get_active_sessions")
+    async def get_active_sessions(self):
         """Retrieve all active chat sessions."""
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, created_at
-                FROM chat_sessions
-                WHERE deleted_at IS NULL
-                ORDER BY created_at ASC;
-            """)
-            return [{"id": row[0], "created_at": row[1]} for row in cur.fetchall()]
-
-    def add_message(self, session_id: int, message: str, sender: str):
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT id, created_at
+                    FROM chat_sessions
+                    WHERE deleted_at IS NULL
+                    ORDER BY created_at ASC;
+                """)
+                rows = await cur.fetchall()
+        return [{"id": row[0], "created_at": row[1]} for row in rows]
+
+    @observe_db("add_message")
+    async def add_message(self, session_id: int, message: str, sender: str):
         """Add a message to a chat session."""
-        with self.conn.cursor() as cur:
-            cur.execute("""
+        async with self.pool.connection() as conn:
+            await conn.execute("""
                 INSERT INTO chat_messages (session_id, message, sender, created_at)
                 VALUES (%s, %s, %s, %s);
             """, (session_id, message, sender, datetime.utcnow()))
-        self.conn.commit()
 
-    def get_messages(self, session_id: int):
+    @observe_db("write_batch")
+    async def write_batch(self, messages: list, audits: list):
+        """Bulk-insert buffered messages and audit records with COPY in a single transaction.
+        :messages: Rows of (session_id, message, sender, created_at)
+        :audits: Rows of (chat_id, question, response, retrieved_docs, latency_ms, timestamp, feedback, latency_breakdown)
+        """
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                if messages:
+                    async with cur.copy(
+                        "COPY chat_messages (session_id, message, sender, created_at) FROM STDIN"
+                    ) as copy:
+                        for row in messages:
+                            await copy.write_row(row)
+                if audits:
+                    async with cur.copy(
+                        "COPY chat_audit (chat_id, question, response, retrieved_docs, latency_ms, timestamp, feedback, latency_breakdown) FROM STDIN"
+                    ) as copy:
+                        for row in audits:
+                            await copy.write_row((*row[:7], Jsonb(row[7]) if row[7] is not None else None))
+
+    @observe_db("get_messages")
+    async def get_messages(self, session_id: int):
         """Retrieve all messages for a specific chat session."""
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                SELECT m.id, m.message, m.sender, m.created_at
-                FROM chat_messages m
-                JOIN chat_sessions s ON m.session_id = s.id
-                WHERE m.session_id = %s AND s.deleted_at IS NULL
-                ORDER BY m.created_at ASC;
-            """, (session_id,))
-            rows = cur.fetchall()
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT m.id, m.message, m.sender, m.created_at
+                    FROM chat_messages m
+                    JOIN chat_sessions s ON m.session_id = s.id
+                    WHERE m.session_id = %s AND s.deleted_at IS NULL
+                    ORDER BY m.created_at ASC;
+                """, (session_id,))
+                rows = await cur.fetchall()
+        return [{"id": r[0], "message": r[1], "sender": r[2], "created_at": r[3]} for r in rows]
+
+    @observe_db("get_recent_messages")
+    async def get_recent_messages(self, session_id: int, limit: int, before_id: int = None):
+        """Retrieve up to `limit` messages older than `before_id` (newest first), using keyset pagination.
+        :session_id: ID of the chat session
+        :limit: Maximum number of messages to return
+        :before_id: Only return messages with an ID lower than this (None starts from the newest message)
+        """
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT id, message, sender, created_at
+                    FROM chat_messages
+                    WHERE session_id = %s AND (%s::INT IS NULL OR id < %s)
+                    ORDER BY id DESC
+                    LIMIT %s;
+                """, (session_id, before_id, before_id, limit))
+                rows = await cur.fetchall()
         return [{"id": r[0], "message": r[1], "sender": r[2], "created_at": r[3]} for r in rows]
 
-    def add_audit(self, chat_id, question, response, retrieved_docs, latency_ms, feedback=None):
+    @observe_db("get_messages_range")
+    async def get_messages_range(self, session_id: int, after_id: int, before_id: int, limit: int,
+                                 newest_first: bool = False):
+        """
+        Retrieve up to `limit` messages with after_id < id < before_id in chronological order,
+        or the newest ones first with newest_first.
+        """
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                # The direction is one of two literals, never user input.
+                await cur.execute(f"""
+                    SELECT id, message, sender, created_at
+                    FROM chat_messages
+                    WHERE session_id = %s AND id > %s AND id < %s
+                    ORDER BY id {"DESC" if newest_first else "ASC"}
+                    LIMIT %s;
+                """, (session_id, after_id, before_id, limit))
+                rows = await cur.fetchall()
+        return [{"id": r[0], "message": r[1], "sender": r[2], "created_at": r[3]} for r in rows]
+
+    @observe_db("get_summary")
+    async def get_summary(self, session_id: int):
+        """Retrieve the rolling summary of a chat session, or None if nothing has been summarized yet."""
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT summary, last_message_id, updated_at
+                    FROM chat_summaries
+                    WHERE session_id = %s;
+                """, (session_id,))
+                row = await cur.fetchone()
+        if row is None:
+            return None
+        return {"summary": row[0], "last_message_id": row[1], "updated_at": row[2]}
+
+    @observe_db("upsert_summary")
+    async def upsert_summary(self, session_id: int, summary: str, last_message_id: int):
+        """Store the rolling summary of a chat session covering messages up to last_message_id."""
+        async with self.pool.connection() as conn:
+            await conn.execute("""
+                INSERT INTO chat_summaries (session_id, summary, last_message_id, updated_at)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (session_id) DO UPDATE
+                SET summary = EXCLUDED.summary,
+                    last_message_id = EXCLUDED.last_message_id,
+                    updated_at = EXCLUDED.updated_at
+                WHERE chat_summaries.last_message_id < EXCLUDED.last_message_id;
+            """, (session_id, summary, last_message_id, datetime.utcnow()))
+
+    @observe_db("add_audit")
+    async def add_audit(self, chat_id, question, response, retrieved_docs, latency_ms, feedback=None, latency_breakdown=None):
         """Add an audit record for a chat session.
         :chat_id: ID of the chat session
         :question: User's question
@@ -103,11 +234,12 @@ class PostgresDB:
         :retrieved_docs: Retrieved documents for context
         :latency_ms: Latency in milliseconds
         :feedback: Optional feedback from the user
+        :latency_breakdown: Optional per-stage timings and token counts
         """
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO chat_audit (chat_id, question, response, retrieved_docs, latency_ms, timestamp, feedback)
-                VALUES (%s, %s, %s, %s, %s, %s, %s);
+        async with self.pool.connection() as conn:
+            await conn.execute("""
+                INSERT INTO chat_audit (chat_id, question, response, retrieved_docs, latency_ms, timestamp, feedback, latency_breakdown)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
             """, (
                 chat_id,
                 question,
@@ -115,20 +247,255 @@ class PostgresDB:
                 retrieved_docs,
                 latency_ms,
                 datetime.utcnow(),
-                feedback
+                feedback,
+                Jsonb(latency_breakdown) if latency_breakdown is not None else None
             ))
-        self.conn.commit()
-    
-    def delete_session(self, session_id: int):
+
+    @observe_db("delete_session")
+    async def delete_session(self, session_id: int):
         """Mark a chat session as deleted by setting the deleted_at timestamp."""
-        with self.conn.cursor() as cur:
-            cur.execute("""
+        async with self.pool.connection() as conn:
+            await conn.execute("""
                 UPDATE chat_sessions
                 SET deleted_at = %s
                 WHERE id = %s;
             """, (datetime.utcnow(), session_id))
-        self.conn.commit()
+        self.session_cache.pop(session_id)
+
+    @observe_db("create_ingestion_job")
+    async def create_ingestion_job(self, job_id: str, filename: str, file_path: str, collection: str = None,
+                                   host: str = None):
+        """Record a newly queued ingestion job.
+        :job_id: UUID of the job
+        :filename: Original name of the uploaded file
+        :file_path: Path of the spooled upload on disk
+        :collection: Collection the document is stored into (None for the default collection)
+        :host: Host whose spool directory holds the upload
+        """
+        async with self.pool.connection() as conn:
+            await conn.execute("""
+                INSERT INTO ingestion_jobs (id, filename, file_path, collection, host, status, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, 'queued', %s, %s);
+            """, (job_id, filename, file_path, collection, host, datetime.utcnow(), datetime.utcnow()))
+
+    @observe_db("update_ingestion_job")
+    async def update_ingestion_job(self, job_id: str, status: str = None, parsed: int = None,
+                                   embedded: int = None, stored: int = None, error: str = None):
+        """Update the status and/or progress counters of an ingestion job; None leaves a field unchanged."""
+        async with self.pool.connection() as conn:
+            await conn.execute("""
+                UPDATE ingestion_jobs
+                SET status = COALESCE(%s, status),
+                    parsed = COALESCE(%s, parsed),
+                    embedded = COALESCE(%s, embedded),
+                    stored = COALESCE(%s, stored),
+                    error = COALESCE(%s, error),
+                    updated_at = %s
+                WHERE id = %s;
+            """, (status, parsed, embedded, stored, error, datetime.utcnow(), job_id))
+
+    @observe_db("get_ingestion_job")
+    async def get_ingestion_job(self, job_id: str):
+        """Retrieve an ingestion job by ID, or None if it does not exist."""
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT id, filename, status, parsed, embedded, stored, error, created_at, updated_at, collection
+                    FROM ingestion_jobs
+                    WHERE id = %s;
+                """, (job_id,))
+                row = await cur.fetchone()
+        if row is None:
+            return None
+        return {
+            "id": str(row[0]), "filename": row[1], "status": row[2], "parsed": row[3],
+            "embedded": row[4], "stored": row[5], "error": row[6], "created_at": row[7], "updated_at": row[8], "collection": row[9]
+        }
+
+    @observe_db("get_unfinished_ingestion_jobs")
+    async def get_unfinished_ingestion_jobs(self, stale_before: datetime, host: str = None):
+        """
+        Retrieve jobs abandoned before stale_before, oldest first: queued jobs no worker has picked up
+        and running jobs whose worker stopped reporting. Jobs just accepted or running on a live worker
+        are left alone.
+        :host: Only return jobs whose upload is spooled on this host (or whose host is unknown)
+        """
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT id, filename, file_path, collection
+                    FROM ingestion_jobs
+                    WHERE ((status = 'queued' AND updated_at < %s)
+                           OR (status = 'running' AND COALESCE(heartbeat_at, updated_at) < %s))
+                      AND (%s::text IS NULL OR host IS NULL OR host = %s)
+                    ORDER BY created_at ASC;
+                """, (stale_before, stale_before, host, host))
+                rows = await cur.fetchall()
+        return [{"id": str(r[0]), "filename": r[1], "file_path": r[2], "collection": r[3]} for r in rows]
+
+    @observe_db("claim_ingestion_job")
+    async def claim_ingestion_job(self, job_id: str, worker: str, stale_before: datetime) -> bool:
+        """
+        Atomically mark a job as running on `worker`. Succeeds for a queued job, or a running one whose worker
+        stopped reporting before stale_before; returns False if another worker holds or finished it.
+        """
+        now = datetime.utcnow()
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    UPDATE ingestion_jobs
+                    SET status = 'running', worker = %s, heartbeat_at = %s, updated_at = %s
+                    WHERE id = %s
+                      AND (status = 'queued'
+                           OR (status = 'running' AND COALESCE(heartbeat_at, updated_at) < %s))
+                    RETURNING id;
+                """, (worker, now, now, job_id, stale_before))
+                return await cur.fetchone() is not None
+
+    @observe_db("heartbeat_ingestion_job")
+    async def heartbeat_ingestion_job(self, job_id: str, worker: str):
+        """Report that `worker` is still running the job."""
+        async with self.pool.connection() as conn:
+            await conn.execute("""
+                UPDATE ingestion_jobs SET heartbeat_at = %s WHERE id = %s AND worker = %s;
+            """, (datetime.utcnow(), job_id, worker))
+
+    @observe_db("get_cached_embeddings")
+    async def get_cached_embeddings(self, model: str, hashes: list):
+        """Retrieve cached embeddings for the given content hashes, as a {hash: vector} dict."""
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT content_hash, embedding
+                    FROM embedding_cache
+                    WHERE model = %s AND content_hash = ANY(%s);
+                """, (model, hashes))
+                rows = await cur.fetchall()
+        return {r[0]: r[1] for r in rows}
+
+    @observe_db("put_cached_embeddings")
+    async def put_cached_embeddings(self, model: str, vectors: dict):
+        """Store embeddings keyed by content hash; existing entries are kept."""
+        now = datetime.utcnow()
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.executemany("""
+                    INSERT INTO embedding_cache (model, content_hash, embedding, created_at)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (model, content_hash) DO NOTHING;
+                """, [(model, h, vector, now) for h, vector in vectors.items()])
+
+    @asynccontextmanager
+    async def maintenance_lock(self):
+        """
+        Yield True if this worker holds the maintenance lock for the duration of the block, False if another
+        worker does. The lock is held on a dedicated connection so long-running maintenance does not pin the pool.
+        """
+        async with await AsyncConnection.connect(self.conninfo, autocommit=True) as conn:
+            acquired = (await (await conn.execute(
+                "SELECT pg_try_advisory_lock(%s);", (MAINTENANCE_LOCK_ID,)
+            )).fetchone())[0]
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    await conn.execute("SELECT pg_advisory_unlock(%s);", (MAINTENANCE_LOCK_ID,))
+
+    @observe_db("ensure_partitions")
+    async def ensure_partitions(self, months_ahead: int) -> List[str]:
+        """
+        Create the monthly partitions of the chat tables from this month up to months_ahead months ahead.
+        Months that only have rows in a default partition (inserted while no partition was premade) get
+        their partition too, starting from the oldest such row.
+        """
+        created = []
+        now = datetime.utcnow()
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                for table, key in PARTITIONED_TABLES.items():
+                    start = now
+                    await cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (f"{table}_default",))
+                    if (await cur.fetchone())[0]:
+                        await cur.execute(f'SELECT min("{key}") FROM {table}_default;')
+                        oldest = (await cur.fetchone())[0]
+                        start = min(start, oldest) if oldest is not None else start
+                    months = (now.year - start.year) * 12 + now.month - start.month + months_ahead + 1
+                    created += await create_month_partitions(cur, table, key, start, months)
+        return created
+
+    @observe_db("list_partitions")
+    async def list_partitions(self, table: str) -> List[dict]:
+        """List the partitions of a partitioned table with their exclusive upper bound, oldest first."""
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+                    FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = to_regclass(%s);
+                """, (table,))
+                rows = await cur.fetchall()
+        partitions = []
+        for name, bound in rows:
+            match = _UPPER_BOUND.search(bound or "")
+            partitions.append({"name": name, "upper": datetime.fromisoformat(match.group(1)) if match else None})
+        return sorted(partitions, key=lambda p: p["upper"] or datetime.max)
+
+    @observe_db("export_partition")
+    async def export_partition(self, partition: str, out: BinaryIO) -> int:
+        """
+        Write all rows of a partition to `out` as CSV with a header; returns the number of bytes written.
+        Writes (and any compression done by `out`) run in a worker thread in chunks of about 1 MiB,
+        so a large partition does not block the event loop.
+        """
+        written = 0
+        buffer = bytearray()
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                async with cur.copy(f"COPY {partition} TO STDOUT WITH (FORMAT csv, HEADER true)") as copy:
+                    async for data in copy:
+                        buffer += data
+                        if len(buffer) >= EXPORT_CHUNK_BYTES:
+                            await asyncio.to_thread(out.write, bytes(buffer))
+                            written += len(buffer)
+                            buffer.clear()
+        if buffer:
+            await asyncio.to_thread(out.write, bytes(buffer))
+            written += len(buffer)
+        return written
+
+    @observe_db("drop_partition")
+    async def drop_partition(self, table: str, partition: str):
+        """Detach a partition from its table and drop it."""
+        if table not in PARTITIONED_TABLES:
+            raise ValueError(f"{table} is not a partitioned table")
+        async with self.pool.connection() as conn:
+            await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {partition};")
+            await conn.execute(f"DROP TABLE {partition};")
+
+    @observe_db("purge_deleted_sessions")
+    async def purge_deleted_sessions(self, deleted_before: datetime, batch_size: int = 1000) -> int:
+        """
+        Permanently delete sessions soft-deleted before deleted_before, with their messages and summaries;
+        their audit records are kept with chat_id set to NULL. Deletes in batches of batch_size sessions,
+        one transaction each, so locks stay short. Returns the number of sessions purged.
+        """
+        purged = 0
+        while True:
+            async with self.pool.connection() as conn:
+                result = await conn.execute("""
+                    DELETE FROM chat_sessions
+                    WHERE id IN (
+                        SELECT id
+                        FROM chat_sessions
+                        WHERE deleted_at IS NOT NULL AND deleted_at < %s
+                        LIMIT %s
+                    );
+                """, (deleted_before, batch_size))
+            purged += result.rowcount
+            if result.rowcount < batch_size:
+                return purged
 
-    def close(self):
-        """Close the database connection."""
-        self.conn.close()
+    async def close(self):
+        """Close all pooled database connections."""
+        await self.pool.close()
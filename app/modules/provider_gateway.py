@@ -0,0 +1,309 @@
+import time
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from langchain_core.embeddings import Embeddings
+from app.core.metrics import (
+    EMBEDDING_BATCH_SIZE, EMBEDDING_COALESCED, PROVIDER_IN_FLIGHT, PROVIDER_REQUESTS, PROVIDER_WAIT
+)
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+class ProviderUnavailableError(Exception):
+    """Raised when a provider call is rejected by the gateway or still fails after all retries."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Rate limits (429), timeouts and server errors are worth retrying; anything else (bad request,
+    invalid key, ...) is not. Provider SDKs wrap the HTTP error, so the whole cause chain is checked.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+            return True
+        for attribute in ("code", "status_code", "status"):
+            value = getattr(error, attribute, None)
+            if isinstance(value, int) and value in RETRYABLE_STATUS:
+                return True
+        error = error.__cause__ or error.__context__
+    return False
+
+def unavailable_cause(error: BaseException) -> Optional[ProviderUnavailableError]:
+    """
+    The ProviderUnavailableError behind error, if any. Callers re-raise failures wrapped in their own
+    errors, so the whole cause chain is checked.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, ProviderUnavailableError):
+            return error
+        error = error.__cause__ or error.__context__
+    return None
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        """
+        Token-bucket rate limiter.
+        :rate: Tokens added per second (0 disables the limit)
+        :capacity: Maximum burst size
+        """
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        if self.rate <= 0:
+            return
+        # Waiters are served in order: the lock is held while sleeping for the next token.
+        async with self._lock:
+            self._refill()
+            if self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+class ProviderGateway:
+    def __init__(self, name: str, rate: float = 0, burst: float = 1, concurrency: int = 8,
+                 queue_timeout: float = 30, max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 20):
+        """
+        Admission control and retries for one model provider.
+        :name: Provider label used in metrics (llm, embeddings)
+        :rate: Requests per second allowed by the token bucket (0 disables rate limiting)
+        :burst: Requests that may be sent at once after an idle period
+        :concurrency: Requests in flight at once
+        :queue_timeout: Seconds a caller waits for a free slot before the call is rejected
+        :max_retries: Retries of a failed request on rate limit, timeout or server errors
+        :base_delay: First backoff delay in seconds, doubled on every retry
+        :max_delay: Upper bound of a single backoff delay
+        """
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff, so clients that failed together do not retry together."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the concurrency slots for the duration of the block."""
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            PROVIDER_REQUESTS.labels(self.name, "rejected").inc()
+            raise ProviderUnavailableError(f"{self.name} provider is saturated, retry later.",
+                                           retry_after=self.queue_timeout)
+        PROVIDER_WAIT.labels(self.name, "concurrency").observe(time.perf_counter() - start)
+        PROVIDER_IN_FLIGHT.labels(self.name).inc()
+        try:
+            yield
+        finally:
+            PROVIDER_IN_FLIGHT.labels(self.name).dec()
+            self.semaphore.release()
+
+    async def attempt(self, attempt: int, error: Exception) -> None:
+        """Sleep before retry number attempt+1, or raise if error is final."""
+        if attempt >= self.max_retries or not is_retryable(error):
+            PROVIDER_REQUESTS.labels(self.name, "error").inc()
+            if is_retryable(error):
+                raise ProviderUnavailableError(
+                    f"{self.name} provider unavailable after {attempt + 1} attempts: {error}",
+                    retry_after=self.max_delay
+                ) from error
+            raise error
+        PROVIDER_REQUESTS.labels(self.name, "retry").inc()
+        delay = self.backoff(attempt)
+        logger.warning("%s request failed (%s), retrying in %.2fs", self.name, error, delay)
+        await asyncio.sleep(delay)
+
+    async def admit(self):
+        """Wait for the rate limiter; every attempt, retries included, counts against the provider's quota."""
+        start = time.perf_counter()
+        await self.bucket.acquire()
+        PROVIDER_WAIT.labels(self.name, "rate").observe(time.perf_counter() - start)
+
+    async def call(self, func: Callable[[], Awaitable]):
+        """Run func() within a concurrency slot, rate limited and retried with backoff."""
+        async with self.slot():
+            attempt = 0
+            while True:
+                await self.admit()
+                try:
+                    result = await func()
+                except Exception as e:
+                    await self.attempt(attempt, e)
+                    attempt += 1
+                    continue
+                PROVIDER_REQUESTS.labels(self.name, "success").inc()
+                return result
+
+class _MicroBatcher:
+    def __init__(self, gateway: ProviderGateway, embed: Callable[[List[str]], Awaitable[List[List[float]]]],
+                 max_size: int, window: float):
+        """
+        Collect texts from concurrent callers for up to `window` seconds (or until max_size texts are
+        queued) and embed them with one provider request. Identical texts that are queued or in flight
+        share one result (single-flight).
+        """
+        self.gateway = gateway
+        self.embed = embed
+        self.max_size = max_size
+        self.window = window
+        self.futures: Dict[str, asyncio.Future] = {}
+        self.queue: List[str] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, texts: List[str]) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        futures = []
+        for t in texts:
+            future = self.futures.get(t)
+            if future is None:
+                future = self.futures[t] = loop.create_future()
+                self.queue.append(t)
+            else:
+                EMBEDDING_COALESCED.labels(self.gateway.name).inc()
+            futures.append(future)
+        while len(self.queue) >= self.max_size:
+            self._flush(self.max_size)
+        if self.queue and self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush, self.max_size)
+        # Shielded so a cancelled caller does not cancel a result other callers are waiting for.
+        return list(await asyncio.gather(*(asyncio.shield(f) for f in futures)))
+
+    def _flush(self, size: int):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self.queue = self.queue[:size], self.queue[size:]
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if self.queue:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush, self.max_size)
+
+    async def _run(self, batch: List[str]):
+        EMBEDDING_BATCH_SIZE.labels(self.gateway.name).observe(len(batch))
+        try:
+            vectors = await self.gateway.call(lambda: self.embed(batch))
+            if len(vectors) != len(batch):
+                raise RuntimeError(f"Provider returned {len(vectors)} embeddings for {len(batch)} texts")
+        except asyncio.CancelledError:
+            for t in batch:
+                self.futures.pop(t).cancel()
+            raise
+        except Exception as e:
+            for t in batch:
+                future = self.futures.pop(t)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for t, vector in zip(batch, vectors):
+            future = self.futures.pop(t)
+            if not future.done():
+                future.set_result(vector)
+
+class GatewayEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, gateway: ProviderGateway, max_batch_size: int = 100,
+                 batch_window: float = 0.005,
+                 embed_queries: Optional[Callable[[List[str]], Awaitable[List[List[float]]]]] = None):
+        """
+        Route an embeddings client through a provider gateway, micro-batching concurrent calls.
+        :embeddings: Underlying embeddings client
+        :gateway: Rate limits, concurrency cap and retries applied to every provider request
+        :max_batch_size: Texts per provider request at most
+        :batch_window: Seconds a text waits for others to share its request
+        :embed_queries: Embeds several queries in one request; providers embed queries and documents
+            differently, so without it concurrent queries are still coalesced but sent one per request
+        """
+        self.embeddings = embeddings
+        self.gateway = gateway
+        self.documents = _MicroBatcher(gateway, embeddings.aembed_documents, max_batch_size, batch_window)
+        if embed_queries is not None:
+            self.queries = _MicroBatcher(gateway, embed_queries, max_batch_size, batch_window)
+        else:
+            self.queries = _MicroBatcher(gateway, self._embed_queries_one_by_one, 1, 0)
+
+    async def _embed_queries_one_by_one(self, texts: List[str]) -> List[List[float]]:
+        return [await self.embeddings.aembed_query(t) for t in texts]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.documents.submit(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.queries.submit([text]))[0]
+
+    # The synchronous path bypasses the gateway; the application only embeds through the async one.
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+class GatewayChatModel:
+    def __init__(self, llm, gateway: ProviderGateway):
+        """
+        Route a chat model's ainvoke/astream calls through a provider gateway.
+        A stream holds its concurrency slot until it is closed and is only retried if it fails before
+        the first chunk, since chunks already relayed to the client cannot be taken back.
+        """
+        self.llm = llm
+        self.gateway = gateway
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    async def ainvoke(self, messages, **kwargs):
+        return await self.gateway.call(lambda: self.llm.ainvoke(messages, **kwargs))
+
+    async def astream(self, messages, **kwargs):
+        async with self.gateway.slot():
+            attempt = 0
+            while True:
+                await self.gateway.admit()
+                stream = self.llm.astream(messages, **kwargs)
+                try:
+                    first = await stream.__anext__()
+                except StopAsyncIteration:
+                    PROVIDER_REQUESTS.labels(self.gateway.name, "success").inc()
+                    return
+                except Exception as e:
+                    await stream.aclose()
+                    await self.gateway.attempt(attempt, e)
+                    attempt += 1
+                    continue
+                break
+            try:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+                PROVIDER_REQUESTS.labels(self.gateway.name, "success").inc()
+            except Exception:
+                PROVIDER_REQUESTS.labels(self.gateway.name, "error").inc()
+                raise
+            finally:
+                await stream.aclose()
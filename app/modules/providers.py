@@ -0,0 +1,78 @@
+import os
+import hashlib
+import functools
+from typing import Awaitable, Callable, List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from app.config import config_settings
+from app.modules.local_models import HashingEmbeddings, LocalEmbeddings, StubChatModel
+
+EMBEDDING_PROVIDERS = ("gemini", "local", "hashing")
+LLM_PROVIDERS = ("gemini", "stub")
+
+def build_embeddings() -> Tuple[Embeddings, Optional[Callable[[List[str]], Awaitable[List[List[float]]]]]]:
+    """
+    Build the embeddings client selected by EMBEDDING_PROVIDER.
+    Returns the client and, for providers able to embed several queries in one request, the batch query function.
+    """
+    provider = config_settings.EMBEDDING_PROVIDER
+    if provider == "gemini":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        client = GoogleGenerativeAIEmbeddings(
+            model=config_settings.EMBEDDING_MODEL,
+            google_api_key=config_settings.GEMINI_API_KEY
+        )
+        # Concurrent queries share one batch request, still embedded with the query task type.
+        return client, functools.partial(client.aembed_documents, task_type="RETRIEVAL_QUERY")
+    if provider == "local":
+        return LocalEmbeddings(
+            config_settings.EMBEDDING_LOCAL_MODEL_PATH,
+            dimensions=config_settings.PG_VECTOR_DB_VECTOR_SIZE,
+            batch_size=config_settings.EMBEDDING_LOCAL_BATCH_SIZE
+        ), None
+    if provider == "hashing":
+        return HashingEmbeddings(config_settings.PG_VECTOR_DB_VECTOR_SIZE), None
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER {provider!r}, expected one of {', '.join(EMBEDDING_PROVIDERS)}")
+
+def embedding_model_name() -> str:
+    """
+    Name the embedding cache keys vectors by. Vectors of different models are not comparable,
+    so switching providers must never serve vectors cached for another one.
+    """
+    provider = config_settings.EMBEDDING_PROVIDER
+    if provider == "local":
+        path = os.path.normpath(config_settings.EMBEDDING_LOCAL_MODEL_PATH)
+        return f"local:{os.path.basename(path)}:{model_fingerprint(path)}"
+    if provider == "hashing":
+        return f"hashing:{config_settings.PG_VECTOR_DB_VECTOR_SIZE}"
+    return config_settings.EMBEDDING_MODEL
+
+def model_fingerprint(directory: str) -> str:
+    """
+    Short hash of a local model's files (size and modification time), so replacing the model under the
+    same path also changes the cache keys instead of serving vectors of the old model.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for name in ("vocab.txt", "embeddings.npy"):
+        info = os.stat(os.path.join(directory, name))
+        digest.update(f"{name}:{info.st_size}:{info.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+def is_local(embeddings: Embeddings) -> bool:
+    """In-process embeddings have no quota or network to protect, so they skip the provider gateway."""
+    return isinstance(embeddings, (LocalEmbeddings, HashingEmbeddings))
+
+def build_llm() -> BaseChatModel:
+    """Build the chat model selected by LLM_PROVIDER."""
+    provider = config_settings.LLM_PROVIDER
+    if provider == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        # Retries are done by the gateway, which knows about the other requests in flight.
+        return ChatGoogleGenerativeAI(
+            model=config_settings.LLM_MODEL,
+            api_key=config_settings.GEMINI_API_KEY,
+            max_retries=0
+        )
+    if provider == "stub":
+        return StubChatModel(max_words=config_settings.LLM_STUB_MAX_WORDS)
+    raise ValueError(f"Unknown LLM_PROVIDER {provider!r}, expected one of {', '.join(LLM_PROVIDERS)}")
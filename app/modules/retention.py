@@ -0,0 +1,105 @@
+import os
+import gzip
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+from app.modules.postgresdb_base import PostgresDB
+
+logger = logging.getLogger(__name__)
+
+class RetentionJob:
+    def __init__(self, chat_db: PostgresDB, interval: float = 3600, premake_months: int = 3,
+                 deleted_session_days: float = 30, audit_days: float = 90, archive_dir: str = "archive",
+                 batch_size: int = 1000):
+        """
+        Periodic maintenance of the chat database: creates upcoming monthly partitions, hard-deletes
+        soft-deleted sessions and archives old audit partitions to gzip-compressed CSV files before dropping them.
+        :chat_db: Database to maintain
+        :interval: Seconds between runs (0 disables the background loop; run_once can still be called)
+        :premake_months: Months of partitions created ahead of time, so inserts never lack a partition
+        :deleted_session_days: Days a soft-deleted session is kept before it is purged with its messages
+        :audit_days: Days audit records are kept in the database; whole partitions past this age are archived
+        :archive_dir: Directory receiving the archived audit partitions
+        :batch_size: Sessions purged per transaction
+        """
+        self.chat_db = chat_db
+        self.interval = interval
+        self.premake_months = premake_months
+        self.deleted_session_days = deleted_session_days
+        self.audit_days = audit_days
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Make sure partitions exist before the first write (whatever the interval), then start the periodic loop."""
+        async with self.chat_db.maintenance_lock() as acquired:
+            # Otherwise another worker is creating them right now.
+            if acquired:
+                await self.chat_db.ensure_partitions(self.premake_months)
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+        else:
+            logger.warning("Retention loop disabled (RETENTION_INTERVAL=0): partitions are only created at startup, "
+                           "%d months ahead; later rows go to the default partitions until the next restart",
+                           self.premake_months)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Retention run failed")
+
+    async def run_once(self) -> dict:
+        """Run every maintenance step once; skipped when another worker is already running it."""
+        async with self.chat_db.maintenance_lock() as acquired:
+            if not acquired:
+                return {"skipped": True}
+            created = await self.chat_db.ensure_partitions(self.premake_months)
+            purged = await self.chat_db.purge_deleted_sessions(
+                datetime.utcnow() - timedelta(days=self.deleted_session_days), self.batch_size
+            )
+            archived = await self.archive_audit()
+        if created or purged or archived:
+            logger.info("Retention: created %d partitions, purged %d sessions, archived %s",
+                        len(created), purged, archived)
+        return {"skipped": False, "partitions_created": created, "sessions_purged": purged, "archived": archived}
+
+    async def archive_audit(self) -> List[str]:
+        """
+        Archive and drop audit partitions whose newest possible row is older than the retention period.
+        Each file is written under a temporary name and renamed once complete, so a partition is only
+        dropped after its archive is safely on disk. Returns the paths of the archives written.
+        """
+        cutoff = datetime.utcnow() - timedelta(days=self.audit_days)
+        archived = []
+        for partition in await self.chat_db.list_partitions("chat_audit"):
+            if partition["upper"] is None or partition["upper"] > cutoff:
+                continue
+            os.makedirs(self.archive_dir, exist_ok=True)
+            path = os.path.join(self.archive_dir, f"{partition['name']}.csv.gz")
+            partial = f"{path}.partial"
+            # Compression and file I/O run in worker threads, never on the event loop.
+            out = await asyncio.to_thread(gzip.open, partial, "wb", compresslevel=6)
+            try:
+                await self.chat_db.export_partition(partition["name"], out)
+            finally:
+                await asyncio.to_thread(out.close)
+            await asyncio.to_thread(_fsync, partial)
+            os.replace(partial, path)
+            await self.chat_db.drop_partition("chat_audit", partition["name"])
+            archived.append(path)
+        return archived
+
+def _fsync(path: str):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
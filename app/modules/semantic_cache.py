@@ -0,0 +1,91 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+
+class SemanticCache:
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000, ttl_seconds: float = 600.0):
+        """
+        In-process cache of answers keyed by query embedding. A lookup hits when a stored query
+        has cosine similarity >= threshold and was answered against the current knowledge-base version.
+        The version is shared between processes (see DocumentCatalog.version); set_version keeps it current.
+        :threshold: Minimum cosine similarity for a cached answer to be reused
+        :max_entries: Maximum number of answers kept; the least recently used one is evicted first
+        :ttl_seconds: Seconds an answer stays valid
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._entries: "OrderedDict[int, dict]" = OrderedDict()
+        self._free: List[int] = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    def set_version(self, version: int):
+        """Record the knowledge base's current version; answers produced against another one are no longer served."""
+        with self._lock:
+            self.version = version
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _evict(self, slot: int):
+        del self._entries[slot]
+        self._matrix[slot] = 0.0
+        self._free.append(slot)
+
+    def lookup(self, vector: List[float]) -> Optional[dict]:
+        """Return the cached entry (query, answer, context, sources) most similar to vector, or None."""
+        with self._lock:
+            if not self._entries:
+                return None
+            now = time.monotonic()
+            for slot in [s for s, e in self._entries.items() if e["expires_at"] < now or e["version"] != self.version]:
+                self._evict(slot)
+            if not self._entries:
+                return None
+            slots = np.fromiter(self._entries.keys(), dtype=np.int64)
+            scores = self._matrix[slots] @ self._normalize(vector)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            slot = int(slots[best])
+            self._entries.move_to_end(slot)
+            entry = self._entries[slot]
+            return {"query": entry["query"], "answer": entry["answer"], "context": entry["context"],
+                    "sources": entry["sources"], "similarity": float(scores[best])}
+
+    def store(self, vector: List[float], query: str, answer: str, context: str, version: int,
+              sources: Optional[List[dict]] = None):
+        """Cache an answer computed against knowledge-base `version` (ignored if the KB changed since)."""
+        normalized = self._normalize(vector)
+        with self._lock:
+            if version != self.version:
+                return
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, normalized.shape[0]), dtype=np.float32)
+            if not self._free:
+                self._evict(next(iter(self._entries)))
+            slot = self._free.pop()
+            self._matrix[slot] = normalized
+            self._entries[slot] = {
+                "query": query,
+                "answer": answer,
+                "context": context,
+                "sources": sources or [],
+                "version": version,
+                "expires_at": time.monotonic() + self.ttl_seconds,
+            }
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._entries):
+                self._evict(slot)
+
+    def __len__(self) -> int:
+        return len(self._entries)
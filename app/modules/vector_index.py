@@ -0,0 +1,164 @@
+import uuid
+from typing import List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+EMBEDDING_TABLE = "langchain_pg_embedding"
+INDEX_KINDS = ("hnsw", "ivfflat")
+
+def vector_literal(vector: List[float]) -> str:
+    """Format an embedding as a pgvector input literal."""
+    return "[" + ",".join(str(float(x)) for x in vector) + "]"
+
+def collection_predicate(collection_id, alias: str = "") -> str:
+    """
+    SQL predicate restricting rows to one collection, with the ID inlined as a literal: the planner only
+    uses a partial (per-collection) index when the value is known at planning time, which a bound
+    parameter is not once the statement is prepared. The ID is formatted through uuid.UUID, so it is safe to inline.
+    """
+    return f"{alias}collection_id = '{uuid.UUID(str(collection_id))}'"
+
+def index_name(kind: str, collection_id=None) -> str:
+    """Name of the index of the given kind (hnsw, ivfflat, document_tsv), whole-table or scoped to a collection."""
+    if collection_id is not None:
+        # Table-prefixed names would exceed Postgres' 63-character limit with the collection ID appended.
+        return f"ix_emb_{kind}_{uuid.UUID(str(collection_id)).hex}"
+    return f"ix_{EMBEDDING_TABLE}_{kind}"
+
+class VectorIndexManager:
+    def __init__(self, engine: AsyncEngine, dimensions: int, m: int = 16, ef_construction: int = 64,
+                 lists: int = 100, ef_search: int = 40, probes: int = 10, text_search_config: str = "english",
+                 collection_id=None):
+        """
+        Create, rebuild and inspect approximate-nearest-neighbour indexes on the PGVector embedding table.
+        With a collection_id the indexes are partial indexes covering only that collection, so searches in it
+        traverse a graph (or lists) built from its own rows instead of filtering the neighbours of all collections.
+        :engine: Async engine connected to the vector database
+        :dimensions: Embedding size; the embedding column must be typed with it to be indexable
+        :m: HNSW maximum connections per layer
+        :ef_construction: HNSW candidate list size while building
+        :lists: IVFFlat number of inverted lists
+        :ef_search: Default HNSW candidate list size per query
+        :probes: Default number of IVFFlat lists scanned per query
+        :text_search_config: Postgres text search configuration used for keyword search
+        :collection_id: Collection the indexes are scoped to (None indexes the whole table)
+        """
+        if not text_search_config.isidentifier():
+            raise ValueError(f"Invalid text search configuration: {text_search_config}")
+        self.engine = engine
+        self.dimensions = dimensions
+        self.defaults = {"m": m, "ef_construction": ef_construction, "lists": lists}
+        self.ef_search = ef_search
+        self.probes = probes
+        self.text_search_config = text_search_config
+        self.collection_id = collection_id
+
+    def index_name(self, kind: str) -> str:
+        return index_name(kind, self.collection_id)
+
+    def _where(self) -> str:
+        return f" WHERE {collection_predicate(self.collection_id)}" if self.collection_id is not None else ""
+
+    def _index_ddl(self, kind: str, m: int = None, ef_construction: int = None, lists: int = None,
+                   name: str = None) -> str:
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unsupported index type: {kind}")
+        if kind == "hnsw":
+            options = (f"m = {int(m or self.defaults['m'])}, "
+                       f"ef_construction = {int(ef_construction or self.defaults['ef_construction'])}")
+        else:
+            options = f"lists = {int(lists or self.defaults['lists'])}"
+        return (f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name or self.index_name(kind)} ON {EMBEDDING_TABLE} "
+                f"USING {kind} (embedding vector_cosine_ops) WITH ({options}){self._where()}")
+
+    async def _ensure_typed_column(self, conn):
+        column_type = (await conn.execute(text("""
+            SELECT format_type(atttypid, atttypmod)
+            FROM pg_attribute
+            WHERE attrelid = CAST(:table AS regclass) AND attname = 'embedding'
+        """), {"table": EMBEDDING_TABLE})).scalar()
+        if column_type == "vector":
+            # Tables created without embedding_length have an untyped column, which cannot be indexed.
+            await conn.execute(text(
+                f"ALTER TABLE {EMBEDDING_TABLE} ALTER COLUMN embedding TYPE vector({int(self.dimensions)})"
+            ))
+
+    async def ensure(self, kind: str, **params):
+        """Create the index if it does not exist yet. CONCURRENTLY keeps the table writable while it builds."""
+        async with self.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await self._ensure_typed_column(conn)
+            await conn.execute(text(self._index_ddl(kind, **params)))
+
+    async def rebuild(self, kind: str, **params):
+        """
+        Replace the existing ANN indexes with a fresh one of the requested kind and parameters. The new index is
+        built under a temporary name while the old ones keep serving searches, and only then are they swapped.
+        """
+        target = self.index_name(kind)
+        building = f"{target}_new"
+        async with self.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await self._ensure_typed_column(conn)
+            # An interrupted earlier rebuild leaves an invalid index behind under the temporary name.
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {building}"))
+            await conn.execute(text(self._index_ddl(kind, name=building, **params)))
+            for existing in INDEX_KINDS:
+                await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {self.index_name(existing)}"))
+            await conn.execute(text(f"ALTER INDEX {building} RENAME TO {target}"))
+
+    async def ensure_text_index(self):
+        """
+        Add a generated tsvector column over the chunk text and a GIN index on it for keyword search.
+        Adding the column rewrites the table once; afterwards Postgres keeps it in sync on every write.
+        """
+        async with self.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            has_column = (await conn.execute(text("""
+                SELECT 1 FROM pg_attribute
+                WHERE attrelid = CAST(:table AS regclass) AND attname = 'document_tsv' AND NOT attisdropped
+            """), {"table": EMBEDDING_TABLE})).scalar() is not None
+            # Checked first because ALTER TABLE takes an exclusive lock even when there is nothing to add.
+            if not has_column:
+                await conn.execute(text(f"""
+                    ALTER TABLE {EMBEDDING_TABLE}
+                    ADD COLUMN IF NOT EXISTS document_tsv tsvector
+                    GENERATED ALWAYS AS (to_tsvector('{self.text_search_config}'::regconfig, COALESCE(document, ''))) STORED
+                """))
+            await conn.execute(text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.index_name('document_tsv')} "
+                f"ON {EMBEDDING_TABLE} USING gin (document_tsv){self._where()}"
+            ))
+
+    def _index_names(self) -> List[str]:
+        kinds = (*INDEX_KINDS, "document_tsv")
+        # Whole-table indexes serve every collection, so they are reported for scoped managers too.
+        names = [self.index_name(k) for k in kinds] + [index_name(k) for k in kinds]
+        # Includes an index being rebuilt, so the build's progress (and validity) shows up.
+        return list(dict.fromkeys(names + [f"{self.index_name(k)}_new" for k in INDEX_KINDS]))
+
+    async def status(self) -> List[dict]:
+        """Report the ANN and keyword indexes serving this scope with their definition, validity, size and usage."""
+        async with self.engine.connect() as conn:
+            rows = (await conn.execute(text("""
+                SELECT i.relname, am.amname, pg_get_indexdef(i.oid), ix.indisvalid,
+                       pg_relation_size(i.oid), COALESCE(s.idx_scan, 0), t.reltuples::BIGINT
+                FROM pg_index ix
+                JOIN pg_class i ON i.oid = ix.indexrelid
+                JOIN pg_class t ON t.oid = ix.indrelid
+                JOIN pg_am am ON am.oid = i.relam
+                LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = i.oid
+                WHERE t.relname = :table AND i.relname = ANY(:names)
+                ORDER BY i.relname
+            """), {"table": EMBEDDING_TABLE, "names": self._index_names()})).all()
+        return [{
+            "name": r[0], "type": r[1], "definition": r[2], "valid": r[3],
+            "size_bytes": r[4], "scans": r[5], "estimated_rows": r[6]
+        } for r in rows]
+
+    async def apply_search_settings(self, conn, ef_search: Optional[int] = None, probes: Optional[int] = None):
+        """Set the per-query search breadth for the current transaction only."""
+        await conn.execute(
+            text("SELECT set_config('hnsw.ef_search', :ef_search, true), set_config('ivfflat.probes', :probes, true)"),
+            {"ef_search": str(int(ef_search or self.ef_search)), "probes": str(int(probes or self.probes))}
+        )
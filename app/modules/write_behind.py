@@ -0,0 +1,224 @@
+import os
+import glob
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.modules.postgresdb_base import PostgresDB
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindBuffer:
+    def __init__(self, chat_db: PostgresDB, batch_size: int = 500, flush_interval: float = 0.5,
+                 max_pending: int = 10000, spill_dir: str = "spill"):
+        """
+        Queue chat messages and audit records in memory and write them to Postgres in batches.
+        :chat_db: Database the records are written to
+        :batch_size: Number of queued records that triggers an immediate flush
+        :flush_interval: Maximum seconds a record waits before being flushed
+        :max_pending: Records kept in memory; beyond this (e.g. while Postgres is down) the flusher spills them to disk
+        :spill_dir: Directory for spilled records, replayed in order once Postgres accepts writes again
+        """
+        self.chat_db = chat_db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.spill_dir = spill_dir
+        self._messages: List[tuple] = []
+        self._audits: List[tuple] = []
+        # The batch being written: still visible to readers until the write commits.
+        self._inflight_messages: List[tuple] = []
+        # Messages this process spilled, by spill file: readable until the file is replayed.
+        self._spilled_messages: Dict[str, List[tuple]] = {}
+        self._stopping = False
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def add_message(self, session_id: int, message: str, sender: str):
+        """Queue a chat message; it is stamped now and written on the next flush."""
+        self._enqueue("message", (session_id, message, sender, datetime.utcnow()))
+
+    def add_audit(self, chat_id, question, response, retrieved_docs, latency_ms, feedback=None, latency_breakdown=None):
+        """Queue an audit record; see PostgresDB.add_audit for the fields."""
+        self._enqueue("audit", (
+            chat_id, question, response, retrieved_docs, latency_ms, datetime.utcnow(), feedback, latency_breakdown
+        ))
+
+    def pending_messages(self, session_id: int) -> List[dict]:
+        """
+        Messages of a session not committed yet (spilled, queued or being written), so readers see their own
+        recent writes.
+        """
+        spilled = [m for messages in self._spilled_messages.values() for m in messages]
+        return [
+            {"id": None, "message": m[1], "sender": m[2], "created_at": m[3]}
+            for m in spilled + self._inflight_messages + self._messages if m[0] == session_id
+        ]
+
+    def _enqueue(self, kind: str, row: tuple):
+        # Called on the request path: only append and wake the flusher, which does any I/O.
+        (self._messages if kind == "message" else self._audits).append(row)
+        if len(self._messages) + len(self._audits) >= min(self.batch_size, self.max_pending):
+            self._wakeup.set()
+
+    @staticmethod
+    def _write_records(path: str, messages: List[tuple], audits: List[tuple]):
+        # Written under a temporary name, so no worker replays a half-written file.
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            for kind, rows in (("message", messages), ("audit", audits)):
+                for row in rows:
+                    f.write(json.dumps({"kind": kind, "row": row}, default=datetime.isoformat) + "\n")
+        os.replace(f"{path}.tmp", path)
+
+    @staticmethod
+    def _read_records(path: str):
+        messages, audits = [], []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                row = record["row"]
+                if record["kind"] == "message":
+                    messages.append((row[0], row[1], row[2], datetime.fromisoformat(row[3])))
+                else:
+                    audits.append((*row[:5], datetime.fromisoformat(row[5]), row[6], row[7] if len(row) > 7 else None))
+        return messages, audits
+
+    def _detach(self):
+        """Take everything buffered in memory for a new spill file; its messages stay readable as spilled."""
+        # Every spill gets its own file, named so that sorting by name replays them oldest first.
+        path = os.path.join(self.spill_dir, f"write-behind-{time.time_ns():020d}-{os.getpid()}.jsonl")
+        messages, audits = self._messages, self._audits
+        self._messages, self._audits = [], []
+        self._spilled_messages[path] = messages
+        return path, messages, audits
+
+    def _spill_now(self):
+        """Spill synchronously; only used on shutdown, when nothing else waits on the event loop."""
+        path, messages, audits = self._detach()
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self._write_records(path, messages, audits)
+        logger.warning("Spilled %d chat records to %s", len(messages) + len(audits), path)
+
+    async def _spill(self):
+        """Move everything buffered in memory to a new spill file, preserving order, writing it in a thread."""
+        path, messages, audits = self._detach()
+        try:
+            await asyncio.to_thread(os.makedirs, self.spill_dir, exist_ok=True)
+            await asyncio.to_thread(self._write_records, path, messages, audits)
+        except Exception:
+            self._spilled_messages.pop(path, None)
+            self._messages, self._audits = messages + self._messages, audits + self._audits
+            raise
+        logger.warning("Spilled %d chat records to %s", len(messages) + len(audits), path)
+
+    async def _spill_if_full(self):
+        if len(self._messages) + len(self._audits) >= self.max_pending:
+            try:
+                await self._spill()
+            except Exception:
+                logger.exception("Spilling chat records to %s failed", self.spill_dir)
+
+    def _forget_replayed(self):
+        # Spill files of this process replayed by another worker are gone too.
+        for path in list(self._spilled_messages):
+            if not os.path.exists(path) and not os.path.exists(f"{path}.replaying"):
+                del self._spilled_messages[path]
+
+    async def _replay_spill(self) -> bool:
+        """Write spilled records back to Postgres; returns False if the database is still failing."""
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, "write-behind-*.jsonl"))):
+            replaying = f"{path}.replaying"
+            try:
+                # Claiming the file by renaming keeps concurrent workers from replaying it twice.
+                os.rename(path, replaying)
+            except FileNotFoundError:
+                continue
+            try:
+                replayed = await self._replay_file(path, replaying)
+            except BaseException:
+                # Cancelled mid-replay: hand the file back so it is replayed later rather than forgotten.
+                os.rename(replaying, path)
+                raise
+            if not replayed:
+                os.rename(replaying, path)
+                return False
+            os.remove(replaying)
+            self._spilled_messages.pop(path, None)
+        self._forget_replayed()
+        return True
+
+    async def _replay_file(self, path: str, replaying: str) -> bool:
+        messages, audits = await asyncio.to_thread(self._read_records, replaying)
+        try:
+            for i in range(0, max(len(messages), len(audits)), self.batch_size):
+                await self.chat_db.write_batch(messages[i:i + self.batch_size], audits[i:i + self.batch_size])
+        except Exception:
+            logger.exception("Replaying spilled chat records from %s failed", path)
+            if i:
+                # Keep only what was not written yet.
+                await asyncio.to_thread(self._write_records, replaying, messages[i:], audits[i:])
+                if path in self._spilled_messages:
+                    self._spilled_messages[path] = messages[i:]
+            return False
+        return True
+
+    async def flush(self):
+        """Write spilled records, then everything buffered in memory."""
+        async with self._lock:
+            if not await self._replay_spill():
+                await self._spill_if_full()
+                return
+            messages, audits = self._messages, self._audits
+            if not messages and not audits:
+                return
+            self._messages, self._audits = [], []
+            self._inflight_messages = messages
+            try:
+                await self.chat_db.write_batch(messages, audits)
+            except BaseException as e:
+                # Failed or cancelled (e.g. on shutdown): the batch goes back in front of newer records.
+                self._messages = messages + self._messages
+                self._audits = audits + self._audits
+                if not isinstance(e, Exception):
+                    raise
+                logger.exception("Flushing %d chat records failed", len(messages) + len(audits))
+                await self._spill_if_full()
+            finally:
+                self._inflight_messages = []
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed")
+
+    async def start(self):
+        """Start the periodic flusher."""
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the flusher and drain the buffer; anything that cannot be written is spilled to disk.
+        The flusher is signalled rather than cancelled, so a write in progress completes (or fails and is kept).
+        """
+        try:
+            if self._task is not None:
+                self._stopping = True
+                self._wakeup.set()
+                await asyncio.gather(self._task, return_exceptions=True)
+                self._task = None
+            await self.flush()
+        finally:
+            # Also reached when shutdown itself is cancelled: whatever is still in memory goes to disk.
+            if self._messages or self._audits:
+                self._spill_now()
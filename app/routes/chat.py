@@ -1,72 +1,102 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from app.modules.langchain_crud import LangchainDocManager
 from app.modules.postgresdb_base import PostgresDB
+from app.modules.chat_history import load_history, refresh_summary
+from app.modules.write_behind import WriteBehindBuffer
+from app.core.resources import get_chat_db, get_manager, get_write_buffer
+from app.core.metrics import StageTimer
+from app.core.sse import event_stream
 from app.config import config_settings
-import time
 
 router = APIRouter()
 
-COLLECTION_NAME = config_settings.PG_VECTOR_DB_NAME
-HOST = config_settings.PG_VECTOR_DB_HOST
-USER_NAME = config_settings.PG_VECTOR_DB_USERNAME
-PASSWORD = config_settings.PG_VECTOR_DB_PASSWORD
-PORT = config_settings.PG_VECTOR_DB_PORT
-
-manager = LangchainDocManager(
-    pg_connection_str=f"postgresql+psycopg://{USER_NAME}:{PASSWORD}@{HOST}:{PORT}/{COLLECTION_NAME}",
-    collection_name=COLLECTION_NAME
-)
-
-chat_db = PostgresDB(
-    dbname=config_settings.CHAT_DB_NAME,
-    user=config_settings.CHAT_DB_USERNAME,
-    password=config_settings.CHAT_DB_PASSWORD,
-    host=config_settings.CHAT_DB_HOST,
-    port=config_settings.CHAT_DB_PORT
-)
-
 @router.post("/")
-async def chat_stream(user_query: str, session_id: int = Query(..., description="Chat session ID (required)")):
+async def chat_stream(
+    request: Request,
+    user_query: str,
+    session_id: int = Query(..., description="Chat session ID (required)"),
+    use_cache: bool = Query(True, description="Set to false to bypass the semantic response cache"),
+    chat_db: PostgresDB = Depends(get_chat_db),
+    manager: LangchainDocManager = Depends(get_manager),
+    write_buffer: WriteBehindBuffer = Depends(get_write_buffer)
+):
+    """
+    Stream the answer as Server-Sent Events: "token" events carry answer text as it is generated,
+    a final "final" event carries the sources, token usage and latency, and "error" reports a failure mid-stream.
+    """
+    if not user_query.strip():
+        raise HTTPException(status_code=400, detail="Query is empty.")
     try:
-        start_time = time.time()
+        timer = StageTimer()
 
         # Validate session
-        sessions = chat_db.get_active_sessions()
-        session_ids = [s["id"] for s in sessions]
-        if session_id not in session_ids:
+        with timer.stage("session_validation"):
+            active = await chat_db.is_session_active(session_id)
+        if not active:
             raise HTTPException(status_code=404, detail="Chat session not found or inactive.")
 
-        chat_db.add_message(session_id, user_query, sender="user")
-
-        docs = manager.vectorstore.similarity_search(user_query)
-        context = "\n\n".join([doc.page_content for doc in docs]) if docs else "No relevant documents found."
+        with timer.stage("history_load"):
+            summary, prior = await load_history(
+                chat_db,
+                session_id,
+                max_messages=config_settings.CHAT_HISTORY_MAX_MESSAGES,
+                token_budget=config_settings.CHAT_HISTORY_TOKEN_BUDGET,
+                max_unsummarized=config_settings.CHAT_SUMMARY_MAX_MESSAGES,
+                llm=manager.llm,
+                summary_batch=config_settings.CHAT_SUMMARY_MAX_MESSAGES
+            )
+        prior += write_buffer.pending_messages(session_id)
+        # Messages and audits go through the write-behind buffer, which keeps their insertion order.
+        write_buffer.add_message(session_id, user_query, sender="user")
 
-        prior = chat_db.get_messages(session_id)
-        messages = [("system", "Use the following context to answer the question.")]
+        history = []
+        if summary:
+            history.append(("system", f"Summary of the earlier conversation:\n{summary}"))
         for m in prior:
             role = "user" if m["sender"] == "user" else "assistant"
-            messages.append((role, m["message"]))
-        messages.append(("user", f"Context:\n{context}\n\nQuestion: {user_query}"))
-
-        async def gen():
-            output = ""
-            async for chunk in manager.llm.astream(messages):
-                content = chunk.content if hasattr(chunk, "content") else str(chunk)
-                output += content
-                yield content
-
-            chat_db.add_message(session_id, output, sender="assistant")
-            latency_ms = int((time.time() - start_time) * 1000)
-            chat_db.add_audit(
-                chat_id=session_id,
-                question=user_query,
-                response=output,
-                retrieved_docs=context,
-                latency_ms=latency_ms
-            )
-
-        return StreamingResponse(gen(), media_type="text/plain")
+            history.append((role, m["message"]))
+
+        async def events():
+            async for event in manager.stream_answer(user_query, history=history, use_cache=use_cache, timer=timer):
+                if event["type"] == "final":
+                    write_buffer.add_message(session_id, event["answer"], sender="assistant")
+                    latency_ms = timer.elapsed_ms()
+                    timer.record("total", latency_ms / 1000)
+                    breakdown = {**timer.breakdown, "cache_hit": event["cached"]}
+                    if event["usage"]:
+                        breakdown.update(tokens_in=event["usage"]["input_tokens"], tokens_out=event["usage"]["output_tokens"])
+                    write_buffer.add_audit(
+                        chat_id=session_id,
+                        question=user_query,
+                        response=event["answer"],
+                        retrieved_docs=event["context"],
+                        latency_ms=latency_ms,
+                        latency_breakdown=breakdown
+                    )
+                    # The client already has the answer from the token events.
+                    event = {"type": "final", "sources": event["sources"], "usage": event["usage"],
+                             "cached": event["cached"], "latency_ms": latency_ms}
+                yield event
+
+        summarize = BackgroundTask(
+            refresh_summary,
+            chat_db,
+            manager.llm,
+            session_id,
+            max_messages=config_settings.CHAT_HISTORY_MAX_MESSAGES,
+            token_budget=config_settings.CHAT_HISTORY_TOKEN_BUDGET,
+            min_batch=config_settings.CHAT_SUMMARY_MIN_MESSAGES,
+            max_batch=config_settings.CHAT_SUMMARY_MAX_MESSAGES
+        )
+        return StreamingResponse(
+            event_stream(events(), request, heartbeat_interval=config_settings.SSE_HEARTBEAT_INTERVAL),
+            media_type="text/event-stream",
+            # Keep proxies from buffering the stream.
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            background=summarize
+        )
 
     except HTTPException:
         raise
@@ -75,27 +105,31 @@ async def chat_stream(user_query: str, session_id: int = Query(..., description=
 
 
 @router.post("/create_session")
-async def create_chat_session():
+async def create_chat_session(chat_db: PostgresDB = Depends(get_chat_db)):
     try:
-        session_id = chat_db.create_session()
+        session_id = await chat_db.create_session()
         return {"session_id": session_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not create session: {str(e)}")
 
 
 @router.get("/sessions")
-async def get_chat_sessions():
+async def get_chat_sessions(chat_db: PostgresDB = Depends(get_chat_db)):
     try:
-        sessions = chat_db.get_active_sessions()
+        sessions = await chat_db.get_active_sessions()
         return {"sessions": sessions}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not retrieve sessions: {str(e)}")
 
 
 @router.get("/{session_id}/messages")
-async def get_chat_messages(session_id: int):
+async def get_chat_messages(
+    session_id: int,
+    chat_db: PostgresDB = Depends(get_chat_db),
+    write_buffer: WriteBehindBuffer = Depends(get_write_buffer)
+):
     try:
-        messages = chat_db.get_messages(session_id)
+        messages = await chat_db.get_messages(session_id) + write_buffer.pending_messages(session_id)
         if not messages:
             raise HTTPException(status_code=404, detail="No messages found for session.")
         return {"messages": messages}
@@ -106,9 +140,9 @@ async def get_chat_messages(session_id: int):
 
 
 @router.delete("/{session_id}")
-async def delete_chat_session(session_id: int):
+async def delete_chat_session(session_id: int, chat_db: PostgresDB = Depends(get_chat_db)):
     try:
-        chat_db.delete_session(session_id)
+        await chat_db.delete_session(session_id)
         return {"message": "Session deleted successfully."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not delete session: {str(e)}")
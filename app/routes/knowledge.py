@@ -1,77 +1,149 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List
-from app.models.ModelDocument import Document  # Should contain 'id' and 'content'
+from fastapi import APIRouter, Depends, Query, UploadFile, File, HTTPException
+from datetime import datetime
+from typing import List, Optional
+from app.models.ModelDocument import Document, DocumentIds
+from app.models.ModelIndex import IndexConfig
 from app.modules.langchain_crud import LangchainDocManager
+from app.modules.postgresdb_base import PostgresDB
+from app.modules.ingestion import save_upload
+from app.modules.ingestion_jobs import IngestionJobQueue, QueueFullError
+from app.core.resources import get_chat_db, get_ingestion_jobs, get_manager, get_or_create_manager
 from app.config import config_settings
 
 import os
+import uuid
 
 router = APIRouter()
 
-COLLECTION_NAME = config_settings.PG_VECTOR_DB_NAME
-HOST = config_settings.PG_VECTOR_DB_HOST
-USER_NAME = config_settings.PG_VECTOR_DB_USERNAME
-PASSWORD = config_settings.PG_VECTOR_DB_PASSWORD
-PORT = config_settings.PG_VECTOR_DB_PORT
-PG_CONNECTION_STR = f"postgresql+psycopg://{USER_NAME}:{PASSWORD}@{HOST}:{PORT}/{COLLECTION_NAME}"
-
-manager = LangchainDocManager(
-    pg_connection_str=PG_CONNECTION_STR,
-    collection_name=COLLECTION_NAME
-)
+@router.post("/add", status_code=202)
+async def add_knowledge(
+    file: UploadFile = File(...),
+    ingestion_jobs: IngestionJobQueue = Depends(get_ingestion_jobs),
+    manager: LangchainDocManager = Depends(get_or_create_manager)
+):
+    """Upload a file and queue it for parsing and storage in the collection (created if needed); poll /jobs/{job_id} for progress."""
+    if ingestion_jobs.is_full():
+        raise HTTPException(status_code=429, detail="Ingestion queue is full, retry later.")
+    file_path = None
+    try:
+        # Stream the upload to the spool directory instead of reading it into memory
+        os.makedirs(config_settings.INGEST_SPOOL_DIR, exist_ok=True)
+        file_path = await save_upload(
+            file,
+            directory=config_settings.INGEST_SPOOL_DIR,
+            chunk_bytes=config_settings.INGEST_UPLOAD_CHUNK_BYTES
+        )
+        job_id = await ingestion_jobs.submit(
+            os.path.basename(file.filename), file_path, collection=manager.collection_name
+        )
+        return {"message": "Document queued", "job_id": job_id}
+    except QueueFullError as e:
+        os.remove(file_path)
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+        raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/add")
-async def add_knowledge(file: UploadFile = File(...)):
-    """Upload and parse a file, then store as document."""
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(job_id: uuid.UUID, chat_db: PostgresDB = Depends(get_chat_db)):
+    """Report the status and parsed/embedded/stored counts of an ingestion job."""
     try:
-        # Save the uploaded file temporarily
-        file_path = f"{file.filename}"
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
+        job = await chat_db.get_ingestion_job(str(job_id))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found.")
+    return {"job": job}
 
-        metadata = manager.load_and_add_doc(file_path)
+@router.get("/embedding_cache")
+async def get_embedding_cache_stats(manager: LangchainDocManager = Depends(get_manager)):
+    """Report hit/miss counters of the embedding cache."""
+    return {"embedding_cache": manager.embeddings.stats()}
 
-        # Clean up
-        os.remove(file_path)
+@router.get("/index")
+async def get_index_status(manager: LangchainDocManager = Depends(get_manager)):
+    """Report the ANN and keyword indexes on the embedding table."""
+    try:
+        return {"indexes": await manager.index.status()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return {"message": "Document added", "metadata": metadata}
+@router.post("/index")
+async def rebuild_index(index: IndexConfig, manager: LangchainDocManager = Depends(get_manager)):
+    """Rebuild the ANN index with the given type and parameters; the old index keeps serving until it is swapped."""
+    try:
+        await manager.index.rebuild(index.type, m=index.m, ef_construction=index.ef_construction, lists=index.lists)
+        return {"message": f"{index.type} index rebuilt", "indexes": await manager.index.status()}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        os.remove(file_path)
         raise HTTPException(status_code=500, detail=str(e))
 
+def _check_bulk_size(count: int):
+    if count > config_settings.KNOWLEDGE_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {config_settings.KNOWLEDGE_BULK_MAX_ITEMS} documents per request."
+        )
+
 @router.post("/update")
-async def update_knowledge(documents: List[Document]):
-    """Update documents in the knowledge base."""
+async def update_knowledge(documents: List[Document], manager: LangchainDocManager = Depends(get_manager)):
+    """Update many documents at once; contents are embedded in batches and written in one transaction."""
+    _check_bulk_size(len(documents))
     try:
-        for doc in documents:
-            manager.update_document(str(doc.id), doc.content)
-        return {"message": "Documents updated successfully"}
+        results = await manager.update_documents([(doc.id, doc.page_content) for doc in documents])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {"updated": sum(r["status"] == "updated" for r in results), "results": results}
 
-@router.delete("/{id}")
-async def delete_knowledge(id: str):
-    """Soft delete a document using its ID."""
+@router.post("/delete")
+async def delete_knowledge_bulk(body: DocumentIds, manager: LangchainDocManager = Depends(get_manager)):
+    """Delete many chunks or catalogued documents at once by ID."""
+    _check_bulk_size(len(body.ids))
     try:
-        manager.delete_document(str(id))
-        return {"message": f"Document {id} marked as deleted"}
+        results = await manager.delete_documents(body.ids)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {"deleted": sum(r["status"] == "deleted" for r in results), "results": results}
 
 @router.get("/get_knowledge")
-async def get_knowledge():
-    """Retrieve metadata including document IDs for deletion."""
+async def get_knowledge(
+    limit: int = Query(50, ge=1, le=500, description="Documents per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor returned by the previous page"),
+    source: Optional[str] = Query(None, description="Only documents with this source"),
+    created_after: Optional[datetime] = Query(None, description="Only documents created at or after this time"),
+    created_before: Optional[datetime] = Query(None, description="Only documents created before this time"),
+    manager: LangchainDocManager = Depends(get_manager)
+):
+    """List catalogued documents (newest first) with their IDs for deletion; follow next_cursor for more."""
     try:
-        docs = manager.list_documents()
-        return {"documents": docs}  # Each doc should include 'id'
+        return await manager.list_documents(
+            limit=limit, cursor=cursor, source=source, created_after=created_after, created_before=created_before
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Declared before /{id} so that DELETE /wipe is not taken for a document ID.
 @router.delete("/wipe")
-async def wipe_knowledge():
+async def wipe_knowledge(manager: LangchainDocManager = Depends(get_manager)):
     """Delete all documents from the knowledge base."""
     try:
-        manager.wipe_vectorstore()
-        return {"message": "All documents deleted from the knowledge base"}
+        return await manager.wipe_vectorstore()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/{id}")
+async def delete_knowledge(id: str, manager: LangchainDocManager = Depends(get_manager)):
+    """Delete a chunk, or a whole document from the catalog, using its ID."""
+    try:
+        deleted = await manager.delete_document(str(id))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Document {id} not found.")
+    return {"message": f"Document {id} deleted", "deleted_chunks": deleted}
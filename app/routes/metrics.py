@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from app.core.metrics import render_metrics
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Expose request stage, database and token metrics in Prometheus text format."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
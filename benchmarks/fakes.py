@@ -0,0 +1,86 @@
+import re
+import time
+import asyncio
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from app.modules.local_models import HashingEmbeddings
+
+_TOKEN = re.compile(r"\w+")
+
+class FakeEmbeddings(HashingEmbeddings):
+    def __init__(self, dimensions: int = 768, latency: float = 0.0):
+        """
+        Deterministic feature-hashing embeddings: texts sharing words get similar vectors,
+        so retrieval quality is meaningful without a model.
+        :dimensions: Vector size
+        :latency: Seconds each call sleeps to simulate a remote provider
+        """
+        super().__init__(dimensions)
+        self.latency = latency
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        return self._vectors(texts).tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self._vectors([text])[0].tolist()
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model streaming a fixed-length answer at a configurable pace."""
+
+    ttft: float = 0.2
+    """Seconds before the first token."""
+    tokens_per_second: float = 50.0
+    """Streaming rate after the first token."""
+    response_tokens: int = 64
+    """Number of tokens in every answer."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark-chat"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        words = _TOKEN.findall(str(messages[-1].content)) or ["ok"]
+        return [f"{words[i % len(words)]} " for i in range(self.response_tokens)]
+
+    def _usage(self, messages: List[BaseMessage], output_tokens: int) -> dict:
+        input_tokens = sum(len(str(m.content)) // 4 + 1 for m in messages)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(self.ttft + len(tokens) / self.tokens_per_second)
+        message = AIMessage(content="".join(tokens), usage_metadata=self._usage(messages, len(tokens)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.ttft)
+        tokens = self._tokens(messages)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(1 / self.tokens_per_second)
+            usage = self._usage(messages, len(tokens)) if i == len(tokens) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.ttft)
+        tokens = self._tokens(messages)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            usage = self._usage(messages, len(tokens)) if i == len(tokens) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage))
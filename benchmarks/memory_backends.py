@@ -0,0 +1,422 @@
+import asyncio
+import uuid
+import hashlib
+import itertools
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from app.config import config_settings
+from app.core.metrics import StageTimer, observe_db
+from app.modules.document_catalog import chunk_hash, decode_cursor, encode_cursor
+from app.modules.langchain_crud import LangchainDocManager
+
+class InMemoryChatDB:
+    def __init__(self, latency: float = 0.0):
+        """
+        Stand-in for PostgresDB keeping sessions, messages, summaries, audits, ingestion jobs
+        and cached embeddings in memory, so the API can be benchmarked without Postgres.
+        :latency: Seconds every operation sleeps to simulate a database round trip
+        """
+        self.latency = latency
+        self.sessions: Dict[int, dict] = {}
+        self.messages: List[dict] = []
+        self.summaries: Dict[int, dict] = {}
+        self.audits: List[tuple] = []
+        self.jobs: Dict[str, dict] = {}
+        self.embeddings: Dict[tuple, list] = {}
+        self._session_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    async def _round_trip(self):
+        await asyncio.sleep(self.latency)
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @observe_db("create_session")
+    async def create_session(self):
+        await self._round_trip()
+        session_id = next(self._session_ids)
+        self.sessions[session_id] = {"id": session_id, "created_at": datetime.utcnow(), "deleted_at": None}
+        return session_id
+
+    @observe_db("is_session_active")
+    async def is_session_active(self, session_id: int) -> bool:
+        await self._round_trip()
+        session = self.sessions.get(session_id)
+        return session is not None and session["deleted_at"] is None
+
+    @observe_db("get_active_sessions")
+    async def get_active_sessions(self):
+        await self._round_trip()
+        return [{"id": s["id"], "created_at": s["created_at"]} for s in self.sessions.values() if s["deleted_at"] is None]
+
+    @observe_db("delete_session")
+    async def delete_session(self, session_id: int):
+        await self._round_trip()
+        if session_id in self.sessions:
+            self.sessions[session_id]["deleted_at"] = datetime.utcnow()
+
+    @asynccontextmanager
+    async def maintenance_lock(self):
+        yield True
+
+    @observe_db("ensure_partitions")
+    async def ensure_partitions(self, months_ahead: int) -> List[str]:
+        # Nothing is partitioned in memory.
+        return []
+
+    @observe_db("list_partitions")
+    async def list_partitions(self, table: str) -> List[dict]:
+        return []
+
+    @observe_db("purge_deleted_sessions")
+    async def purge_deleted_sessions(self, deleted_before: datetime, batch_size: int = 1000) -> int:
+        await self._round_trip()
+        purged = {i for i, s in self.sessions.items() if s["deleted_at"] is not None and s["deleted_at"] < deleted_before}
+        for i in purged:
+            del self.sessions[i]
+            self.summaries.pop(i, None)
+        self.messages = [m for m in self.messages if m["session_id"] not in purged]
+        self.audits = [(None, *a[1:]) if a[0] in purged else a for a in self.audits]
+        return len(purged)
+
+    def _insert_message(self, session_id: int, message: str, sender: str, created_at: datetime):
+        self.messages.append({
+            "id": next(self._message_ids), "session_id": session_id,
+            "message": message, "sender": sender, "created_at": created_at
+        })
+
+    @staticmethod
+    def _public(m: dict) -> dict:
+        return {"id": m["id"], "message": m["message"], "sender": m["sender"], "created_at": m["created_at"]}
+
+    @observe_db("add_message")
+    async def add_message(self, session_id: int, message: str, sender: str):
+        await self._round_trip()
+        self._insert_message(session_id, message, sender, datetime.utcnow())
+
+    @observe_db("write_batch")
+    async def write_batch(self, messages: list, audits: list):
+        await self._round_trip()
+        for row in messages:
+            self._insert_message(*row)
+        self.audits.extend(audits)
+
+    @observe_db("get_messages")
+    async def get_messages(self, session_id: int):
+        await self._round_trip()
+        if not await self.is_session_active(session_id):
+            return []
+        return [self._public(m) for m in self.messages if m["session_id"] == session_id]
+
+    @observe_db("get_recent_messages")
+    async def get_recent_messages(self, session_id: int, limit: int, before_id: int = None):
+        await self._round_trip()
+        rows = [m for m in reversed(self.messages)
+                if m["session_id"] == session_id and (before_id is None or m["id"] < before_id)]
+        return [self._public(m) for m in rows[:limit]]
+
+    @observe_db("get_messages_range")
+    async def get_messages_range(self, session_id: int, after_id: int, before_id: int, limit: int,
+                                 newest_first: bool = False):
+        await self._round_trip()
+        rows = [m for m in self.messages if m["session_id"] == session_id and after_id < m["id"] < before_id]
+        if newest_first:
+            rows.reverse()
+        return [self._public(m) for m in rows[:limit]]
+
+    @observe_db("get_summary")
+    async def get_summary(self, session_id: int):
+        await self._round_trip()
+        return self.summaries.get(session_id)
+
+    @observe_db("upsert_summary")
+    async def upsert_summary(self, session_id: int, summary: str, last_message_id: int):
+        await self._round_trip()
+        current = self.summaries.get(session_id)
+        if current is None or current["last_message_id"] < last_message_id:
+            self.summaries[session_id] = {
+                "summary": summary, "last_message_id": last_message_id, "updated_at": datetime.utcnow()
+            }
+
+    @observe_db("add_audit")
+    async def add_audit(self, chat_id, question, response, retrieved_docs, latency_ms, feedback=None, latency_breakdown=None):
+        await self._round_trip()
+        self.audits.append((
+            chat_id, question, response, retrieved_docs, latency_ms, datetime.utcnow(), feedback, latency_breakdown
+        ))
+
+    @observe_db("create_ingestion_job")
+    async def create_ingestion_job(self, job_id: str, filename: str, file_path: str, collection: str = None,
+                                   host: str = None):
+        await self._round_trip()
+        now = datetime.utcnow()
+        self.jobs[job_id] = {
+            "id": job_id, "filename": filename, "file_path": file_path, "collection": collection, "host": host,
+            "status": "queued",
+            "parsed": 0, "embedded": 0, "stored": 0, "error": None, "created_at": now, "updated_at": now
+        }
+
+    @observe_db("update_ingestion_job")
+    async def update_ingestion_job(self, job_id: str, status: str = None, parsed: int = None,
+                                   embedded: int = None, stored: int = None, error: str = None):
+        await self._round_trip()
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        fields = {"status": status, "parsed": parsed, "embedded": embedded, "stored": stored, "error": error}
+        job.update({k: v for k, v in fields.items() if v is not None}, updated_at=datetime.utcnow())
+
+    @observe_db("get_ingestion_job")
+    async def get_ingestion_job(self, job_id: str):
+        await self._round_trip()
+        job = self.jobs.get(job_id)
+        return {k: v for k, v in job.items() if k not in ("file_path", "worker", "heartbeat_at", "host")} if job else None
+
+    @observe_db("get_unfinished_ingestion_jobs")
+    async def get_unfinished_ingestion_jobs(self, stale_before: datetime, host: str = None):
+        await self._round_trip()
+        return [{"id": j["id"], "filename": j["filename"], "file_path": j["file_path"], "collection": j["collection"]}
+                for j in self.jobs.values()
+                if (j["status"] != "queued" or j["updated_at"] < stale_before) and self._claimable(j, stale_before)
+                and (host is None or j.get("host") in (None, host))]
+
+    @staticmethod
+    def _claimable(job: dict, stale_before: datetime) -> bool:
+        heartbeat = job.get("heartbeat_at") or job["updated_at"]
+        return job["status"] == "queued" or (job["status"] == "running" and heartbeat < stale_before)
+
+    @observe_db("claim_ingestion_job")
+    async def claim_ingestion_job(self, job_id: str, worker: str, stale_before: datetime) -> bool:
+        await self._round_trip()
+        job = self.jobs.get(job_id)
+        if job is None or not self._claimable(job, stale_before):
+            return False
+        now = datetime.utcnow()
+        job.update(status="running", worker=worker, heartbeat_at=now, updated_at=now)
+        return True
+
+    @observe_db("heartbeat_ingestion_job")
+    async def heartbeat_ingestion_job(self, job_id: str, worker: str):
+        await self._round_trip()
+        job = self.jobs.get(job_id)
+        if job is not None and job.get("worker") == worker:
+            job["heartbeat_at"] = datetime.utcnow()
+
+    @observe_db("get_cached_embeddings")
+    async def get_cached_embeddings(self, model: str, hashes: list):
+        await self._round_trip()
+        return {h: self.embeddings[(model, h)] for h in hashes if (model, h) in self.embeddings}
+
+    @observe_db("put_cached_embeddings")
+    async def put_cached_embeddings(self, model: str, vectors: dict):
+        await self._round_trip()
+        for h, vector in vectors.items():
+            self.embeddings.setdefault((model, h), list(vector))
+
+class InMemoryVectorStore:
+    def __init__(self):
+        """Minimal async vector store holding chunks and their normalized embeddings in memory."""
+        self.rows: Dict[str, dict] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+
+    async def acreate_collection(self):
+        pass
+
+    async def aadd_embeddings(self, texts: List[str], embeddings: List[List[float]],
+                              metadatas: List[dict] = None, ids: List[str] = None, **kwargs):
+        for i, (text, vector) in enumerate(zip(texts, embeddings)):
+            v = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(v)
+            self.rows[ids[i]] = {
+                "document": text,
+                "cmetadata": (metadatas[i] if metadatas else {}) or {},
+                "embedding": v / norm if norm else v,
+            }
+        self._matrix = None
+        return ids
+
+    async def adelete(self, ids: List[str] = None, **kwargs):
+        for doc_id in ids or []:
+            self.rows.pop(doc_id, None)
+        self._matrix = None
+
+    def search(self, query_vector: List[float], k: int) -> List[Document]:
+        if not self.rows:
+            return []
+        if self._matrix is None:
+            self._ids = list(self.rows)
+            self._matrix = np.stack([self.rows[i]["embedding"] for i in self._ids])
+        scores = self._matrix @ np.asarray(query_vector, dtype=np.float32)
+        top = np.argsort(-scores)[:k]
+        return [
+            Document(id=self._ids[i], page_content=self.rows[self._ids[i]]["document"],
+                     metadata=self.rows[self._ids[i]]["cmetadata"])
+            for i in top
+        ]
+
+class InMemoryCatalog:
+    def __init__(self, store: InMemoryVectorStore):
+        """DocumentCatalog counterpart over an InMemoryVectorStore."""
+        self.store = store
+        self.documents: Dict[str, dict] = {}
+        self.knowledge_version = 0
+
+    async def ensure(self):
+        pass
+
+    async def version(self, collection_id) -> int:
+        return self.knowledge_version
+
+    async def bump_version(self, collection_id) -> int:
+        self.knowledge_version += 1
+        return self.knowledge_version
+
+    async def adopt_legacy_chunks(self):
+        pass
+
+    async def refresh(self, collection_id, document_ids: List[str], conn=None):
+        now = datetime.utcnow()
+        for document_id in document_ids:
+            chunks = sorted(
+                (r for r in self.store.rows.values() if r["cmetadata"].get("document_id") == document_id),
+                key=lambda r: r["cmetadata"].get("chunk", 0)
+            )
+            if not chunks:
+                self.documents.pop(document_id, None)
+                continue
+            current = self.documents.get(document_id)
+            self.documents[document_id] = {
+                "id": document_id,
+                "source": chunks[0]["cmetadata"].get("source"),
+                "chunk_count": len(chunks),
+                "size_bytes": sum(len(r["document"].encode("utf-8")) for r in chunks),
+                "content_hash": hashlib.sha256("".join(r["document"] for r in chunks).encode("utf-8")).hexdigest(),
+                "created_at": current["created_at"] if current else now,
+                "updated_at": now,
+            }
+
+    def _source_rows(self, source: str, document_id: Optional[str] = None) -> Dict[str, dict]:
+        documents = {d["id"] for d in self.documents.values() if d["source"] == source} | {document_id}
+        return {i: r for i, r in self.store.rows.items() if r["cmetadata"].get("document_id") in documents}
+
+    async def source_chunks(self, collection_id, source: str) -> Dict[str, Optional[str]]:
+        return {i: r["cmetadata"].get("chunk_hash") for i, r in self._source_rows(source).items()}
+
+    async def sync_source(self, collection_id, source: str, document_id: str, chunks: List[dict], embed) -> dict:
+        rows = self._source_rows(source, document_id)
+        documents = {r["cmetadata"].get("document_id") for r in rows.values()} | {document_id}
+        missing = [c for c in chunks if c["vector"] is None and c["id"] not in rows]
+        if missing:
+            for chunk, vector in zip(missing, await embed([c["text"] for c in missing])):
+                chunk["vector"] = vector
+        vanished = [i for i in rows if i not in {c["id"] for c in chunks}]
+        await self.store.adelete(vanished)
+        added = [c for c in chunks if c["vector"] is not None]
+        if added:
+            await self.store.aadd_embeddings(
+                [c["text"] for c in added], [c["vector"] for c in added],
+                [c["metadata"] for c in added], [c["id"] for c in added]
+            )
+        kept = [c for c in chunks if c["vector"] is None]
+        for chunk in kept:
+            self.store.rows[chunk["id"]]["cmetadata"] = chunk["metadata"]
+        await self.refresh(collection_id, list(documents))
+        return {"added": len(added), "unchanged": len(kept), "deleted": len(vanished)}
+
+    async def list_documents(self, collection_id, limit: int = 50, cursor: Optional[str] = None,
+                             source: Optional[str] = None, created_after: Optional[datetime] = None,
+                             created_before: Optional[datetime] = None) -> dict:
+        rows = sorted(self.documents.values(), key=lambda d: (d["created_at"], d["id"]), reverse=True)
+        if cursor:
+            position = decode_cursor(cursor)
+            rows = [d for d in rows if (d["created_at"], d["id"]) < position]
+        rows = [d for d in rows
+                if (source is None or d["source"] == source)
+                and (created_after is None or d["created_at"] >= created_after)
+                and (created_before is None or d["created_at"] < created_before)]
+        next_cursor = encode_cursor(rows[limit - 1]["created_at"], rows[limit - 1]["id"]) if len(rows) > limit else None
+        return {"documents": [dict(d) for d in rows[:limit]], "next_cursor": next_cursor}
+
+    async def update_chunks(self, collection_id, chunks: List[tuple]) -> List[str]:
+        updated, documents = [], set()
+        for chunk_id, content, vector in chunks:
+            row = self.store.rows.get(chunk_id)
+            if row is None:
+                continue
+            metadata = {**row["cmetadata"], "chunk_hash": chunk_hash(content)}
+            await self.store.aadd_embeddings([content], [vector], [metadata], [chunk_id])
+            updated.append(chunk_id)
+            documents.add(metadata.get("document_id"))
+        await self.refresh(collection_id, [d for d in documents if d])
+        return updated
+
+    async def delete(self, collection_id, ids: List[str]) -> List[tuple]:
+        wanted = set(ids)
+        rows = [(chunk_id, r["cmetadata"].get("document_id")) for chunk_id, r in self.store.rows.items()
+                if chunk_id in wanted or r["cmetadata"].get("document_id") in wanted]
+        await self.store.adelete([chunk_id for chunk_id, _ in rows])
+        await self.refresh(collection_id, list({d for _, d in rows if d}))
+        return rows
+
+    async def wipe(self, collection_id) -> int:
+        deleted = len(self.store.rows)
+        await self.store.adelete(list(self.store.rows))
+        self.documents.clear()
+        return deleted
+
+class InMemoryDocManager(LangchainDocManager):
+    def __init__(self, latency: float = 0.0, **kwargs):
+        """
+        LangchainDocManager whose vector store lives in memory and is searched by brute-force cosine similarity.
+        Parsing, batching, caching and answering run through the real manager code.
+        :latency: Seconds every vector store operation sleeps to simulate a database round trip
+        """
+        kwargs.setdefault("collection_name", "benchmark")
+        self.collections = kwargs.pop("collections", None) or {kwargs["collection_name"]}
+        super().__init__(pg_connection_str="postgresql+psycopg://benchmark@localhost/benchmark", **kwargs)
+        self.latency = latency
+        self._vectorstore = InMemoryVectorStore()
+        self.catalog = InMemoryCatalog(self._vectorstore)
+
+    @property
+    def vectorstore(self) -> InMemoryVectorStore:
+        return self._vectorstore
+
+    def for_collection(self, collection_name: str, response_cache=None) -> "InMemoryDocManager":
+        return InMemoryDocManager(
+            latency=self.latency, collection_name=collection_name, collections=self.collections,
+            embedding_store=self._embedding_store, response_cache=response_cache,
+            embeddings=self.embeddings, llm=self.llm, context_packer=self.context_packer, engine=self.engine
+        )
+
+    async def startup(self):
+        await self.open_collection(create=True)
+
+    async def open_collection(self, create: bool = False):
+        if create:
+            self.collections.add(self.collection_name)
+        if self.collection_name not in self.collections:
+            raise LookupError(f"Collection {self.collection_name} not found.")
+        self.collection_id = str(uuid.uuid5(uuid.NAMESPACE_URL, self.collection_name))
+
+    async def ensure_indexes(self):
+        pass
+
+    async def _search(self, query_vector: List[float], k: Optional[int], ef_search: Optional[int],
+                      probes: Optional[int], query_text: Optional[str], timer: Optional[StageTimer],
+                      with_vectors: bool) -> Tuple[List[Document], Optional[np.ndarray]]:
+        with (timer or StageTimer()).stage("retrieval"):
+            await asyncio.sleep(self.latency)
+            docs = self.vectorstore.search(query_vector, k or config_settings.VECTOR_SEARCH_K)
+        if not with_vectors:
+            return docs, None
+        vectors = np.asarray([self.vectorstore.rows[d.id]["embedding"] for d in docs], dtype=np.float32)
+        return docs, vectors.reshape(len(docs), -1)
@@ -0,0 +1,256 @@
+"""
+Offline load test for the RAG API.
+
+Starts the app in-process behind uvicorn with deterministic fake embedding and chat providers, drives
+/knowledge/add, retrieval and /chat/ at a fixed concurrency and prints throughput and latency percentiles
+(plus time to first token for chat) as JSON. Use it to compare a change against a baseline before deploying:
+
+    python -m benchmarks.run --backend memory --requests 200 --concurrency 16 --output baseline.json
+    python -m benchmarks.run --backend postgres --scenarios chat --ttft 0.3 --tokens-per-second 40
+
+The memory backend needs no database; the postgres backend uses the databases configured in app/.env.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+from typing import Awaitable, Callable, List, Optional
+import numpy as np
+
+SCENARIOS = ("ingest", "retrieval", "chat")
+
+VOCABULARY = (
+    "postgres vector index embedding chunk retrieval latency throughput session message audit cache "
+    "query answer context document upload parse batch stream token model provider pool connection "
+    "summary history window budget rerank fusion keyword semantic cosine distance partition archive"
+).split()
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline load test with fake LLM and embedding providers.")
+    parser.add_argument("--backend", choices=("memory", "postgres"), default="memory",
+                        help="In-memory stand-ins for the databases, or the Postgres+pgvector instances from app/.env")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="Comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100, help="Requests per chat/retrieval scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--documents", type=int, default=20, help="Files uploaded by the ingest scenario")
+    parser.add_argument("--document-words", type=int, default=2000, help="Words per uploaded file")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="Seconds per fake embedding call")
+    parser.add_argument("--ttft", type=float, default=0.2, help="Seconds before the fake LLM's first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Fake LLM streaming rate")
+    parser.add_argument("--response-tokens", type=int, default=64, help="Tokens per fake LLM answer")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Seconds per in-memory database operation")
+    parser.add_argument("--collection", help="Knowledge collection the scenarios run against (default collection with "
+                                             "the memory backend, \"benchmark\" with the postgres backend)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the generated documents and queries")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.backend == "postgres" and not args.collection:
+        # Never write generated documents into the collection real users query.
+        args.collection = "benchmark"
+    return args
+
+def configure_environment(workdir: str):
+    """Settings are read at import time, so this must run before anything under app/ is imported."""
+    # The benchmark injects its own fakes; these only keep the settings from requiring an API key.
+    os.environ.setdefault("EMBEDDING_PROVIDER", "hashing")
+    os.environ.setdefault("LLM_PROVIDER", "stub")
+    os.environ.setdefault("INGEST_SPOOL_DIR", os.path.join(workdir, "uploads"))
+    os.environ.setdefault("WRITE_BEHIND_SPILL_DIR", os.path.join(workdir, "spill"))
+
+def summarize(values_ms: List[float]) -> dict:
+    if not values_ms:
+        return {}
+    values = np.asarray(values_ms)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2),
+        "mean": round(float(values.mean()), 2), "max": round(float(values.max()), 2),
+    }
+
+async def run_load(requests: int, concurrency: int, call: Callable[[int], Awaitable[Optional[float]]]) -> dict:
+    """
+    Run call(i) for i in range(requests) with at most `concurrency` calls in flight.
+    call returns the request's time to first token in seconds, or None when that does not apply.
+    """
+    latencies, first_tokens, errors = [], [], []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                first_token = await call(i)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            if first_token is not None:
+                first_tokens.append(first_token * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+    report = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "succeeded": len(latencies),
+        "errors": len(errors),
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else None,
+        "latency_ms": summarize(latencies),
+    }
+    if first_tokens:
+        report["ttft_ms"] = summarize(first_tokens)
+    if errors:
+        report["first_errors"] = sorted(set(errors))[:5]
+    return report
+
+def make_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+def collection_params(args) -> dict:
+    return {"collection": args.collection} if args.collection else {}
+
+async def ingest_scenario(client, args) -> dict:
+    rng = random.Random(args.seed)
+    documents = [make_text(rng, args.document_words).encode("utf-8") for _ in range(args.documents)]
+
+    async def upload(i: int) -> None:
+        response = await client.post(
+            "/knowledge/add", params=collection_params(args),
+            files={"file": (f"benchmark-{i}.txt", documents[i], "text/plain")}
+        )
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+        while True:
+            job = (await client.get(f"/knowledge/jobs/{job_id}")).json()["job"]
+            if job["status"] == "completed":
+                return None
+            if job["status"] == "failed":
+                raise RuntimeError(job["error"])
+            await asyncio.sleep(0.02)
+
+    return await run_load(args.documents, args.concurrency, upload)
+
+async def retrieval_scenario(collections, args) -> dict:
+    rng = random.Random(args.seed + 1)
+    queries = [make_text(rng, 8) for _ in range(args.requests)]
+    manager = await collections.get(args.collection, create=True)
+
+    async def search(i: int) -> None:
+        query_vector = await manager.embeddings.aembed_query(queries[i])
+        await manager.asearch(query_vector, query_text=queries[i])
+
+    return await run_load(args.requests, args.concurrency, search)
+
+async def chat_scenario(client, args) -> dict:
+    rng = random.Random(args.seed + 2)
+    queries = [make_text(rng, 12) for _ in range(args.requests)]
+    sessions = []
+    for _ in range(args.concurrency):
+        response = await client.post("/chat/create_session")
+        response.raise_for_status()
+        sessions.append(response.json()["session_id"])
+
+    async def chat(i: int) -> float:
+        start = time.perf_counter()
+        first_token = None
+        finished = False
+        params = {"user_query": queries[i], "session_id": sessions[i % len(sessions)], "use_cache": "false",
+                  **collection_params(args)}
+        async with client.stream("POST", "/chat/", params=params) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line == "event: token" and first_token is None:
+                    first_token = time.perf_counter() - start
+                elif line == "event: final":
+                    finished = True
+                elif line == "event: error":
+                    raise RuntimeError("Error event in chat stream")
+        if first_token is None or not finished:
+            raise RuntimeError("Incomplete chat stream")
+        return first_token
+
+    return await run_load(args.requests, args.concurrency, chat)
+
+def build_resources(args):
+    from app.core.resources import Resources
+    from app.config import config_settings
+    from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+    embeddings = FakeEmbeddings(dimensions=config_settings.PG_VECTOR_DB_VECTOR_SIZE, latency=args.embedding_latency)
+    llm = FakeChatModel(ttft=args.ttft, tokens_per_second=args.tokens_per_second, response_tokens=args.response_tokens)
+    if args.backend == "postgres":
+        return Resources(embeddings=embeddings, llm=llm)
+    from benchmarks.memory_backends import InMemoryChatDB, InMemoryDocManager
+    chat_db = InMemoryChatDB(latency=args.db_latency)
+    manager = InMemoryDocManager(latency=args.db_latency, embedding_store=chat_db, embeddings=embeddings, llm=llm)
+    return Resources(chat_db=chat_db, manager=manager)
+
+async def run(args) -> dict:
+    import httpx
+    import uvicorn
+    from main import app
+
+    app.state.resources = build_resources(args)
+    # Serving over a real socket (rather than an in-process transport) lets chat responses stream,
+    # so time to first token is measured the way clients see it.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="on"))
+    serving = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        if serving.done():
+            serving.result()
+            raise RuntimeError("Server stopped during startup")
+        await asyncio.sleep(0.01)
+
+    results = {}
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        base_url = "http://%s:%d" % sock.getsockname()
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+            for scenario in SCENARIOS:
+                if scenario not in args.scenarios:
+                    continue
+                if scenario == "ingest":
+                    results[scenario] = await ingest_scenario(client, args)
+                elif scenario == "retrieval":
+                    results[scenario] = await retrieval_scenario(app.state.resources.collections, args)
+                else:
+                    results[scenario] = await chat_scenario(client, args)
+    finally:
+        server.should_exit = True
+        await serving
+    return results
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="rag-benchmark-") as workdir:
+        configure_environment(workdir)
+        results = asyncio.run(run(args))
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "scenarios": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    failed = any(r["errors"] for r in results.values())
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
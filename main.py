@@ -1,11 +1,27 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from starlette.middleware.cors import CORSMiddleware
-from app.core.exception import http_exception_handler
+from app.core.exception import http_exception_handler, provider_unavailable_handler
+from app.core.resources import Resources
+from app.modules.provider_gateway import ProviderUnavailableError
 import uvicorn
-from app.routes import chat, knowledge
+from app.routes import chat, knowledge, metrics
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the shared resources on startup and release them on shutdown."""
+    # Resources assigned before startup (e.g. with fake backends) are used as-is.
+    if not hasattr(app.state, "resources"):
+        app.state.resources = Resources()
+    await app.state.resources.startup()
+    try:
+        yield
+    finally:
+        await app.state.resources.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 app.add_exception_handler(HTTPException, http_exception_handler)
+app.add_exception_handler(ProviderUnavailableError, provider_unavailable_handler)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,6 +33,9 @@ app.add_middleware(
 
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
 app.include_router(knowledge.router, prefix="/knowledge", tags=["knowledge"])
+# The same routes scoped to one collection; without the prefix they take an optional ?collection= instead.
+app.include_router(knowledge.router, prefix="/knowledge/{collection}", tags=["knowledge"])
+app.include_router(metrics.router, tags=["metrics"])
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
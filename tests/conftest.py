@@ -0,0 +1,5 @@
+import os
+
+# Settings are read at import time; the units under test need no provider credentials.
+os.environ.setdefault("EMBEDDING_PROVIDER", "hashing")
+os.environ.setdefault("LLM_PROVIDER", "stub")
@@ -0,0 +1,83 @@
+import asyncio
+from benchmarks.memory_backends import InMemoryChatDB
+from app.modules.chat_history import estimate_tokens, get_history_window, load_history, refresh_summary
+
+class SummaryLLM:
+    """Chat model stand-in that records the prompts it is given and answers with a fixed summary."""
+
+    def __init__(self, summary: str = "summary"):
+        self.summary = summary
+        self.prompts = []
+
+    async def ainvoke(self, messages):
+        self.prompts.append(messages)
+        return type("Result", (), {"content": f"{self.summary} {len(self.prompts)}"})()
+
+def session_with(count: int, text: str = "message") -> InMemoryChatDB:
+    db = InMemoryChatDB()
+    db.sessions[1] = {"id": 1, "created_at": None, "deleted_at": None}
+    for i in range(1, count + 1):
+        db._insert_message(1, f"{text} {i}", "user" if i % 2 else "assistant", None)
+    return db
+
+def texts(messages):
+    return [m["message"] for m in messages]
+
+def test_window_is_the_newest_messages_in_order():
+    window = asyncio.run(get_history_window(session_with(30), 1, max_messages=5, token_budget=1000, page_size=2))
+    assert texts(window) == [f"message {i}" for i in range(26, 31)]
+
+def test_window_stops_at_the_token_budget():
+    db = session_with(10)
+    budget = 3 * estimate_tokens("message 10")
+    window = asyncio.run(get_history_window(db, 1, max_messages=10, token_budget=budget))
+    assert texts(window) == ["message 8", "message 9", "message 10"]
+
+def test_refresh_summary_folds_messages_before_the_window():
+    async def scenario():
+        db, llm = session_with(20), SummaryLLM()
+        advanced = await refresh_summary(db, llm, 1, max_messages=5, token_budget=1000, min_batch=6, max_batch=50)
+        return db, llm, advanced
+
+    db, llm, advanced = asyncio.run(scenario())
+    assert advanced
+    assert db.summaries[1]["last_message_id"] == 15
+    assert "user: message 1\n" in llm.prompts[0][1][1]
+    assert "message 16" not in llm.prompts[0][1][1]
+
+def test_refresh_summary_waits_for_min_batch():
+    llm = SummaryLLM()
+    advanced = asyncio.run(refresh_summary(session_with(8), llm, 1, max_messages=5, token_budget=1000, min_batch=6))
+    assert not advanced
+    assert llm.prompts == []
+
+def test_unsummarized_messages_are_prepended_newest_first_within_budget():
+    async def scenario():
+        db = session_with(12)
+        await db.upsert_summary(1, "earlier", 4)
+        window_tokens = 5 * estimate_tokens("message 10")
+        return await load_history(db, 1, max_messages=5, token_budget=window_tokens + 2 * estimate_tokens("message 7"))
+
+    summary, history = asyncio.run(scenario())
+    assert summary == "earlier"
+    # Messages 5-7 have left the window without being summarized; only the newest two fit the budget.
+    assert texts(history) == [f"message {i}" for i in range(6, 13)]
+
+def test_backlog_is_capped_without_llm():
+    summary, history = asyncio.run(load_history(session_with(100), 1, max_messages=5, token_budget=10000,
+                                                max_unsummarized=10))
+    assert summary is None
+    assert texts(history) == [f"message {i}" for i in range(86, 101)]
+
+def test_oversized_backlog_is_folded_into_the_summary():
+    async def scenario():
+        db, llm = session_with(120), SummaryLLM()
+        result = await load_history(db, 1, max_messages=5, token_budget=10000, max_unsummarized=10,
+                                    llm=llm, summary_batch=50)
+        return db, llm, result
+
+    db, llm, (summary, history) = asyncio.run(scenario())
+    assert len(llm.prompts) == 3
+    assert db.summaries[1]["last_message_id"] == 115
+    assert summary == "summary 3"
+    assert texts(history) == [f"message {i}" for i in range(116, 121)]
@@ -0,0 +1,62 @@
+import numpy as np
+from langchain_core.documents import Document
+from app.modules.chat_history import estimate_tokens
+from app.modules.context_packing import ContextPacker, LexicalReranker, get_reranker
+
+def doc(i: int, text: str, source: str = "notes.txt") -> Document:
+    return Document(id=str(i), page_content=text, metadata={"source": source, "chunk": i, "document_id": "d1"})
+
+def unit(*rows) -> np.ndarray:
+    vectors = np.asarray(rows, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def test_chunks_are_numbered_for_citation_with_their_sources():
+    packed = ContextPacker().pack("q", [doc(0, "first chunk"), doc(1, "second chunk")])
+    assert packed["text"] == "[1] (notes.txt, chunk 0)\nfirst chunk\n\n[2] (notes.txt, chunk 1)\nsecond chunk"
+    assert [(s["ref"], s["id"], s["document_id"]) for s in packed["sources"]] == [(1, "0", "d1"), (2, "1", "d1")]
+    assert packed["tokens"] == estimate_tokens("first chunk") + estimate_tokens("second chunk")
+
+def test_exact_duplicates_are_dropped():
+    packed = ContextPacker().pack("q", [doc(0, "same text"), doc(1, "same text"), doc(2, "other text")])
+    assert [s["id"] for s in packed["sources"]] == ["0", "2"]
+    assert packed["candidates"] == 2
+
+def test_near_duplicates_are_dropped_with_vectors():
+    docs = [doc(0, "alpha"), doc(1, "alpha!"), doc(2, "beta")]
+    vectors = unit([1.0, 0.0], [0.999, 0.01], [0.0, 1.0])
+    packed = ContextPacker(duplicate_threshold=0.95).pack("q", docs, vectors)
+    assert [s["id"] for s in packed["sources"]] == ["0", "2"]
+
+def test_mmr_prefers_a_diverse_chunk_over_a_similar_one():
+    docs = [doc(0, "a"), doc(1, "b"), doc(2, "c")]
+    vectors = unit([1.0, 0.0], [0.9, 0.43], [0.0, 1.0])
+    packed = ContextPacker(max_chunks=2, mmr_lambda=0.5, duplicate_threshold=0.99).pack("q", docs, vectors)
+    assert [s["id"] for s in packed["sources"]] == ["0", "2"]
+
+def test_budget_skips_large_chunks_but_keeps_smaller_ones():
+    docs = [doc(0, "x" * 40), doc(1, "y" * 400), doc(2, "z" * 40)]
+    packed = ContextPacker(token_budget=30).pack("q", docs)
+    assert [s["id"] for s in packed["sources"]] == ["0", "2"]
+    assert packed["tokens"] <= 30
+
+def test_single_oversized_chunk_is_truncated_rather_than_dropped():
+    packed = ContextPacker(token_budget=10).pack("q", [doc(0, "w" * 400)])
+    assert len(packed["sources"]) == 1
+    assert packed["text"].endswith("\n" + "w" * 40)
+
+def test_max_chunks_is_respected():
+    packed = ContextPacker(max_chunks=2).pack("q", [doc(i, f"chunk {i}") for i in range(5)])
+    assert len(packed["sources"]) == 2
+
+def test_no_candidates():
+    packed = ContextPacker().pack("q", [])
+    assert packed == {"text": "No relevant documents found.", "sources": [], "tokens": 0, "candidates": 0}
+
+def test_reranker_overrides_retrieval_order():
+    docs = [doc(0, "unrelated filler text"), doc(1, "the cat sat on the mat")]
+    packed = ContextPacker(max_chunks=1, reranker=LexicalReranker()).pack("where did the cat sit", docs)
+    assert [s["id"] for s in packed["sources"]] == ["1"]
+
+def test_get_reranker():
+    assert get_reranker("none") is None
+    assert isinstance(get_reranker("lexical"), LexicalReranker)
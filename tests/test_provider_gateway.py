@@ -0,0 +1,171 @@
+import asyncio
+import time
+import pytest
+from app.modules.provider_gateway import (
+    GatewayEmbeddings, ProviderGateway, ProviderUnavailableError, TokenBucket, is_retryable, unavailable_cause
+)
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+class CountingEmbeddings:
+    """Embeddings client recording the batches it receives."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batches = []
+
+    async def aembed_documents(self, texts):
+        self.batches.append(list(texts))
+        await asyncio.sleep(self.delay)
+        return [[float(len(t))] for t in texts]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+def gateway(**kwargs) -> ProviderGateway:
+    defaults = dict(concurrency=4, queue_timeout=1, max_retries=3, base_delay=0.001, max_delay=0.01)
+    return ProviderGateway("test", **{**defaults, **kwargs})
+
+def test_is_retryable_follows_the_cause_chain():
+    try:
+        try:
+            raise StatusError(429)
+        except StatusError as e:
+            raise RuntimeError("wrapped") from e
+    except RuntimeError as e:
+        wrapped = e
+    assert is_retryable(wrapped)
+    assert not is_retryable(StatusError(400))
+    assert is_retryable(asyncio.TimeoutError())
+
+def test_call_retries_retryable_errors_then_succeeds():
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise StatusError(503)
+        return "ok"
+
+    assert asyncio.run(gateway().call(flaky)) == "ok"
+    assert len(attempts) == 3
+
+def test_non_retryable_error_is_raised_at_once():
+    attempts = []
+
+    async def bad_request():
+        attempts.append(1)
+        raise StatusError(400)
+
+    with pytest.raises(StatusError):
+        asyncio.run(gateway().call(bad_request))
+    assert len(attempts) == 1
+
+def test_exhausted_retries_raise_provider_unavailable():
+    async def overloaded():
+        raise StatusError(429)
+
+    with pytest.raises(ProviderUnavailableError) as info:
+        asyncio.run(gateway(max_retries=2).call(overloaded))
+    assert info.value.retry_after is not None
+    assert isinstance(info.value.__cause__, StatusError)
+
+def test_backoff_is_bounded_by_max_delay():
+    g = gateway(base_delay=0.5, max_delay=2)
+    delays = [g.backoff(attempt) for attempt in range(10) for _ in range(20)]
+    assert all(0 <= d <= 2 for d in delays)
+    assert all(g.backoff(0) <= 0.5 for _ in range(50))
+
+def test_saturated_gateway_rejects_after_queue_timeout():
+    async def scenario():
+        g = gateway(concurrency=1, queue_timeout=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            await release.wait()
+
+        holder = asyncio.create_task(g.call(hold))
+        await asyncio.sleep(0.01)
+        try:
+            await g.call(hold)
+        finally:
+            release.set()
+            await holder
+
+    with pytest.raises(ProviderUnavailableError):
+        asyncio.run(scenario())
+
+def test_unavailable_cause_finds_wrapped_error():
+    error = ProviderUnavailableError("busy", retry_after=3)
+    try:
+        try:
+            raise error
+        except ProviderUnavailableError:
+            raise RuntimeError("Failed to answer query")
+    except RuntimeError as e:
+        assert unavailable_cause(e) is error
+    assert unavailable_cause(ValueError()) is None
+
+def test_token_bucket_spaces_requests_after_the_burst():
+    async def scenario():
+        bucket = TokenBucket(rate=50, capacity=2)
+        start = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # Two tokens are available at once, the other two take 1/50 s each.
+    assert asyncio.run(scenario()) >= 0.035
+
+def test_concurrent_document_calls_share_one_request():
+    async def scenario():
+        client = CountingEmbeddings()
+        embeddings = GatewayEmbeddings(client, gateway(), max_batch_size=100, batch_window=0.02)
+        results = await asyncio.gather(*(embeddings.aembed_documents([f"text {i}"]) for i in range(5)))
+        return client, results
+
+    client, results = asyncio.run(scenario())
+    assert len(client.batches) == 1
+    assert sorted(client.batches[0]) == [f"text {i}" for i in range(5)]
+    assert results == [[[6.0]]] * 5
+
+def test_identical_texts_are_coalesced():
+    async def scenario():
+        client = CountingEmbeddings(delay=0.05)
+        embeddings = GatewayEmbeddings(client, gateway(), max_batch_size=100, batch_window=0.01)
+        first = asyncio.create_task(embeddings.aembed_documents(["same", "other"]))
+        await asyncio.sleep(0.02)
+        # "same" is in flight already; only "new" needs a request.
+        second = await embeddings.aembed_documents(["same", "new"])
+        return client, await first, second
+
+    client, first, second = asyncio.run(scenario())
+    assert [sorted(b) for b in client.batches] == [["other", "same"], ["new"]]
+    assert first[0] == second[0]
+
+def test_batches_are_split_at_max_batch_size():
+    async def scenario():
+        client = CountingEmbeddings()
+        embeddings = GatewayEmbeddings(client, gateway(), max_batch_size=3, batch_window=0.01)
+        await embeddings.aembed_documents([f"t{i}" for i in range(7)])
+        return client
+
+    client = asyncio.run(scenario())
+    assert [len(b) for b in client.batches] == [3, 3, 1]
+
+def test_failed_batch_fails_every_waiting_caller():
+    class Broken(CountingEmbeddings):
+        async def aembed_documents(self, texts):
+            raise StatusError(400)
+
+    async def scenario():
+        embeddings = GatewayEmbeddings(Broken(), gateway(), max_batch_size=10, batch_window=0.01)
+        return await asyncio.gather(
+            embeddings.aembed_documents(["a"]), embeddings.aembed_documents(["b"]), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, StatusError) for r in results)
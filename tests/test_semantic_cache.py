@@ -0,0 +1,83 @@
+import time
+import asyncio
+from benchmarks.memory_backends import InMemoryDocManager
+from app.config import config_settings
+from app.modules.local_models import HashingEmbeddings, StubChatModel
+from app.modules.semantic_cache import SemanticCache
+
+def store(cache: SemanticCache, vector, answer: str, version: int = 0):
+    cache.store(vector, f"question for {answer}", answer, "context", version, sources=[{"ref": 1}])
+
+def test_similar_query_hits_and_dissimilar_misses():
+    cache = SemanticCache(threshold=0.95)
+    store(cache, [1.0, 0.0, 0.0], "x axis")
+    hit = cache.lookup([0.99, 0.05, 0.0])
+    assert hit["answer"] == "x axis"
+    assert hit["sources"] == [{"ref": 1}]
+    assert hit["similarity"] >= 0.95
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+
+def test_lookup_returns_the_most_similar_entry():
+    cache = SemanticCache(threshold=0.5)
+    store(cache, [1.0, 0.0], "x")
+    store(cache, [0.7, 0.7], "diagonal")
+    assert cache.lookup([0.6, 0.8])["answer"] == "diagonal"
+
+def test_version_change_invalidates_answers():
+    cache = SemanticCache()
+    store(cache, [1.0, 0.0], "old")
+    cache.set_version(1)
+    assert cache.lookup([1.0, 0.0]) is None
+    assert len(cache) == 0
+
+def test_answer_computed_against_an_older_version_is_not_stored():
+    cache = SemanticCache()
+    cache.set_version(2)
+    store(cache, [1.0, 0.0], "stale", version=1)
+    assert len(cache) == 0
+    store(cache, [1.0, 0.0], "fresh", version=2)
+    assert cache.lookup([1.0, 0.0])["answer"] == "fresh"
+
+def test_expired_answers_are_not_served():
+    cache = SemanticCache(ttl_seconds=0.01)
+    store(cache, [1.0, 0.0], "short lived")
+    time.sleep(0.02)
+    assert cache.lookup([1.0, 0.0]) is None
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(threshold=0.99, max_entries=2)
+    store(cache, [1.0, 0.0, 0.0], "a")
+    store(cache, [0.0, 1.0, 0.0], "b")
+    cache.lookup([1.0, 0.0, 0.0])
+    store(cache, [0.0, 0.0, 1.0], "c")
+    assert len(cache) == 2
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.lookup([1.0, 0.0, 0.0])["answer"] == "a"
+
+def test_change_in_another_process_invalidates_answers(monkeypatch):
+    monkeypatch.setattr(config_settings, "SEMANTIC_CACHE_VERSION_INTERVAL", 0)
+
+    async def ask(manager) -> bool:
+        async for event in manager.stream_answer("what is a cat"):
+            if event["type"] == "final":
+                return event["cached"]
+
+    async def scenario():
+        embeddings = HashingEmbeddings(64)
+        writer, reader = (
+            InMemoryDocManager(embeddings=embeddings, llm=StubChatModel(), response_cache=SemanticCache())
+            for _ in range(2)
+        )
+        # Two processes sharing one database.
+        reader.catalog = writer.catalog
+        await writer.startup()
+        await reader.startup()
+        text = "A cat is a small animal."
+        await reader.vectorstore.aadd_embeddings([text], [embeddings.embed_query(text)], metadatas=[{}], ids=["1"])
+        before = [await ask(reader), await ask(reader)]
+        await writer._knowledge_changed()
+        return before, await ask(reader)
+
+    before, after = asyncio.run(scenario())
+    assert before == [False, True]
+    assert after is False
@@ -0,0 +1,125 @@
+import json
+import asyncio
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from benchmarks.memory_backends import InMemoryDocManager
+from app.core.metrics import StageTimer
+from app.core.sse import event_stream, format_event
+from app.modules.local_models import HashingEmbeddings, StubChatModel
+from app.modules.provider_gateway import ProviderUnavailableError
+
+class FakeRequest:
+    """Request stand-in whose client disconnects after a given number of checks."""
+
+    def __init__(self, disconnect_after: int = None):
+        self.disconnect_after = disconnect_after
+        self.checks = 0
+
+    async def is_disconnected(self) -> bool:
+        self.checks += 1
+        return self.disconnect_after is not None and self.checks > self.disconnect_after
+
+async def collect(stream) -> list:
+    return [chunk async for chunk in stream]
+
+def parse(chunk: str):
+    event, data = chunk.strip().split("\n")
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+def test_format_event_keeps_multiline_data_in_one_field():
+    assert format_event("token", {"content": "a\nb"}) == 'event: token\ndata: {"content": "a\\nb"}\n\n'
+
+def test_events_are_relayed_in_order():
+    async def producer():
+        yield {"type": "token", "content": "Hel"}
+        yield {"type": "token", "content": "lo"}
+        yield {"type": "final", "answer": "Hello"}
+
+    chunks = asyncio.run(collect(event_stream(producer(), FakeRequest(), heartbeat_interval=1)))
+    assert [parse(c) for c in chunks] == [
+        ("token", {"content": "Hel"}), ("token", {"content": "lo"}), ("final", {"answer": "Hello"})
+    ]
+
+def test_heartbeat_is_sent_while_the_producer_is_silent():
+    async def producer():
+        await asyncio.sleep(0.05)
+        yield {"type": "final", "answer": "late"}
+
+    chunks = asyncio.run(collect(event_stream(producer(), FakeRequest(), heartbeat_interval=0.01)))
+    assert ": heartbeat\n\n" in chunks
+    assert parse(chunks[-1]) == ("final", {"answer": "late"})
+
+def test_producer_error_ends_the_stream_with_an_error_event():
+    async def producer():
+        yield {"type": "token", "content": "partial"}
+        raise RuntimeError("boom")
+
+    chunks = asyncio.run(collect(event_stream(producer(), FakeRequest(), heartbeat_interval=1)))
+    assert parse(chunks[-1]) == ("error", {"detail": "boom"})
+
+def test_provider_unavailable_error_carries_code_and_retry_after():
+    async def producer():
+        try:
+            raise ProviderUnavailableError("llm overloaded", retry_after=7)
+        except ProviderUnavailableError:
+            raise RuntimeError("Failed to answer query")
+        yield
+
+    chunks = asyncio.run(collect(event_stream(producer(), FakeRequest(), heartbeat_interval=1)))
+    event, data = parse(chunks[-1])
+    assert event == "error"
+    assert data["code"] == "provider_unavailable"
+    assert data["retry_after"] == 7
+
+def test_disconnect_cancels_and_closes_the_producer():
+    state = {"closed": False, "cancelled": False}
+
+    async def producer():
+        try:
+            yield {"type": "token", "content": "first"}
+            await asyncio.sleep(10)
+            yield {"type": "token", "content": "never"}
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+        finally:
+            state["closed"] = True
+
+    async def scenario():
+        stream = event_stream(producer(), FakeRequest(disconnect_after=2), heartbeat_interval=0.01)
+        return await asyncio.wait_for(collect(stream), timeout=1)
+
+    chunks = asyncio.run(scenario())
+    assert [parse(c) for c in chunks if not c.startswith(":")] == [("token", {"content": "first"})]
+    assert state == {"closed": True, "cancelled": True}
+
+def test_time_to_first_token_is_recorded_once():
+    class SlowStartModel(StubChatModel):
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+            for _ in range(3):
+                yield ChatGenerationChunk(message=AIMessageChunk(content=""))
+            async for chunk in super()._astream(messages, stop=stop, **kwargs):
+                yield chunk
+
+    class RecordingTimer(StageTimer):
+        def __init__(self):
+            super().__init__()
+            self.recorded = []
+
+        def record(self, name, seconds):
+            self.recorded.append(name)
+            super().record(name, seconds)
+
+    async def scenario():
+        embeddings = HashingEmbeddings(64)
+        manager = InMemoryDocManager(embeddings=embeddings, llm=SlowStartModel())
+        await manager.startup()
+        text = "A cat is a small animal."
+        await manager.vectorstore.aadd_embeddings([text], [embeddings.embed_query(text)], metadatas=[{}], ids=["1"])
+        timer = RecordingTimer()
+        events = [e async for e in manager.stream_answer("what is a cat", timer=timer)]
+        return events, timer
+
+    events, timer = asyncio.run(scenario())
+    assert events[-1]["type"] == "final"
+    assert timer.recorded.count("ttft") == 1
@@ -0,0 +1,141 @@
+import asyncio
+import glob
+import os
+from app.modules.write_behind import WriteBehindBuffer
+
+class RecordingDB:
+    """write_batch stand-in that can be slowed down or made to fail."""
+
+    def __init__(self, delay: float = 0.0, failures: int = 0):
+        self.delay = delay
+        self.failures = failures
+        self.messages = []
+        self.audits = []
+        self.calls = 0
+
+    async def write_batch(self, messages, audits):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unavailable")
+        self.messages += messages
+        self.audits += audits
+
+def test_flush_writes_messages_and_audits_in_order(tmp_path):
+    async def scenario():
+        db = RecordingDB()
+        buffer = WriteBehindBuffer(db, spill_dir=str(tmp_path))
+        buffer.add_message(1, "hello", "user")
+        buffer.add_message(1, "hi", "assistant")
+        buffer.add_audit(1, "hello", "hi", "", 12)
+        await buffer.flush()
+        return db, buffer
+
+    db, buffer = asyncio.run(scenario())
+    assert [m[1] for m in db.messages] == ["hello", "hi"]
+    assert len(db.audits) == 1
+    assert buffer.pending_messages(1) == []
+
+def test_failed_flush_keeps_batch_in_front_of_newer_records(tmp_path):
+    async def scenario():
+        db = RecordingDB(failures=1)
+        buffer = WriteBehindBuffer(db, spill_dir=str(tmp_path))
+        buffer.add_message(1, "first", "user")
+        await buffer.flush()
+        buffer.add_message(1, "second", "user")
+        assert [m["message"] for m in buffer.pending_messages(1)] == ["first", "second"]
+        await buffer.flush()
+        return db
+
+    db = asyncio.run(scenario())
+    assert [m[1] for m in db.messages] == ["first", "second"]
+
+def test_batch_stays_visible_while_being_written(tmp_path):
+    async def scenario():
+        db = RecordingDB(delay=0.2)
+        buffer = WriteBehindBuffer(db, spill_dir=str(tmp_path))
+        buffer.add_message(7, "in flight", "user")
+        flush = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0.05)
+        during = buffer.pending_messages(7)
+        await flush
+        return during, buffer.pending_messages(7)
+
+    during, after = asyncio.run(scenario())
+    assert [m["message"] for m in during] == ["in flight"]
+    assert after == []
+
+def test_cancelled_flush_puts_batch_back(tmp_path):
+    async def scenario():
+        db = RecordingDB(delay=1.0)
+        buffer = WriteBehindBuffer(db, spill_dir=str(tmp_path))
+        buffer.add_message(1, "keep me", "user")
+        flush = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0.05)
+        flush.cancel()
+        await asyncio.gather(flush, return_exceptions=True)
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert [m["message"] for m in buffer.pending_messages(1)] == ["keep me"]
+
+def test_stop_during_flush_waits_for_the_write(tmp_path):
+    async def scenario():
+        db = RecordingDB(delay=0.3)
+        buffer = WriteBehindBuffer(db, flush_interval=0.01, spill_dir=str(tmp_path))
+        await buffer.start()
+        buffer.add_message(1, "hello", "user")
+        await asyncio.sleep(0.1)
+        await buffer.stop()
+        return db, buffer
+
+    db, buffer = asyncio.run(scenario())
+    assert [m[1] for m in db.messages] == ["hello"]
+    assert buffer.pending_messages(1) == []
+    assert glob.glob(os.path.join(tmp_path, "*.jsonl")) == []
+
+def test_stop_spills_what_cannot_be_written_and_replays_it(tmp_path):
+    async def scenario():
+        down = RecordingDB(failures=10)
+        buffer = WriteBehindBuffer(down, spill_dir=str(tmp_path))
+        buffer.add_message(1, "hello", "user")
+        buffer.add_audit(1, "hello", "hi", "", 5, latency_breakdown={"total": 0.005})
+        await buffer.stop()
+        spilled = glob.glob(os.path.join(tmp_path, "write-behind-*.jsonl"))
+
+        up = RecordingDB()
+        await WriteBehindBuffer(up, spill_dir=str(tmp_path)).flush()
+        return spilled, up
+
+    spilled, up = asyncio.run(scenario())
+    assert len(spilled) == 1
+    assert [m[1] for m in up.messages] == ["hello"]
+    assert up.audits[0][7] == {"total": 0.005}
+    assert glob.glob(os.path.join(tmp_path, "*.jsonl*")) == []
+
+def test_adding_records_never_touches_the_disk(tmp_path):
+    buffer = WriteBehindBuffer(RecordingDB(), max_pending=3, spill_dir=str(tmp_path))
+    for i in range(5):
+        buffer.add_message(1, f"m{i}", "user")
+    assert len(buffer.pending_messages(1)) == 5
+    assert os.listdir(tmp_path) == []
+
+def test_flusher_spills_when_max_pending_is_reached_and_keeps_them_readable(tmp_path):
+    async def scenario():
+        db = RecordingDB(failures=1)
+        buffer = WriteBehindBuffer(db, max_pending=3, spill_dir=str(tmp_path))
+        for i in range(3):
+            buffer.add_message(1, f"m{i}", "user")
+        await buffer.flush()
+        spilled = glob.glob(os.path.join(tmp_path, "write-behind-*.jsonl"))
+        during = [m["message"] for m in buffer.pending_messages(1)]
+        buffer.add_message(1, "m3", "user")
+        await buffer.flush()
+        return db, buffer, spilled, during
+
+    db, buffer, spilled, during = asyncio.run(scenario())
+    assert len(spilled) == 1
+    assert during == ["m0", "m1", "m2"]
+    assert [m[1] for m in db.messages] == ["m0", "m1", "m2", "m3"]
+    assert buffer.pending_messages(1) == []